@@ -1,9 +1,45 @@
 """Setup file for PyScaffold."""
+import os
+from pathlib import Path
+
 from setuptools import setup
+from setuptools.command.build_py import build_py
+
+TEMPLATES = "pyscaffold/templates"
+BUNDLE = "_bundle.py"
+
+
+def bundle_templates(folder, target):
+    """Write all the ``*.template`` files in ``folder`` (with ``\\n`` line endings)
+    into a single Python module, so the built-in templates can be loaded with a single
+    read (see ``pyscaffold.templates.packs.BundlePack``).
+    """
+    templates = {
+        path.stem: path.read_text(encoding="utf-8").replace(os.linesep, "\n")
+        for path in sorted(Path(folder).glob("*.template"))
+    }
+    source = f'"""Generated by setup.py, do not edit"""\nTEMPLATES = {templates!r}\n'
+    Path(target).write_text(source, encoding="utf-8")
+
+
+class BuildPy(build_py):
+    """Also write the bundle of templates.
+    Editable installs are skipped, so the templates can be changed during development.
+    """
+
+    def run(self):
+        super().run()
+        if not getattr(self, "editable_mode", False):
+            target = Path(self.build_lib, TEMPLATES, BUNDLE)
+            bundle_templates(Path(__file__).parent / "src" / TEMPLATES, target)
+
 
 if __name__ == "__main__":
     try:
-        setup(use_scm_version={"version_scheme": "no-guess-dev"})
+        setup(
+            use_scm_version={"version_scheme": "no-guess-dev"},
+            cmdclass={"build_py": BuildPy},
+        )
     except:  # noqa
         print(
             "\n\nAn error occurred while building the project, "
@@ -11,13 +11,31 @@ Note:
     other auxiliary functions, see :mod:`pyscaffold.structure`,
     :mod:`pyscaffold.update`.
 """
+import asyncio
+import contextvars
 import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import date, datetime
-from functools import reduce
+from functools import partial, reduce
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
-from . import info, repo
+from . import archive, cache, info, repo, tracing
 from .exceptions import (
     ActionNotFound,
     DirectoryAlreadyExists,
@@ -60,6 +78,60 @@ When actions run, they can return an updated copy of :obj:`Structure` and
 :obj:`ScaffoldOpts`.
 """
 
+AsyncAction = Callable[[Structure, ScaffoldOpts], Awaitable[ActionParams]]
+"""Signature of a coroutine function that can be used as action by
+:obj:`invoke_async` (e.g. to run subprocesses with :obj:`.ShellCommand.run_async`)::
+
+    Callable[[Structure, ScaffoldOpts], Awaitable[ActionParams]]
+
+"""
+
+Middleware = Callable[[str, Action, Structure, ScaffoldOpts], ActionParams]
+"""Signature of a function that wraps the invocation of every action::
+
+    Callable[[str, Action, Structure, ScaffoldOpts], ActionParams]
+
+The first argument is the action identifier (see :obj:`.get_id`) and the second is a
+``proceed`` callable (with the same signature of an :obj:`Action`) that continues the
+invocation (i.e. calls the next middleware in the chain or the action itself).
+The remaining arguments are the ones given to the action.
+Middleware can inspect/modify the arguments and the return value of ``proceed``, or
+even skip calling it (e.g. to return a memoized result)::
+
+    def timeit(action_id, proceed, struct, opts):
+        start = time.perf_counter()
+        try:
+            return proceed(struct, opts)
+        finally:
+            print(action_id, time.perf_counter() - start)
+
+The middleware chain is given by the :obj:`MIDDLEWARE` option, see :obj:`invoke`.
+"""
+
+MIDDLEWARE = "middleware"
+"""Name of the option (in :obj:`ScaffoldOpts`) holding the list of :obj:`Middleware`
+used by :obj:`invoke`. The first middleware in the list is the outermost one.
+"""
+
+PARALLEL = "parallel"
+"""Name of the option (in :obj:`ScaffoldOpts`) that enables running independent
+actions concurrently (see :obj:`run_concurrently`). It can be ``True`` or the maximum
+number of threads.
+"""
+
+
+Resource = Union[str, Callable[[ScaffoldOpts], str]]
+"""Resource declared for an action (see :obj:`declare`), either a string or a function
+computing it from the options (e.g. for paths that can be configured)
+"""
+
+
+class Resources(NamedTuple):
+    """Resources read and written by an action (see :obj:`declare`)"""
+
+    reads: FrozenSet[str]
+    writes: FrozenSet[str]
+
 
 # -------- Functions that deal with/manipulate actions --------
 
@@ -86,6 +158,9 @@ def discover(extensions: Iterable["Extension"]) -> List[Action]:
 def invoke(struct_and_opts: ActionParams, action: Action) -> ActionParams:
     """Invoke action with proper logging.
 
+    The action is wrapped by the chain of :obj:`Middleware` listed in the
+    :obj:`MIDDLEWARE` option (if any).
+
     Args:
         struct_and_opts: PyScaffold's arguments for actions
         action: to be invoked
@@ -93,9 +168,107 @@ def invoke(struct_and_opts: ActionParams, action: Action) -> ActionParams:
     Returns:
         ActionParams: updated project representation and options
     """
-    logger.report("invoke", get_id(action))
-    with logger.indent():
-        return action(*struct_and_opts)
+    return _invoke(struct_and_opts, get_id(action), action)
+
+
+async def invoke_async(
+    struct_and_opts: ActionParams, action: "Union[Action, AsyncAction]"
+) -> ActionParams:
+    """Asynchronous version of :obj:`invoke`.
+
+    Regular actions are executed in the default executor of the running event loop
+    (i.e. in a thread pool), so they don't block it.
+    Coroutine functions (:obj:`AsyncAction`) are awaited in the event loop.
+
+    Since :obj:`Middleware` are synchronous, when they are used with coroutine
+    functions, the chain is executed in the thread pool and the coroutine is scheduled
+    back in the event loop.
+    """
+    action_id = get_id(action)
+    struct, opts = struct_and_opts
+    loop = asyncio.get_running_loop()
+
+    if asyncio.iscoroutinefunction(action) and not opts.get(MIDDLEWARE):
+        logger.report("invoke", action_id)
+        with logger.indent(), logger.performing(action_id):
+            with tracing.span(action_id, "action"):
+                return await action(struct, opts)
+
+    if asyncio.iscoroutinefunction(action):
+
+        def _bridge(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
+            coro = action(struct, opts)  # type: ignore[misc]
+            return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+        impl: Action = _bridge
+    else:
+        impl = action  # type: ignore[assignment]
+
+    run = contextvars.copy_context().run  # keep logging/tracing context in threads
+    args = (struct_and_opts, action_id, impl)
+    return await loop.run_in_executor(None, run, _invoke, *args)
+
+
+def _invoke(struct_and_opts: ActionParams, action_id: str, action: Action):
+    struct, opts = struct_and_opts
+    proceed = action
+    for middleware in reversed(opts.get(MIDDLEWARE) or ()):
+        proceed = partial(middleware, action_id, proceed)
+
+    logger.report("invoke", action_id)
+    with logger.indent(), logger.performing(action_id):
+        with tracing.span(action_id, "action"):
+            return proceed(struct, opts)
+
+
+def add_middleware(opts: ScaffoldOpts, *middleware: Middleware) -> ScaffoldOpts:
+    """Return a copy of ``opts`` with the given :obj:`Middleware` appended to the
+    chain used by :obj:`invoke` (i.e. they will be the innermost ones).
+
+    Extensions can use it in an action registered at the beginning of the pipeline::
+
+        class Timer(Extension):
+            def activate(self, actions):
+                return self.register(actions, add_timer, before="get_default_options")
+
+        def add_timer(struct, opts):
+            return struct, add_middleware(opts, timeit)
+
+    Please notice the middleware only wraps the actions invoked after it is added.
+    """
+    return {**opts, MIDDLEWARE: [*(opts.get(MIDDLEWARE) or []), *middleware]}
+
+
+def hooks(
+    before: Optional[Callable[..., None]] = None,
+    after: Optional[Callable[..., None]] = None,
+    error: Optional[Callable[..., None]] = None,
+) -> Middleware:
+    """Create a :obj:`Middleware` from simple callbacks.
+
+    Args:
+        before: called as ``before(action_id, struct, opts)`` before the action
+        after: called as ``after(action_id, struct, opts, (new_struct, new_opts))``
+            after the action
+        error: called as ``error(action_id, struct, opts, exception)`` when the action
+            fails (the exception is re-raised afterwards)
+    """
+
+    def _hooks(action_id: str, proceed: Action, struct: Structure, opts: ScaffoldOpts):
+        """See ``pyscaffold.actions.hooks``"""
+        if before:
+            before(action_id, struct, opts)
+        try:
+            result = proceed(struct, opts)
+        except Exception as ex:
+            if error:
+                error(action_id, struct, opts, ex)
+            raise
+        if after:
+            after(action_id, struct, opts, result)
+        return result
+
+    return _hooks
 
 
 def register(
@@ -191,6 +364,174 @@ def _find(actions: Iterable[Action], name: str) -> int:
         raise ActionNotFound(name)
 
 
+def declare(reads: Iterable[Resource] = (), writes: Iterable[Resource] = ()):
+    """Decorator to declare which resources are read/written by an action, allowing
+    :obj:`run_concurrently` to execute it in parallel with other actions.
+
+    Resources are strings organised hierarchically with ``/``, e.g.:
+
+    - ``opts/<key>`` or ``opts``: a single option or all the options
+    - ``struct``: the project representation (:obj:`Structure`)
+    - ``disk/<path>``: files/directories inside the project, e.g. ``disk/.git``
+
+    Two actions depend on each other when one of them writes a resource that the
+    other reads or writes (``disk/.git`` also includes ``disk/.git/hooks``).
+    Resources that depend on the options can be given as functions receiving the
+    options (see :obj:`Resource`).
+
+    Example:
+
+        .. code-block:: python
+
+            @declare(
+                reads=["opts/project_path", "opts/docs_dir"],
+                writes=[lambda opts: "disk/" + opts.get("docs_dir", "docs")],
+            )
+            def build_docs(struct, opts):
+                ...
+
+    Please notice that only the changes in the declared ``opts``/``struct`` resources
+    are kept from the value returned by the action when it runs concurrently with
+    other actions (when it runs alone, the returned value is used as it is).
+    Actions without declarations are never executed concurrently (they work as
+    barriers, preserving the order of the pipeline).
+    """
+
+    def _decorator(action: Action) -> Action:
+        action.resources = (tuple(reads), tuple(writes))  # type: ignore[attr-defined]
+        return action
+
+    return _decorator
+
+
+def resources(
+    action: Action, opts: Optional[ScaffoldOpts] = None
+) -> Optional[Resources]:
+    """Resources declared for an action (see :obj:`declare`), or ``None``.
+    ``opts`` is used to compute the resources given as functions.
+    """
+    declared = getattr(action, "resources", None)
+    if declared is None:
+        return None
+
+    opts = opts or {}
+    reads, writes = (
+        frozenset(r(opts) if callable(r) else r for r in group) for group in declared
+    )
+    return Resources(reads, writes)
+
+
+def dependency_graph(
+    actions: List[Action], opts: Optional[ScaffoldOpts] = None
+) -> List[Set[int]]:
+    """Compute which actions (given by their index in the list) have to finish before
+    each action in the pipeline can start (see :obj:`declare`).
+    ``opts`` is used to compute the resources given as functions.
+
+    The result only contains direct dependencies (i.e. transitive ones are omitted).
+    """
+    declared = [resources(action, opts) for action in actions]
+    closure: List[Set[int]] = []
+    direct: List[Set[int]] = []
+    for i, res in enumerate(declared):
+        deps = {j for j in range(i) if _conflict(declared[j], res)}
+        indirect = set().union(*(closure[j] for j in deps))
+        closure.append(deps | indirect)
+        direct.append(deps - indirect)
+
+    return direct
+
+
+def run_concurrently(
+    actions: List[Action],
+    struct_and_opts: ActionParams,
+    max_workers: Optional[int] = None,
+) -> ActionParams:
+    """Invoke the actions in the pipeline (see :obj:`invoke`) running independent
+    actions concurrently in a thread pool (according to :obj:`dependency_graph`).
+
+    Actions without declared resources run in the current thread, when all the
+    previous actions are finished, so the behaviour of a pipeline without
+    declarations is the same as invoking the actions one after the other.
+    """
+    struct, opts = struct_and_opts
+    declared = [resources(action, opts) for action in actions]
+    deps = dependency_graph(actions, opts)
+    pending = list(range(len(actions)))
+    done: Set[int] = set()
+    running: dict = {}
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        while pending or running:
+            ready = [i for i in pending if deps[i] <= done]
+            for i in ready:
+                pending.remove(i)
+                action = actions[i]
+                if not running and (len(ready) == 1 or declared[i] is None):
+                    # nothing else runs at the same time => no need to merge
+                    struct, opts = invoke((struct, opts), action)
+                    done.add(i)
+                    break  # other actions might be ready now
+                run = contextvars.copy_context().run  # keep logging/tracing context
+                running[executor.submit(run, invoke, (struct, opts), action)] = i
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = running.pop(future)
+                result = future.result()
+                struct, opts = _merge(struct, opts, result, declared[i])
+                done.add(i)
+
+    return struct, opts
+
+
+def _overlap(resource1: str, resource2: str) -> bool:
+    if resource1 == resource2:
+        return True
+    shortest, longest = sorted((resource1, resource2), key=len)
+    return longest.startswith(shortest + "/")
+
+
+def _conflict(res1: Optional[Resources], res2: Optional[Resources]) -> bool:
+    if res1 is None or res2 is None:
+        return True
+
+    return any(
+        _overlap(w, r)
+        for writes, other in ((res1.writes, res2), (res2.writes, res1))
+        for w in writes
+        for r in (*other.reads, *other.writes)
+    )
+
+
+def _merge(
+    struct: Structure,
+    opts: ScaffoldOpts,
+    result: ActionParams,
+    declared: Optional[Resources],
+) -> ActionParams:
+    """Incorporate the declared changes of an action (that ran concurrently with
+    other actions) into the current state
+    """
+    new_struct, new_opts = result
+    if declared is None:
+        return new_struct, new_opts
+
+    if any(_overlap(w, "struct") for w in declared.writes):
+        struct = new_struct
+    if "opts" in declared.writes:
+        return struct, new_opts
+
+    keys = {w.split("/")[1] for w in declared.writes if w.startswith("opts/")}
+    if keys:
+        opts = {k: v for k, v in opts.items() if k not in keys}
+        opts.update({k: new_opts[k] for k in keys if k in new_opts})
+    return struct, opts
+
+
 # -------- PyScaffold's actions --------
 
 
@@ -205,7 +546,8 @@ def get_default_options(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
         opts: given options, see :obj:`create_project` for an extensive list.
 
     Returns:
-        ActionParams: project representation and options with default values set
+        ActionParams: project representation and (a copy of the) options with default
+        values set
 
     Raises:
         :class:`~.DirectoryDoesNotExist`: when PyScaffold is told to
@@ -220,6 +562,7 @@ def get_default_options(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     # This function uses information from git, so make sure it is available
     info.check_git()
 
+    opts = opts.copy()  # avoid changing the dict given by the caller
     project_path = str(opts.get("project_path", ".")).rstrip(os.sep)
     # ^  Strip (back)slash when added accidentally during update
     opts["project_path"] = Path(project_path)
@@ -240,8 +583,8 @@ def get_default_options(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     # Initialize empty list of all requirements and extensions
     # (since not using deep_copy for the DEFAULT_OPTIONS, better add compound
     # values inside this function)
-    opts.setdefault("requirements", [])
-    opts.setdefault("extensions", [])
+    opts["requirements"] = list(opts.get("requirements", []))
+    opts["extensions"] = list(opts.get("extensions", []))
     opts.setdefault("root_pkg", opts["package"])
     opts.setdefault("qual_pkg", opts["package"])
     opts.setdefault("pretend", False)
@@ -249,6 +592,9 @@ def get_default_options(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     opts["license"] = info.best_fit_license(opts.get("license"))
     # ^ "Canonicalise" license
 
+    if opts.get(cache.CACHE_OPT):
+        opts = add_middleware(opts, cache.middleware)
+
     return struct, opts
 
 
@@ -284,8 +630,9 @@ def verify_project_dir(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     Returns:
         Updated project representation and options
     """
+    writing_archive = archive.ARCHIVE_OPT in opts  # the disk is not changed
     if opts["project_path"].exists():
-        if not opts["update"] and not opts["force"]:
+        if not opts["update"] and not opts["force"] and not writing_archive:
             raise DirectoryAlreadyExists(
                 "Directory {dir} already exists! Use the `update` option to "
                 "update an existing project or the `force` option to "
@@ -300,6 +647,10 @@ def verify_project_dir(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     return struct, opts
 
 
+@declare(
+    reads=["struct", "opts/project_path", "opts/update", "opts/pretend"],
+    writes=["disk/.git"],
+)
 def init_git(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     """Add revision control to the generated files.
 
@@ -319,10 +670,12 @@ def init_git(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
 
 def report_done(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     """Just inform the user PyScaffold is done"""
+    file = sys.stderr if opts.get("output_archive") == archive.STDOUT else sys.stdout
+    # ^  don't mix the message with the archive
     try:
-        print("done! 🐍 🌟 ✨")
+        print("done! 🐍 🌟 ✨", file=file)
     except Exception:  # pragma: no cover
-        print("done!")  # this exception is not really expected to happen
+        print("done!", file=file)  # this exception is not really expected to happen
     return struct, opts
 
 
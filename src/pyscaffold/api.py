@@ -1,17 +1,32 @@
 """
 External API for accessing PyScaffold programmatically via Python.
 """
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from enum import Enum
-from functools import reduce
+from functools import partial, reduce
 from pathlib import Path
+from string import Template
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from packaging.version import Version
 
 from . import __version__ as VERSION
-from . import actions, info
+from . import actions, archive, dedup, info, structure, tracing
 from .exceptions import NoPyScaffoldProject
+from .file_system import PathLike
+from .identification import get_id
+from .log import logger
+from .templates import packs as template_packs
+from .templates.compiled import CompiledTemplate, compile_template, render_many
 
 # -------- Options --------
 
-(NO_CONFIG,) = list(Enum("ConfigFiles", "NO_CONFIG"))  # type: ignore
+_ConfigFiles = Enum("_ConfigFiles", "NO_CONFIG")  # module-level, so it can be pickled
+(NO_CONFIG,) = list(_ConfigFiles)  # type: ignore
 """This constant is used to tell PyScaffold to not load any extra configuration file,
 not even the default ones
 Usage::
@@ -118,6 +133,14 @@ def create_project(opts=None, **kwargs):
                             - **pretend** (*bool*)
                             - **extensions** (*list*)
                             - **config_files** (*list* or ``NO_CONFIG``)
+                            - **middleware** (*list*)
+                            - **trace** (:obj:`os.PathLike` or :obj:`str`)
+                            - **trace_format** (*str*)
+                            - **output_archive** (:obj:`os.PathLike`, :obj:`str`
+                              or binary file object)
+                            - **output_archive_format** (*str*)
+                            - **templates** (*list*)
+                            - **dedup** (*str*)
 
     Some of these options are equivalent to the command line options, others
     are used for creating the basic python package meta information, but the
@@ -148,17 +171,320 @@ def create_project(opts=None, **kwargs):
     should be the address to the git repository used as template and the ``namespace``
     extension define a ``namespace`` option with the name of a PEP 420 compatible
     (and possibly nested) namespace.
+
+    The **middleware** list may contain functions that wrap the invocation of each
+    action (e.g. for profiling, caching or collecting metrics), see
+    :obj:`pyscaffold.actions.Middleware`.
+
+    When a **trace** file is given, a span trace of the execution (actions, file
+    operations, shell commands and configuration reads) is written to it, in the format
+    indicated by **trace_format** (``"chrome"`` by default, or ``"otlp"``).
+    See :mod:`pyscaffold.tracing`.
+
+    The log records produced during the execution are attributed to a **run_id**
+    (randomly generated if not given), see :obj:`pyscaffold.log.ReportLogger.run`.
+
+    When an **output_archive** is given (``"-"`` for the standard output), the project
+    files are written into a tar/zip archive (see **output_archive_format**) instead of
+    the disk, and the actions that need the project in the disk (e.g. ``init_git``) are
+    skipped. See :mod:`pyscaffold.archive`.
+
+    The **templates** list may contain directories, zip/wheel archives or package
+    names with ``.template`` files, that are used instead of the templates with the
+    same name (shipped with PyScaffold or extensions).
+    See :mod:`pyscaffold.templates.packs`.
+
+    When **dedup** is given (``"reflink"`` or ``"hardlink"``), files identical to
+    the ones already created in the same run (e.g. by :obj:`create_projects`) are
+    created as links. See :mod:`pyscaffold.dedup`.
+
+    When **parallel** is ``True`` (or the maximum number of threads), independent
+    actions are executed concurrently, see :obj:`pyscaffold.actions.run_concurrently`.
+
+    Note:
+        This function is thread-safe and reentrant: it does not change the given
+        **opts** (or the process-wide working directory), so it can be called
+        concurrently (e.g. from a thread pool) as long as each call uses a different
+        **project_path**. The built-in extensions follow the same rules. Custom
+        extensions/actions should avoid mutating shared objects (e.g. by returning
+        modified copies of **opts**) to keep this guarantee.
     """
-    opts = bootstrap_options(opts, **kwargs)
-    pipeline = actions.discover(opts["extensions"])
+    with _scaffold_context({**(opts or {}), **kwargs}):
+        opts = dedup.enable(bootstrap_options(opts, **kwargs))
+        with archive.writing(opts) as opts:
+            pipeline = _discover(opts)
+
+            # call the actions to generate final struct and opts
+            if opts.get(actions.PARALLEL):
+                workers = opts[actions.PARALLEL]
+                max_workers = None if workers is True else workers
+                return actions.run_concurrently(pipeline, ({}, opts), max_workers)
+            return reduce(actions.invoke, pipeline, ({}, opts))
+
+
+def create_projects(
+    opts_list: Iterable[dict], max_workers: Optional[int] = None
+) -> List[actions.ActionParams]:
+    """Create several projects concurrently in a thread pool with at most
+    ``max_workers`` threads (bounding, e.g., the number of simultaneous
+    ``pip install`` processes when the ``venv`` extension is used).
+
+    Each element of ``opts_list`` is given to :obj:`create_project`, and the results
+    are returned in the same order (if any project fails, the exception is re-raised
+    after the other projects are finished).
+
+    The templates shared by the projects are rendered in advance for the whole list
+    (see :obj:`~pyscaffold.templates.compiled.render_many`).
+    """
+    stores: dict = {}  # the projects share the same dedup.Store
+    opts_list = [dedup.enable(opts or {}, stores) for opts in opts_list]
+    _render_shared_templates(opts_list)
+    with ThreadPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(create_project, opts) for opts in opts_list]
+        wait(futures)
+    return [future.result() for future in futures]
+
+
+class UpdateResult(NamedTuple):
+    """Outcome of updating a single project with :obj:`update_projects`"""
+
+    path: Path
+    status: str
+    """``"updated"``, ``"skipped"`` (already in the current version) or ``"failed"``"""
+    changed: int = 0
+    """Number of files changed"""
+    error: Optional[str] = None
+
+
+def update_projects(
+    paths: Iterable[PathLike],
+    workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    opts: Optional[dict] = None,
+) -> List[UpdateResult]:
+    """Update many existing projects (e.g. after upgrading PyScaffold), using a pool
+    of ``workers`` processes (one per CPU by default).
+
+    Projects already in the current version of PyScaffold are skipped (unless the
+    **force** option is given). Each update is equivalent to calling
+    :obj:`create_project` with ``update=True`` and the given ``opts``, but the
+    pipeline of actions is reused among the projects with the same extensions
+    (and ``report_done`` is not invoked).
+
+    When ``timeout`` is given, each project is updated in its own process, which is
+    terminated if the update takes longer than ``timeout`` seconds (the project is
+    then reported as failed with a :obj:`TimeoutError`).
+    Errors in one project do not stop the others, see :obj:`UpdateResult`.
+    The results are given in the same order as ``paths``.
+    The projects can be discovered with :obj:`pyscaffold.info.find_projects`.
+    """
+    opts = opts or {}
+    all_paths = list(map(Path, paths))
+    results: List[Optional[UpdateResult]] = [None] * len(all_paths)
+    pending: List[int] = []
+    current = Version(VERSION)
+    for i, path in enumerate(all_paths):
+        try:
+            if not opts.get("force") and info.get_curr_version(path) >= current:
+                results[i] = UpdateResult(path, "skipped")
+                logger.report("skip", path)
+                continue
+            pending.append(i)
+        except Exception as ex:
+            results[i] = UpdateResult(path, "failed", error=_describe(ex))
+
+    if timeout is None:
+        executor = ProcessPoolExecutor(workers)
+        submit = partial(executor.submit, _update_project)
+    else:  # processes can only be terminated individually
+        executor = ThreadPoolExecutor(workers or os.cpu_count())
+        submit = partial(executor.submit, _update_in_process, timeout=timeout)
+
+    with executor:
+        futures = {i: submit(all_paths[i], opts) for i in pending}
+        for i, future in futures.items():
+            path = all_paths[i]
+            try:
+                changed = future.result()
+                results[i] = UpdateResult(path, "updated", changed)
+                logger.report("updated", path, context=f"{changed} files")
+            except Exception as ex:
+                results[i] = UpdateResult(path, "failed", error=_describe(ex))
+                logger.error("Failed to update %s: %s", path, _describe(ex))
+
+    return [result for result in results if result is not None]
+
+
+async def create_project_async(opts=None, **kwargs):
+    """Asynchronous version of :obj:`create_project` (same arguments).
+
+    The actions are invoked with :obj:`pyscaffold.actions.invoke_async`, so they
+    don't block the event loop and actions defined by extensions can be coroutine
+    functions (:obj:`pyscaffold.actions.AsyncAction`).
+    This way many projects can be created concurrently in a single event loop, e.g.::
+
+        await asyncio.gather(*(create_project_async(project_path=p) for p in paths))
+    """
+    with _scaffold_context({**(opts or {}), **kwargs}):
+        opts = dedup.enable(bootstrap_options(opts, **kwargs))
+        with archive.writing(opts) as opts:
+            pipeline = _discover(opts)
 
-    # call the actions to generate final struct and opts
-    return reduce(actions.invoke, pipeline, ({}, opts))
+            struct_and_opts = ({}, opts)
+            for action in pipeline:
+                struct_and_opts = await actions.invoke_async(struct_and_opts, action)
+            return struct_and_opts
 
 
 # -------- Auxiliary functions (Private) --------
 
 
+@contextmanager
+def _scaffold_context(given: dict):
+    """Attribute logs to a run id, record a trace and activate the template packs
+    (when requested) while creating a project
+    """
+    trace_format = given.get("trace_format") or tracing.DEFAULT_FORMAT
+    trace = given.get("trace")
+    with logger.run(given.get("run_id")), tracing.record(trace, trace_format):
+        with template_packs.using(given.get("templates") or ()):
+            yield
+
+
+def _discover(opts: dict) -> List[actions.Action]:
+    """Pipeline of actions for the given options.
+    When writing an archive (see :mod:`pyscaffold.archive`), the actions that declare
+    resources in the disk are skipped (e.g. ``init_git``).
+    """
+    pipeline = actions.discover(opts["extensions"])
+    if archive.ARCHIVE_OPT not in opts:
+        return pipeline
+
+    def _in_disk(action: actions.Action) -> bool:
+        declared = actions.resources(action)
+        paths = [*declared.reads, *declared.writes] if declared else []
+        if any(p.startswith("disk/") for p in paths):
+            logger.report("skip", get_id(action))
+            return True
+        return False
+
+    return [action for action in pipeline if not _in_disk(action)]
+
+
+def _render_shared_templates(opts_list: List[dict]):
+    """Render the templates in the default structure of several projects with
+    :obj:`~pyscaffold.templates.compiled.render_many`, so each template is rendered
+    once for the whole list (and projects with the same values share the result).
+    :obj:`~pyscaffold.structure.reify_content` then reuses the results when the
+    options in the pipeline produce the same values (otherwise it renders as usual).
+    """
+    users: Dict[CompiledTemplate, Tuple[Template, List[dict]]] = {}
+    for given in opts_list:
+        try:
+            with template_packs.using(given.get("templates") or ()):
+                _, opts = actions.get_default_options({}, bootstrap_options(given))
+                struct, _ = structure.define_structure({}, opts)
+        except Exception:
+            continue  # the error is reported when the project is created
+
+        # Templates are deep-copied in each structure => group by the compiled version
+        for template in _templates(struct):
+            compiled = compile_template(template)
+            _, opts_for_template = users.setdefault(compiled, (template, []))
+            if not opts_for_template or opts_for_template[-1] is not opts:
+                opts_for_template.append(opts)
+
+    for template, opts_for_template in users.values():
+        if len(opts_for_template) > 1:
+            render_many(template, opts_for_template)
+
+
+def _templates(struct: dict) -> Iterator[Template]:
+    for node in struct.values():
+        if isinstance(node, dict):
+            yield from _templates(node)
+            continue
+        content, _ = structure.resolve_leaf(node)
+        if isinstance(content, Template):
+            yield content
+
+
+_PIPELINES: Dict[Tuple[Tuple[str, str], ...], List[actions.Action]] = {}
+"""Pipelines already discovered in the process (see :obj:`update_projects`)"""
+
+
+def _update_project(path: Path, opts: dict, timeout: Optional[float] = None) -> int:
+    """Update a single project (executed in the worker processes of
+    :obj:`update_projects`), returning the number of changed files.
+    :obj:`TimeoutError` is raised before the next action, after ``timeout`` seconds.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    given = {**opts, "project_path": path, "update": True}
+    with _scaffold_context(given):
+        opts = bootstrap_options(given)
+        extensions = tuple((get_id(type(e)), e.name) for e in opts["extensions"])
+        if extensions not in _PIPELINES:
+            pipeline = _discover(opts)
+            pipeline = [a for a in pipeline if a is not actions.report_done]
+            _PIPELINES[extensions] = pipeline
+
+        struct_and_opts = ({}, opts)
+        for action in _PIPELINES[extensions]:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"interrupted after {timeout} seconds")
+            struct_and_opts = actions.invoke(struct_and_opts, action)
+
+    return _count_files(struct_and_opts[0])
+
+
+def _update_in_process(path: Path, opts: dict, timeout: float) -> int:
+    """Run :obj:`_update_project` in a new process, terminated after ``timeout``
+    seconds (executed in the threads of :obj:`update_projects`).
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    args = (sender, path, opts, timeout)
+    process = multiprocessing.Process(target=_update_and_send, args=args, daemon=True)
+    process.start()
+    sender.close()  # otherwise ``receiver`` never sees the end of the pipe
+    try:
+        if not receiver.poll(timeout):
+            raise TimeoutError(f"interrupted after {timeout} seconds")
+        succeeded, value = receiver.recv()
+    except EOFError:
+        process.join()
+        raise RuntimeError(f"worker exited with code {process.exitcode}") from None
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        receiver.close()
+
+    if succeeded:
+        return value
+    raise value
+
+
+def _update_and_send(sender, path: Path, opts: dict, timeout: float):
+    """Target of the processes in :obj:`_update_in_process`"""
+    try:
+        sender.send((True, _update_project(path, opts, timeout)))
+    except Exception as ex:
+        try:
+            sender.send((False, ex))
+        except Exception:  # e.g. exceptions that cannot be pickled
+            sender.send((False, RuntimeError(_describe(ex))))
+    finally:
+        sender.close()
+
+
+def _count_files(struct: dict) -> int:
+    return sum(_count_files(v) if isinstance(v, dict) else 1 for v in struct.values())
+
+
+def _describe(ex: Exception) -> str:
+    return f"{type(ex).__name__}: {ex}"
+
+
 def _read_existing_config(opts):
     """Read existing config files first listed in ``opts["config_files"]``
     and then ``setup.cfg`` inside ``opts["project_path"]``
@@ -0,0 +1,246 @@
+"""
+Write the project files into a (streamed) tar or zip archive instead of the disk.
+
+When the ``output_archive`` option is given to :obj:`~pyscaffold.api.create_project`
+(or ``--output-archive`` in the command line), the file operations
+(see :mod:`pyscaffold.operations`) add each file directly to the archive, without
+writing intermediate files to the disk. ``"-"`` can be used to stream the archive to
+the standard output, and any binary file object is also accepted (e.g. the response
+of a web service).
+
+Files are added to the archive one at a time (as soon as they are created), so the
+memory consumption is bounded by the size of the biggest file.
+The access permissions given by :obj:`~pyscaffold.operations.add_permissions` are
+recorded as the mode of the archive members.
+
+The file operations check the existence of files against the archive (see
+:obj:`Archive.exists`) instead of the disk, e.g. for
+:obj:`~pyscaffold.operations.no_overwrite`.
+"""
+import io
+import os
+import stat
+import sys
+import tarfile
+import time
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, Optional, Set, Tuple, Union
+
+from .log import logger
+
+PathLike = Union[str, os.PathLike]
+
+ARCHIVE_OPT = "____archive"  # we don't want this to be persisted
+
+STDOUT = "-"
+"""Special value of ``output_archive`` that represents the standard output"""
+
+FORMATS = {
+    "tar": "w|",
+    "tar.gz": "w|gz",
+    "tgz": "w|gz",
+    "tar.bz2": "w|bz2",
+    "tar.xz": "w|xz",
+    "zip": "w",
+}
+"""Archive formats (and the mode used to open the archive)"""
+
+DEFAULT_FORMAT = "tar.gz"
+
+FILE_MODE = 0o644
+DIR_MODE = 0o755
+
+
+class Archive:
+    """Archive (tar or zip) in which the files of the project are written.
+
+    Args:
+        file: path or binary file object in which the archive is written
+            (``"-"`` for the standard output)
+        format: one of :obj:`FORMATS`. By default, the format is guessed from the
+            extension of ``file`` (:obj:`DEFAULT_FORMAT` if that is not possible).
+        root: paths given to the methods of this class are relative to ``root``,
+            that is included in the archive as the top-level directory.
+    """
+
+    def __init__(
+        self,
+        file: Union[PathLike, IO[bytes]],
+        format: Optional[str] = None,
+        root: PathLike = ".",
+    ):
+        format = format or guess_format(file)
+        if format not in FORMATS:
+            choices = ", ".join(FORMATS)
+            msg = f"Invalid archive format {format!r}, choose from {choices}"
+            raise ValueError(msg)
+
+        if file == STDOUT:
+            file = sys.stdout.buffer
+        self.format = format
+        self.root = Path(root)
+        self.top = Path(self.root.resolve().name)
+        self.mtime = time.time()
+        self._pending: Optional[Tuple[str, bytes, int]] = None
+        self._directories: Set[str] = set()
+        self._files: Set[str] = set()
+
+        if format == "zip":
+            self._zip: Optional[zipfile.ZipFile] = zipfile.ZipFile(
+                file, "w", zipfile.ZIP_DEFLATED  # type: ignore
+            )
+            self._tar: Optional[tarfile.TarFile] = None
+        else:
+            kwargs = {"fileobj": file} if hasattr(file, "write") else {"name": file}
+            self._tar = tarfile.open(mode=FORMATS[format], **kwargs)  # type: ignore
+            self._zip = None
+
+    def member(self, path: PathLike) -> str:
+        """Name of the archive member that corresponds to ``path``"""
+        path = Path(path)
+        try:
+            path = self.top / path.relative_to(self.root)
+        except ValueError:
+            path = Path(*path.parts[1:]) if path.is_absolute() else path
+        return path.as_posix()
+
+    def add_file(self, path: PathLike, contents: str, encoding="utf-8") -> Path:
+        """Add a text file to the archive (equivalent to
+        :obj:`~pyscaffold.file_system.create_file`)
+        """
+        self._flush()
+        name = self.member(path)
+        self._files.add(name)
+        self._pending = (name, contents.encode(encoding), FILE_MODE)
+        # ^  the member is only written in the next call, so permissions can be added
+        logger.report("create", path)
+        return Path(path)
+
+    def add_permissions(self, path: PathLike, permissions: int) -> Optional[Path]:
+        """Add access permissions to the last file added to the archive (equivalent
+        to :obj:`~pyscaffold.file_system.chmod`).
+        Returns ``None`` if the file is not the last one added.
+        """
+        name = self.member(path)
+        if self._pending is None or self._pending[0] != name:
+            return None
+
+        _, data, mode = self._pending
+        mode = stat.S_IMODE(mode | permissions)
+        self._pending = (name, data, mode)
+        logger.report("chmod {:03o}".format(mode), path)
+        return Path(path)
+
+    def exists(self, path: PathLike) -> bool:
+        """Check if ``path`` was added to the archive (as a file or directory)"""
+        name = self.member(path)
+        return name in self._files or name in self._directories
+
+    def remove(self, path: PathLike) -> Optional[Path]:
+        """Remove the last file added to the archive (equivalent to
+        :obj:`~pyscaffold.file_system.rm_rf`).
+        Members already written cannot be removed from a (streamed) archive, in that
+        case ``None`` is returned.
+        """
+        name = self.member(path)
+        if self._pending is None or self._pending[0] != name:
+            if self.exists(path):
+                logger.warning("Cannot remove %s, already written to the archive", path)
+            return None
+
+        self._pending = None
+        self._files.discard(name)
+        logger.report("remove", path)
+        return Path(path)
+
+    def add_directory(self, path: PathLike) -> Optional[Path]:
+        """Add a directory to the archive (equivalent to
+        :obj:`~pyscaffold.file_system.create_directory`)
+        """
+        name = self.member(path)
+        if name in self._directories:
+            return None
+
+        self._flush()
+        self._directories.add(name)
+        if self._tar:
+            info = self._tarinfo(name, tarfile.DIRTYPE, DIR_MODE)
+            self._tar.addfile(info)
+        elif self._zip:
+            zinfo = self._zipinfo(name + "/", stat.S_IFDIR | DIR_MODE)
+            zinfo.external_attr |= 0x10  # MS-DOS directory flag
+            self._zip.writestr(zinfo, b"")
+
+        logger.report("create", path)
+        return Path(path)
+
+    def close(self):
+        """Write the pending members and finish the archive
+        (the given file object is not closed)
+        """
+        self._flush()
+        if self._tar:
+            self._tar.close()
+        if self._zip:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _flush(self):
+        if self._pending is None:
+            return
+
+        name, data, mode = self._pending
+        self._pending = None
+        if self._tar:
+            info = self._tarinfo(name, tarfile.REGTYPE, mode)
+            info.size = len(data)
+            self._tar.addfile(info, io.BytesIO(data))
+        elif self._zip:
+            self._zip.writestr(self._zipinfo(name, stat.S_IFREG | mode), data)
+
+    def _tarinfo(self, name: str, type: bytes, mode: int) -> tarfile.TarInfo:
+        info = tarfile.TarInfo(name)
+        info.type = type
+        info.mode = mode
+        info.mtime = int(self.mtime)
+        return info
+
+    def _zipinfo(self, name: str, mode: int) -> zipfile.ZipInfo:
+        date_time = time.localtime(self.mtime)[:6]
+        zinfo = zipfile.ZipInfo(name, date_time=date_time)  # type: ignore
+        zinfo.external_attr = mode << 16
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        return zinfo
+
+
+def guess_format(file: Union[PathLike, IO[bytes]], default=DEFAULT_FORMAT) -> str:
+    """Guess the archive format from the extension of ``file``"""
+    name = str(getattr(file, "name", file))
+    matches = [f for f in FORMATS if name.endswith(f".{f}")]
+    return max(matches, key=len) if matches else default
+
+
+@contextmanager
+def writing(opts: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Open the archive given by the ``output_archive`` option (if any) and yield
+    a copy of ``opts`` that makes the file operations write to it.
+    The archive is finished when the ``with`` block ends.
+
+    When ``pretend`` is ``True``, no archive is written (the operations are just
+    logged, as usual).
+    """
+    file = opts.get("output_archive")
+    if file is None or opts.get("pretend"):
+        yield opts
+        return
+
+    root = opts.get("project_path", ".")
+    with Archive(file, opts.get("output_archive_format"), root) as archive:
+        yield {**opts, ARCHIVE_OPT: archive}
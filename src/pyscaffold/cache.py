@@ -0,0 +1,324 @@
+"""
+Opt-in cache for the files generated by :obj:`~pyscaffold.structure.create_structure`.
+
+When the ``scaffold_cache`` option is given (``--scaffold-cache [DIR]`` in the command
+line), the files written for a new project are stored in the cache under a key that
+considers the PyScaffold version, the activated extensions (names and versions), the
+(normalised) options, including date/year/author fields, and the hash of the
+templates (PyScaffold's, the ``templates`` package of the activated extensions and
+the template packs given with ``--templates``).
+Creating another project with the same key simply replays the stored files
+(the templates are not rendered again). Options with values that cannot be
+identified reliably (e.g. arbitrary objects or lambdas) disable the cache.
+
+The cache is bounded in size (``scaffold_cache_max_size`` option, :obj:`MAX_SIZE` by
+default), the least recently used entries are evicted first.
+The command ``putup cache stats|clear`` can be used to inspect/empty the cache.
+
+Note:
+    Custom extensions are identified by the ``__version__`` of their top-level
+    package. Please make sure it changes when the generated files change.
+"""
+import hashlib
+import json
+import os
+import stat
+import sys
+import threading
+from contextlib import suppress
+from datetime import date
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from . import __version__ as pyscaffold_version
+from . import file_system as fs
+from . import info, operations, templates
+from .templates import packs as template_packs
+from .archive import ARCHIVE_OPT
+from .identification import get_id
+from .log import logger
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .actions import Action, ActionParams, ScaffoldOpts, Structure
+
+CACHE_OPT = "scaffold_cache"
+"""Name of the option that enables the cache (``True`` or the cache directory)"""
+
+MAX_SIZE = 100 * 1024**2
+"""Default maximum size of the cache (in bytes)"""
+
+CACHED_ACTION = "pyscaffold.structure:create_structure"
+
+EXCLUDED_OPTS = {
+    "project_path",  # files are stored relative to the project
+    "config_files",  # their contents are already merged in the opts
+    "extensions",  # considered separately
+    "middleware",
+    "command",
+    "log_level",
+    "run_id",
+    "trace",
+    "trace_format",
+    "parallel",
+    "graph",
+    CACHE_OPT,
+    "scaffold_cache_max_size",
+    "dedup",
+}
+"""Options that do not influence the generated files"""
+
+SUFFIX = ".json"
+
+
+class NotCacheable(TypeError):
+    """The options contain a value that cannot be part of a cache key"""
+
+
+def middleware(
+    action_id: str, proceed: "Action", struct: "Structure", opts: "ScaffoldOpts"
+) -> "ActionParams":
+    """:obj:`~pyscaffold.actions.Middleware` that caches the files written by
+    :obj:`~pyscaffold.structure.create_structure` (or replays them in a cache hit).
+
+    The cache is only used for new projects written to the disk with the default
+    templates (i.e. it is ignored when ``update``, ``force``, ``pretend``,
+    ``output_archive`` or ``templates`` are given).
+    """
+    directory = cache_dir(opts)
+    if action_id != CACHED_ACTION or directory is None or not cacheable(opts):
+        return proceed(struct, opts)
+
+    try:
+        entry = directory / f"{key(opts)}{SUFFIX}"
+    except NotCacheable as ex:
+        logger.debug("Scaffold cache not used: %s", ex)
+        return proceed(struct, opts)
+
+    try:
+        files, folders = _load(entry)
+    except (OSError, ValueError):
+        changed, opts = proceed(struct, opts)
+        _store(entry, Path(opts.get("project_path", ".")), changed)
+        evict(directory, opts.get("scaffold_cache_max_size", MAX_SIZE))
+        return changed, opts
+
+    with suppress(OSError):
+        os.utime(str(entry))  # mark as recently used
+    logger.report("replay", entry)
+    return replay(files, folders, opts), opts
+
+
+def cacheable(opts: "ScaffoldOpts") -> bool:
+    """``True`` if the files generated with the given options can be cached"""
+    ignored = ("update", "force", "pretend", "output_archive", "templates", ARCHIVE_OPT)
+    return not any(opts.get(k) for k in ignored)
+
+
+def cache_dir(opts: Optional["ScaffoldOpts"] = None) -> Optional[Path]:
+    """Directory where the cached scaffolds are stored (might not exist yet)"""
+    given = (opts or {}).get(CACHE_OPT)
+    if given and given is not True:
+        return Path(given)
+    cache = info.cache_dir(default=None)
+    return cache / "scaffolds" if cache else None
+
+
+def key(opts: "ScaffoldOpts") -> str:
+    """Identify the files generated for the given options.
+    :obj:`NotCacheable` is raised when an option has no stable representation.
+    """
+    relevant = {
+        k: _normalise(v, k)
+        for k, v in opts.items()
+        if k not in EXCLUDED_OPTS and not k.startswith("____")  # private
+    }
+    extensions = opts.get("extensions", [])
+    data = {
+        "pyscaffold": pyscaffold_version,
+        "extensions": sorted(_extension_id(e) for e in extensions),
+        "opts": relevant,
+        "templates": templates_hash(extensions),
+    }
+    serialised = json.dumps(data, sort_keys=True)
+    return hashlib.sha256(serialised.encode("utf-8")).hexdigest()
+
+
+def templates_hash(extensions: Iterable[Any] = ()) -> str:
+    """Hash of the contents of the templates available for the scaffold: the packs
+    activated with :obj:`pyscaffold.templates.packs.using` (e.g. ``--templates``),
+    the ``templates`` package next to the module of each one of the given extensions
+    (if any) and the templates shipped with PyScaffold.
+
+    The templates are read via their packs (so zipped installs and the bundled
+    templates are supported) every time, so changes in the files are considered.
+    """
+    packs = [*template_packs.active()]
+    packs.extend(filter(None, map(_extension_pack, extensions)))
+    packs.append(template_packs.package_pack(templates.__name__))
+    digest = hashlib.sha256()
+    for pack in packs:
+        for name in pack.names():
+            digest.update(f"{name}\0{pack.read(name)}\0".encode("utf-8"))
+        digest.update(b"\1")  # end of the pack
+    return digest.hexdigest()
+
+
+def _extension_pack(extension: Any) -> Optional[template_packs.TemplatePack]:
+    """Pack for the ``templates`` package next to the module of the extension"""
+    module = sys.modules.get(type(extension).__module__)
+    if module is None:
+        return None
+    package = module.__name__ if hasattr(module, "__path__") else module.__package__
+    if not package:
+        return None  # top-level modules: ``templates`` would be ambiguous
+    try:
+        return template_packs.package_pack(f"{package}.templates")
+    except ImportError:
+        return None
+
+
+def replay(
+    files: List[Tuple[str, str, int]], folders: List[str], opts: "ScaffoldOpts"
+) -> "Structure":
+    """Write the cached files to the disk and return the equivalent
+    (nested dict) representation of the changed files (as
+    :obj:`~pyscaffold.structure.create_structure` does).
+    """
+    root = Path(opts.get("project_path", "."))
+    changed: dict = {}
+    fs.create_directory(root)
+    for folder in folders:
+        fs.create_directory(root / folder)
+        _nested(changed, folder.split("/"))
+
+    for name, content, executable in files:
+        path = root / name
+        operations.create(path, content, opts)
+        if executable:
+            fs.chmod(path, path.stat().st_mode | executable)
+        *parents, basename = name.split("/")
+        _nested(changed, parents)[basename] = content
+
+    return changed
+
+
+def stats(directory: Optional[Path] = None) -> Dict[str, Any]:
+    """Number of entries and total size (in bytes) of the cache"""
+    directory = directory or cache_dir()
+    entries = list(_entries(directory)) if directory else []
+    size = sum(e.stat().st_size for e in entries)
+    return {"directory": directory, "entries": len(entries), "size": size}
+
+
+def clear(directory: Optional[Path] = None) -> int:
+    """Remove all the entries in the cache and return how many were removed"""
+    directory = directory or cache_dir()
+    count = 0
+    for entry in _entries(directory) if directory else []:
+        with suppress(FileNotFoundError):
+            entry.unlink()
+            count += 1
+    return count
+
+
+def evict(directory: Path, max_size: int = MAX_SIZE):
+    """Remove the least recently used entries, so the cache does not exceed
+    ``max_size`` bytes
+    """
+    entries = [(e, e.stat()) for e in _entries(directory)]
+    entries.sort(key=lambda e: e[1].st_mtime, reverse=True)
+    total = 0
+    for entry, info_ in entries:
+        total += info_.st_size
+        if total > max_size:
+            with suppress(FileNotFoundError):
+                entry.unlink()
+
+
+# -------- Auxiliary functions --------
+
+
+def _entries(directory: Path) -> Iterator[Path]:
+    if directory.is_dir():
+        yield from directory.glob(f"*{SUFFIX}")
+
+
+def _normalise(value: Any, name: str) -> Any:
+    """JSON-compatible representation of an option value (``name`` is only used in
+    the error message)
+    """
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): _normalise(v, name) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_normalise(v, name) for v in value]
+        return items if isinstance(value, (list, tuple)) else sorted(items, key=repr)
+    if isinstance(value, os.PathLike):
+        return Path(value).as_posix()
+    if isinstance(value, date):  # also datetime
+        return value.isoformat()
+    if hasattr(value, "activate") and hasattr(value, "name"):  # extension
+        return _extension_id(value)
+    if callable(value) and "<" not in get_id(value):  # e.g. <lambda> or <locals>
+        return get_id(value)
+    raise NotCacheable(f"option {name!r} has no stable representation: {value!r}")
+
+
+def _extension_id(extension: Any) -> str:
+    package = type(extension).__module__.split(".")[0]
+    version = getattr(sys.modules.get(package), "__version__", "")
+    return f"{getattr(extension, 'name', package)}=={version}"
+
+
+def _nested(struct: dict, parts: List[str]) -> dict:
+    for part in parts:
+        struct = struct.setdefault(part, {})
+    return struct
+
+
+def _flatten(struct: "Structure", prefix: str = "") -> Iterator[Tuple[str, Any]]:
+    """Yield (relative path, content) for files and (relative path, None) for
+    folders
+    """
+    for name, node in struct.items():
+        relative = f"{prefix}{name}"
+        if isinstance(node, dict):
+            yield relative, None
+            yield from _flatten(node, relative + "/")
+        else:
+            yield relative, node  # type: ignore
+
+
+def _store(entry: Path, root: Path, changed: "Structure"):
+    files, folders = [], []
+    for relative, content in _flatten(changed):
+        if content is None:
+            folders.append(relative)
+        elif isinstance(content, str):
+            executable = stat.S_IMODE((root / relative).stat().st_mode) & 0o111
+            files.append((relative, content, executable))
+        else:
+            return  # unexpected content, better not cache
+
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    tmp = entry.with_name(f"{entry.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    # ^  write to a temporary file, so concurrent processes don't conflict
+    data = {"files": files, "folders": folders}
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(str(tmp), str(entry))
+    logger.report("cache", entry)
+
+
+def _load(entry: Path) -> Tuple[List[Tuple[str, str, int]], List[str]]:
+    data = json.loads(entry.read_text(encoding="utf-8"))
+    return [tuple(f) for f in data["files"]], data["folders"]  # type: ignore
@@ -5,19 +5,22 @@ Command-Line-Interface of PyScaffold
 import argparse
 import logging
 import sys
+from collections import Counter
+from pathlib import Path
 from typing import List, Optional
 
 from packaging.version import Version
 
 from . import __version__ as pyscaffold_version
-from . import api, templates
+from . import api, archive, cache, dedup, templates, tracing
 from .actions import ScaffoldOpts
+from .actions import dependency_graph
 from .actions import discover as discover_actions
 from .dependencies import check_setuptools_version
 from .exceptions import exceptions2exit
 from .extensions import list_from_entry_points as list_all_extensions
 from .identification import get_id
-from .info import best_fit_license
+from .info import best_fit_license, find_projects
 from .log import ReportFormatter, logger
 from .shell import shell_command_error2exit_decorator
 
@@ -127,6 +130,31 @@ def add_default_args(parser: argparse.ArgumentParser):
         help="update an existing project by replacing the most important files"
         " like setup.py etc. Use additionally --force to replace all scaffold files.",
     )
+    parser.add_argument(
+        "--update-all",
+        dest="command",
+        action="store_const",
+        const=update_all,
+        help="update all the projects generated with PyScaffold inside PROJECT_PATH "
+        "(in parallel), skipping the ones already in the current version",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        required=False,
+        help="number of processes used by --update-all (default: number of CPUs)",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--timeout",
+        dest="timeout",
+        type=float,
+        required=False,
+        help="maximum time spent updating each project with --update-all "
+        "(the process updating it is then terminated)",
+        metavar="SECONDS",
+    )
 
     # The following are basically for the CLI options, so having a default value is OK.
     parser.add_argument(
@@ -140,6 +168,85 @@ def add_default_args(parser: argparse.ArgumentParser):
         const=list_actions,
         help="do not create project, but show a list of planned actions",
     )
+    parser.add_argument(
+        "--graph",
+        dest="graph",
+        action="store_true",
+        required=False,
+        help="show which actions each planned action depends on "
+        "(use together with --list-actions)",
+    )
+    parser.add_argument(
+        "--parallel",
+        dest="parallel",
+        action="store_true",
+        required=False,
+        help="run independent actions concurrently "
+        "(e.g. create the virtual environment while initialising the git repository)",
+    )
+    parser.add_argument(
+        "--output-archive",
+        dest="output_archive",
+        required=False,
+        help="write the project files into a tar/zip archive FILE (use - for the "
+        "standard output) instead of the disk",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--output-archive-format",
+        dest="output_archive_format",
+        choices=list(archive.FORMATS),
+        required=False,
+        help="format of the archive (by default guessed from the extension of FILE, "
+        f"or {archive.DEFAULT_FORMAT})",
+    )
+    parser.add_argument(
+        "--templates",
+        dest="templates",
+        action="append",
+        required=False,
+        help="use the templates in PATH (directory, zip/wheel archive or Python "
+        "package) instead of the default ones with the same name (can be repeated, "
+        "the first ones take precedence)",
+        metavar="PATH",
+    )
+    parser.add_argument(
+        "--dedup",
+        dest="dedup",
+        nargs="?",
+        const=dedup.REFLINK,
+        choices=dedup.MODES,
+        required=False,
+        help="create files identical to the ones already written in the same run as "
+        f"links (default: {dedup.REFLINK}, copy-on-write clones if supported by the "
+        "file system)",
+        metavar="MODE",
+    )
+    parser.add_argument(
+        "--scaffold-cache",
+        dest="scaffold_cache",
+        nargs="?",
+        const=True,
+        required=False,
+        help="reuse the files generated for previous projects with the same options "
+        "(stored in DIR), see also `putup cache stats|clear`",
+        metavar="DIR",
+    )
+    parser.add_argument(
+        "--trace",
+        dest="trace",
+        required=False,
+        help="record a trace of the executed actions, file operations and commands "
+        "to FILE (useful for diagnosing slow runs)",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--trace-format",
+        dest="trace_format",
+        choices=tracing.FORMATS,
+        required=False,
+        help=f"format used in the trace FILE (default: {tracing.DEFAULT_FORMAT})",
+    )
 
 
 def add_extension_args(parser: argparse.ArgumentParser):
@@ -234,6 +341,32 @@ def run_scaffold(opts: ScaffoldOpts):
         print(note.format(base_version))
 
 
+def update_all(opts: ScaffoldOpts):
+    """Update all the projects found inside ``project_path`` and print a summary
+
+    Args:
+        opts (dict): command line options as dictionary
+    """
+    excluded = ("project_path", "command", "workers", "timeout")
+    given = {k: v for k, v in opts.items() if k not in excluded and v is not None}
+    projects = find_projects(opts["project_path"])
+    workers, timeout = opts.get("workers"), opts.get("timeout")
+    results = api.update_projects(projects, workers, timeout, given)
+
+    counts = Counter(result.status for result in results)
+    changed = sum(result.changed for result in results)
+    print(
+        f"updated: {counts['updated']}, skipped: {counts['skipped']}, "
+        f"failed: {counts['failed']}, files changed: {changed}"
+    )
+    for result in results:
+        if result.error:
+            print(ReportFormatter.SPACING + f"{result.path}: {result.error}")
+
+    if counts["failed"]:
+        raise SystemExit(1)
+
+
 def list_actions(opts: ScaffoldOpts):
     """Do not create a project, just list actions considering extensions
 
@@ -241,10 +374,39 @@ def list_actions(opts: ScaffoldOpts):
         opts (dict): command line options as dictionary
     """
     actions = discover_actions(opts.get("extensions", []))
+    graph = opts.get("graph")
+    deps = dependency_graph(actions, opts) if graph else [set()] * len(actions)
 
     print("Planned Actions:")
-    for action in actions:
+    for action, action_deps in zip(actions, deps):
         print(ReportFormatter.SPACING + get_id(action))
+        for i in sorted(action_deps):
+            print(ReportFormatter.SPACING * 3 + "after " + get_id(actions[i]))
+
+
+def cache_command(args: List[str]):
+    """Inspect (``stats``) or empty (``clear``) the cache used by ``--scaffold-cache``
+
+    Args:
+        args: command line arguments (after ``putup cache``)
+    """
+    msg = "Inspect or empty the cache used by --scaffold-cache"
+    parser = argparse.ArgumentParser(prog="putup cache", description=msg)
+    parser.add_argument("subcommand", choices=CACHE_COMMANDS)
+    parser.add_argument("--dir", type=Path, help="cache directory", metavar="DIR")
+    opts = parser.parse_args(args)
+
+    if opts.subcommand == "clear":
+        print(f"{cache.clear(opts.dir)} entries removed")
+        return
+
+    data = cache.stats(opts.dir)
+    print(f"directory: {data['directory']}")
+    print(f"entries: {data['entries']}")
+    print(f"size: {data['size']} bytes")
+
+
+CACHE_COMMANDS = ("stats", "clear")
 
 
 def main(args: List[str]):
@@ -253,6 +415,9 @@ def main(args: List[str]):
     Args:
         args: command line arguments
     """
+    if args[:1] == ["cache"] and args[1:2] and args[1] in CACHE_COMMANDS:
+        return cache_command(args[1:])
+
     check_setuptools_version()
     opts = parse_args(args)
     opts["command"](opts)
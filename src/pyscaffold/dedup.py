@@ -0,0 +1,171 @@
+"""
+Opt-in deduplication of identical files across the generated projects.
+
+When the ``dedup`` option is given (``--dedup [reflink|hardlink]`` in the command
+line), :obj:`~pyscaffold.operations.create` keeps a content-hash :obj:`Store` for the
+run. Files with contents identical to a file created before (e.g. ``docs/Makefile``,
+``.coveragerc`` or license texts, when many projects are created with
+:obj:`~pyscaffold.api.create_projects`) are materialised as links instead of being
+written again:
+
+- ``reflink`` (default): copy-on-write clones (Linux ``FICLONE``, e.g. Btrfs, XFS),
+  the files share the data blocks but are still independent files;
+- ``hardlink``: the files share the same inode (and therefore also the permissions).
+  Changing one of them in place would change all the others, so this mode has to be
+  explicitly requested. The file operations in PyScaffold break the link before
+  writing or changing the permissions of a shared file (see :obj:`unshare`).
+
+When a link cannot be created (e.g. the file system does not support it, or the files
+are in different devices), the file is simply written to the disk.
+"""
+import errno
+import hashlib
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from . import file_system as fs
+from .log import logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore  # e.g. Windows
+
+DEDUP_OPT = "____dedup"  # we don't want this to be persisted
+
+REFLINK = "reflink"
+HARDLINK = "hardlink"
+MODES = (REFLINK, HARDLINK)
+
+FICLONE = 0x40049409
+"""``ioctl`` request for copy-on-write clones in Linux (``_IOW(0x94, 9, int)``)"""
+
+UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS}
+"""Error codes indicating that links are not supported (by the OS or file system)"""
+
+
+class Store:
+    """Content-hash store of the files created in a run (safe to be shared between
+    threads, e.g. by :obj:`~pyscaffold.api.create_projects`).
+
+    Args:
+        mode: one of :obj:`MODES`
+    """
+
+    def __init__(self, mode: str = REFLINK):
+        if mode not in MODES:
+            choices = ", ".join(MODES)
+            raise ValueError(f"Invalid dedup mode {mode!r}, choose from {choices}")
+        self.mode = mode
+        self._files: Dict[str, Path] = {}
+        self._pending: Dict[str, threading.Event] = {}  # digests being written
+        self._lock = threading.Lock()
+        self._supported = True  # stop trying after the first unsupported link
+
+    def create(self, path: Path, contents: str, encoding="utf-8") -> Path:
+        """Create a file with the given contents, as a link to an identical file
+        (when possible) or by writing it to the disk (equivalent to
+        :obj:`~pyscaffold.file_system.create_file`).
+        """
+        digest = hashlib.sha256(contents.encode(encoding)).hexdigest()
+        with self._lock:
+            source = self._files.get(digest)
+            pending = self._pending.get(digest)
+            if source is None and pending is None:
+                # Reserve the digest, so other threads wait instead of writing it too
+                self._pending[digest] = threading.Event()
+
+        if source is None and pending is None:
+            return self._write(digest, path, contents, encoding)
+
+        if source is None:
+            pending.wait()  # type: ignore[union-attr]
+            with self._lock:
+                source = self._files.get(digest)
+
+        if source is not None and source != path and self._supported:
+            unshare(path)
+            try:
+                (hardlink if self.mode == HARDLINK else reflink)(source, path)
+                logger.report("link", path, target=source)
+                return path
+            except OSError as ex:  # e.g. different devices or the source was removed
+                self._supported = ex.errno not in UNSUPPORTED
+
+        fs.create_file(path, contents, encoding=encoding)
+        with self._lock:
+            self._files.setdefault(digest, path)
+        return path
+
+    def _write(self, digest: str, path: Path, contents: str, encoding: str) -> Path:
+        """Write the first file with the given digest and release the reservation"""
+        written = False
+        try:
+            unshare(path)
+            fs.create_file(path, contents, encoding=encoding)
+            written = True
+        finally:
+            with self._lock:
+                if written:
+                    self._files.setdefault(digest, path)
+                # waiting threads simply write the file when the source is missing
+                self._pending.pop(digest).set()
+        return path
+
+
+def enable(opts: Dict[str, Any], stores: Optional[Dict[str, Store]] = None):
+    """Return a copy of ``opts`` with the :obj:`Store` used by the file operations,
+    when the ``dedup`` option is given (``True`` is equivalent to ``"reflink"``).
+    Different calls can share the same stores via the ``stores`` dict (mode => store).
+    """
+    mode = opts.get("dedup")
+    if not mode or opts.get(DEDUP_OPT):
+        return opts
+
+    mode = REFLINK if mode is True else mode
+    if stores is None:
+        return {**opts, DEDUP_OPT: Store(mode)}
+    if mode not in stores:
+        stores[mode] = Store(mode)
+    return {**opts, DEDUP_OPT: stores[mode]}
+
+
+def unshare(path: Path):
+    """Make sure ``path`` does not share its inode with other files, so it can be
+    changed in place (e.g. re-written or ``chmod``-ed in an update) without affecting
+    the other projects created with ``--dedup hardlink``.
+    The link is broken by replacing ``path`` with an independent copy.
+    """
+    try:
+        stat = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if stat.st_nlink < 2 or not os.path.isfile(path):
+        return
+    contents = Path(path).read_bytes()
+    os.unlink(path)
+    Path(path).write_bytes(contents)
+    os.chmod(path, stat.st_mode & 0o7777)
+    logger.report("unlink", path)
+
+
+def reflink(source: Path, target: Path):
+    """Create ``target`` as a copy-on-write clone of ``source``
+    (raises :obj:`OSError` when not supported)
+    """
+    if fcntl is None or not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported", str(target))
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def hardlink(source: Path, target: Path):
+    """Create ``target`` as a hard link to ``source`` (replacing ``target`` if it
+    already exists)
+    """
+    if os.path.lexists(target):
+        os.unlink(target)
+    os.link(source, target)
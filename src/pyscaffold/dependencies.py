@@ -1,6 +1,7 @@
 """Internal library for manipulating package dependencies and requirements."""
 
 import re
+from functools import lru_cache
 from itertools import chain
 from typing import Iterable, List
 
@@ -75,18 +76,24 @@ def deduplicate(requirements: Iterable[str]) -> List[str]:
     "packaging>20.0"]``, remove the duplicated packages.
     If a package is duplicated, the last occurrence stays.
     """
-    return list({Requirement(r).name: r for r in requirements}.values())
+    return list({_name(r): r for r in requirements}.values())
 
 
 def remove(requirements: Iterable[str], to_remove: Iterable[str]) -> List[str]:
     """Given a list of individual requirement strings, e.g.  ``["appdirs>=1.4.4",
     "packaging>20.0"]``, remove the requirements in ``to_remove``.
     """
-    removable = {Requirement(r).name for r in to_remove}
-    return [r for r in requirements if Requirement(r).name not in removable]
+    removable = {_name(r) for r in to_remove}
+    return [r for r in requirements if _name(r) not in removable]
 
 
 def add(requirements: Iterable[str], to_add: Iterable[str] = BUILD) -> List[str]:
     """Given a sequence of individual requirement strings, add ``to_add`` to it.
     By default adds :obj:`BUILD` if ``to_add`` is not given."""
     return deduplicate(chain(requirements, to_add))
+
+
+@lru_cache(maxsize=1024)
+def _name(requirement: str) -> str:
+    # Parsing requirements is expensive and the same ones are used for every project
+    return Requirement(requirement).name
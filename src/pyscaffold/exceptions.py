@@ -172,3 +172,14 @@ class ErrorLoadingExtension(RuntimeError):
         message = cast(str, self.__doc__)
         message = message.format(extension=extension, version=pyscaffold_version)
         super().__init__(message)
+
+
+class ErrorLoadingTemplates(RuntimeError):
+    """Could not load the templates in '{location}'.
+    Please make sure it is an existing directory, a zip archive (e.g. a wheel) or the
+    name of an installed Python package.
+    """
+
+    def __init__(self, location: str = ""):
+        message = cast(str, self.__doc__).format(location=location)
+        super().__init__(message)
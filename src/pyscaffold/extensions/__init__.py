@@ -128,6 +128,7 @@ def include(*extensions: Extension) -> Type[argparse.Action]:
 def store_with(*extensions: Extension) -> Type[argparse.Action]:
     """Create a custom :obj:`argparse.Action` that stores the value of the given option
     in addition to saving the extension for activation.
+    For flags (``nargs=0``), the given ``const`` is stored instead.
 
     Args:
         *extensions: extension objects to be saved for activation
@@ -141,7 +142,7 @@ def store_with(*extensions: Extension) -> Type[argparse.Action]:
 
         def __call__(self, parser, namespace, values, option_string=None):
             super().__call__(parser, namespace, values, option_string)
-            setattr(namespace, self.dest, values)
+            setattr(namespace, self.dest, self.const if self.nargs == 0 else values)
 
     return AddExtensionAndStore
 
@@ -29,7 +29,7 @@ from argparse import Action, ArgumentParser
 from collections import abc
 from functools import lru_cache, reduce
 from itertools import chain
-from typing import List, Optional, Set
+from typing import FrozenSet, List, Optional
 
 from .. import api, cli, file_system, shell, templates
 from ..actions import ScaffoldOpts as Opts
@@ -63,7 +63,7 @@ Extension classes (or instances) can also provide configurations by defining a
 
 
 @lru_cache(maxsize=2)
-def get_config(kind: str) -> Set[str]:
+def get_config(kind: str) -> FrozenSet[str]:
     """Get configurations that will be used for generating examples
     (from both :obj:`CONFIG` and the ``interactive`` attribute of each extension).
 
@@ -71,6 +71,7 @@ def get_config(kind: str) -> Set[str]:
 
     This function is cached to improve performance. Call ``get_config.__wrapped__`` to
     bypass the cache (or ``get_config.cache_clear``, see :obj:`functools.lru_cache`).
+    The returned value is immutable, so it can be safely shared between threads.
     """
     # TODO: when `python_requires >= 3.8` use Literal["ignore", "comment"] instead of
     #       str for type annotation of kind
@@ -85,7 +86,7 @@ def get_config(kind: str) -> Set[str]:
         extension_config_dict = getattr(extension, CONFIG_KEY, empty_config)
         return accumulated_config.union(set(extension_config_dict.get(kind, [])))
 
-    return reduce(_merge_config, list_all_extensions(), initial_value)
+    return frozenset(reduce(_merge_config, list_all_extensions(), initial_value))
 
 
 class Interactive(Extension):
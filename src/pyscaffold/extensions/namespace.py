@@ -13,7 +13,7 @@ from typing import List, cast
 
 from ..actions import Action, ActionParams, ScaffoldOpts, Structure
 from ..exceptions import InvalidIdentifier
-from ..file_system import chdir, move
+from ..file_system import move
 from ..identification import is_valid_identifier
 from ..log import logger
 from ..operations import remove
@@ -127,29 +127,28 @@ def move_old_package(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
             directory structure as dictionary of dictionaries and input options
     """
     project_path = Path(opts.get("project_path", "."))
-    with chdir(project_path, log=True, **opts):
-        old_path = Path("src", opts["package"])
-        namespace_path = opts["qual_pkg"].replace(".", os.sep)
-        target = Path("src", namespace_path)
-
-        old_exists = opts["pretend"] or old_path.is_dir()
-        #  ^  When pretending, pretend also an old folder exists
-        #     to show a worst case scenario log to the user...
-
-        if old_exists and opts["qual_pkg"] != opts["package"]:
-            if not opts["pretend"]:
-                logger.warning(
-                    "\nA folder %r exists in the project directory, and it "
-                    "is likely to have been generated by a PyScaffold "
-                    "extension or manually by one of the current project "
-                    "authors.\n"
-                    "Moving it to %r, since a namespace option was passed.\n"
-                    "Please make sure to edit all the files that depend on  "
-                    "this package to ensure the correct location.\n",
-                    opts["package"],
-                    namespace_path,
-                )
-
-            move(old_path, target=target, log=True, pretend=opts["pretend"])
+    old_path = project_path / "src" / opts["package"]
+    namespace_path = opts["qual_pkg"].replace(".", os.sep)
+    target = project_path / "src" / namespace_path
+
+    old_exists = opts["pretend"] or old_path.is_dir()
+    #  ^  When pretending, pretend also an old folder exists
+    #     to show a worst case scenario log to the user...
+
+    if old_exists and opts["qual_pkg"] != opts["package"]:
+        if not opts["pretend"]:
+            logger.warning(
+                "\nA folder %r exists in the project directory, and it "
+                "is likely to have been generated by a PyScaffold "
+                "extension or manually by one of the current project "
+                "authors.\n"
+                "Moving it to %r, since a namespace option was passed.\n"
+                "Please make sure to edit all the files that depend on  "
+                "this package to ensure the correct location.\n",
+                opts["package"],
+                namespace_path,
+            )
+
+        move(old_path, target=target, log=True, pretend=opts["pretend"])
 
     return struct, opts
@@ -3,23 +3,31 @@ Extension that generates configuration files for Yelp `pre-commit`_.
 
 .. _pre-commit: http://pre-commit.com
 """
+import argparse
+import shlex
+import sys
 from functools import partial
+from importlib.util import find_spec
+from pathlib import Path
 from typing import List
 
 from .. import shell, structure
-from ..actions import Action, ActionParams, ScaffoldOpts, Structure
+from ..actions import Action, ActionParams, ScaffoldOpts, Structure, declare
 from ..exceptions import ShellCommandException
-from ..file_system import chdir
 from ..log import logger
 from ..operations import FileOp, no_overwrite
 from ..structure import AbstractContent, ResolvedLeaf
 from ..templates import get_template
-from . import Extension, venv
+from . import Extension, store_with, venv
 
 EXECUTABLE = "pre-commit"
 CMD_OPT = "____command-pre_commit"  # we don't want this to be persisted
 INSERT_AFTER = ".. _pyscaffold-notes:\n"
 
+HOOK_TEMPLATE_START = "# start templated\n"
+HOOK_TEMPLATE_END = "# end templated\n"
+HOOK_MARKER = "File generated by pre-commit"
+
 UPDATE_MSG = """
 It is a good idea to update the hooks to the latest version:
 
@@ -63,6 +71,20 @@ changes::
 class PreCommit(Extension):
     """Generate pre-commit configuration file"""
 
+    def augment_cli(self, parser: argparse.ArgumentParser):
+        """See :obj:`~pyscaffold.extension.Extension.augment_cli`."""
+        super().augment_cli(parser)
+        parser.add_argument(
+            "--pre-commit-shim",
+            action=store_with(self),
+            nargs=0,
+            const=True,
+            default=argparse.SUPPRESS,
+            help="write the git hook script directly instead of running "
+            "`pre-commit install` (no extra process is spawned)",
+        )
+        return self
+
     def activate(self, actions: List[Action]) -> List[Action]:
         """Activate extension
 
@@ -104,20 +126,46 @@ def find_executable(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     else:
         # We can try to add it for venv to install... it will only work if the user is
         # already creating a venv anyway.
-        opts.setdefault("venv_install", []).extend(["pre-commit"])
+        opts["venv_install"] = [*opts.get("venv_install", []), "pre-commit"]
 
     return struct, opts
 
 
+@declare(
+    reads=[
+        "opts/project_path",
+        "opts/venv",
+        "opts/pretend",
+        "opts/pre_commit_shim",
+        f"opts/{CMD_OPT}",
+        venv.resource,
+    ],
+    writes=["disk/.git"],
+)
 def install(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
-    """Attempts to install pre-commit in the project"""
+    """Attempts to install pre-commit in the project
+
+    When the ``pre_commit_shim`` option is given, the git hook is written directly
+    (see :obj:`write_hook`), instead of running ``pre-commit install``.
+    """
     project_path = opts.get("project_path", "PROJECT_DIR")
+    if opts.get("pre_commit_shim"):
+        if write_hook(opts):
+            logger.warning(SUCCESS_MSG)
+            return struct, opts
+        logger.warning(INSTALL_MSG.format(project_path=project_path))
+        return struct, opts
+
     pre_commit = opts.get(CMD_OPT) or shell.get_command(EXECUTABLE, venv.get_path(opts))
     # ^  try again after venv, maybe it was installed
     if pre_commit:
         try:
-            with chdir(opts.get("project_path", "."), **opts):
-                pre_commit("install", log=True, pretend=opts.get("pretend"))
+            pre_commit(
+                "install",
+                cwd=opts.get("project_path", "."),
+                log=True,
+                pretend=opts.get("pretend"),
+            )
             logger.warning(SUCCESS_MSG)
             return struct, opts
         except ShellCommandException:
@@ -127,6 +175,64 @@ def install(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     return struct, opts
 
 
+def write_hook(opts: ScaffoldOpts, hook_type: str = "pre-commit") -> bool:
+    """Write the git hook script in the same way ``pre-commit install`` would do.
+
+    The hook template shipped with the installed version of ``pre-commit`` is used
+    when available (otherwise a copy bundled with PyScaffold is used). An existing
+    hook that was not generated by ``pre-commit`` is kept as ``<hook>.legacy``
+    (and will still run). Returns ``False`` if the project is not a git repository.
+    """
+    project = Path(opts.get("project_path", "."))
+    hooks_dir = project / ".git" / "hooks"
+    hook = hooks_dir / hook_type
+
+    if opts.get("pretend"):
+        logger.report("create", hook)
+        return True
+
+    if not (project / ".git").is_dir():
+        return False
+
+    python = _hook_python(opts)
+    args = ["hook-impl", "--config=.pre-commit-config.yaml", f"--hook-type={hook_type}"]
+    before, rest = _hook_template().split(HOOK_TEMPLATE_START)
+    _, after = rest.split(HOOK_TEMPLATE_END)
+    templated = f"INSTALL_PYTHON={shlex.quote(python)}\nARGS=({' '.join(args)})\n"
+    contents = f"{before}{HOOK_TEMPLATE_START}{templated}{HOOK_TEMPLATE_END}{after}"
+
+    hooks_dir.mkdir(parents=True, exist_ok=True)
+    if hook.exists() and HOOK_MARKER not in hook.read_text(encoding="utf-8"):
+        hook.replace(hook.with_name(f"{hook_type}.legacy"))
+
+    hook.write_text(contents, encoding="utf-8")
+    hook.chmod(hook.stat().st_mode | 0o111)
+    logger.report("create", hook)
+    return True
+
+
+def _hook_template() -> str:
+    """Hook template used by the installed ``pre-commit`` (or a bundled copy)"""
+    spec = find_spec("pre_commit")
+    if spec and spec.origin:
+        installed = Path(spec.origin).parent / "resources" / "hook-tmpl"
+        if installed.is_file():
+            return installed.read_text(encoding="utf-8")
+    return get_template("pre_commit_hook").template
+
+
+def _hook_python(opts: ScaffoldOpts) -> str:
+    """Python interpreter that is able to run ``pre-commit`` (if known)"""
+    if opts.get("venv"):
+        prefix = venv.get_path(opts)
+        python = shell.get_executable("python", prefix, include_path=False)
+        if python and shell.get_executable(EXECUTABLE, prefix, include_path=False):
+            return python
+    if find_spec("pre_commit"):
+        return sys.executable
+    return ""  # the hook will fallback to the `pre-commit` available in $PATH
+
+
 def add_instructions(
     opts: ScaffoldOpts, content: AbstractContent, file_op: FileOp
 ) -> ResolvedLeaf:
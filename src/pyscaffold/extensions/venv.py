@@ -1,20 +1,41 @@
 """Create a virtual environment for the project"""
 import argparse
-from contextlib import suppress
+import hashlib
+import os
+import shutil
+import sys
+import threading
+from contextlib import contextmanager, suppress
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Iterable, Iterator, List, Optional
 
 from .. import dependencies as deps
-from ..actions import Action, ActionParams, ScaffoldOpts, Structure
-from ..file_system import PathLike, chdir
+from .. import info
+from ..actions import Action, ActionParams, ScaffoldOpts, Structure, declare
+from ..file_system import PathLike, rm_rf
 from ..identification import get_id
 from ..log import logger
-from ..shell import get_command, get_executable
+from ..shell import ShellCommand, clear_executable_cache, get_command, get_executable
 from . import Extension, store_with
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore  # e.g. Windows (the seed cache is not used)
+
 DEFAULT: PathLike = ".venv"
 """Default directory name for collocated virtual environment that will be created"""
 
+MAX_SEEDS = 3
+"""Maximum number of base environments kept in the seed cache (the least recently
+used ones are removed first), see :obj:`create_from_seed`
+"""
+
+SEED_MARKER = ".pyscaffold-seed"
+"""File inside of cached base environments with the path where it was created"""
+
+Creator = Callable[[Path, bool], None]
+
 
 class Venv(Extension):
     """\
@@ -55,6 +76,26 @@ class Venv(Extension):
             "`requirements.txt` file, but remember to use quotes to avoid messing with "
             "the terminal",
         )
+        parser.add_argument(
+            "--venv-cache",
+            action=store_with(self),
+            nargs="?",
+            const=True,
+            default=argparse.SUPPRESS,
+            metavar="DIR",
+            help="create the venv by cloning a base environment (built once per "
+            "Python interpreter and cached in DIR), which is considerably faster",
+        )
+        parser.add_argument(
+            "--venv-wheelhouse",
+            action=store_with(self),
+            default=argparse.SUPPRESS,
+            type=Path,
+            metavar="DIR",
+            help="install the packages given in --venv-install exclusively from the "
+            "wheels in DIR (without accessing the package index). If DIR does not "
+            "exist, it is populated first (with `pip wheel`)",
+        )
         return self
 
     def activate(self, actions: List[Action]) -> List[Action]:
@@ -64,30 +105,59 @@ class Venv(Extension):
         return self.register(actions, instruct_user, before="report_done")
 
 
+def resource(opts: ScaffoldOpts) -> str:
+    """Resource corresponding to the venv directory, according to the options
+    (see :obj:`~pyscaffold.actions.declare`)
+    """
+    return "disk/" + Path(opts.get("venv", DEFAULT)).as_posix()
+
+
+@declare(
+    reads=["opts/project_path", "opts/venv", "opts/venv_cache", "opts/pretend"],
+    writes=[resource],
+)
 def run(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     """Action that will create a virtualenv for the project"""
 
-    project_path = opts["project_path"]
-    venv_path = Path(opts.get("venv", DEFAULT))
+    venv_path = Path(opts["project_path"], opts.get("venv", DEFAULT))
 
-    with chdir(project_path, **opts):
-        if venv_path.is_dir():
-            logger.report("skip", venv_path)
-            return struct, opts
+    if venv_path.is_dir():
+        logger.report("skip", venv_path)
+        return struct, opts
 
-        for creator in (create_with_virtualenv, create_with_stdlib):
-            with suppress(ImportError):
+    cache = opts.get("venv_cache")
+    for creator in (create_with_virtualenv, create_with_stdlib):
+        with suppress(ImportError):
+            if cache and not opts.get("pretend"):
+                seeds = None if cache is True else Path(cache)
+                create_from_seed(venv_path, creator, seeds)
+            else:
                 creator(venv_path, opts.get("pretend"))
-                break
-        else:
-            # no break statement found, so no creator function executed correctly
-            raise NotInstalled()
+            break
+    else:
+        # no break statement found, so no creator function executed correctly
+        raise NotInstalled()
 
+    clear_executable_cache(venv_path)
     return struct, opts
 
 
+@declare(
+    reads=[
+        "opts/project_path",
+        "opts/venv",
+        "opts/venv_install",
+        "opts/venv_wheelhouse",
+        "opts/pretend",
+    ],
+    writes=[resource],
+)
 def install_packages(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
-    """Install the specified packages inside the created venv."""
+    """Install the specified packages inside the created venv.
+
+    When the ``venv_wheelhouse`` option is given, the packages are installed
+    exclusively from the wheels in that directory (see :obj:`ensure_wheelhouse`).
+    """
 
     packages = opts.get("venv_install")
     if not packages:
@@ -95,17 +165,74 @@ def install_packages(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
 
     pretend = opts.get("pretend")
     venv_path = get_path(opts)
+    wheelhouse = opts.get("venv_wheelhouse")
+    index_args = ["--no-index", "--find-links", str(wheelhouse)] if wheelhouse else []
+    if wheelhouse:
+        ensure_wheelhouse(packages, wheelhouse, pretend)
 
     if not pretend:
         pip = get_command("pip", venv_path, include_path=False)
         if not pip:
             raise NotInstalled(f"pip cannot be found inside {venv_path}")
-        pip("install", "-U", *deps.deduplicate(packages))
+        args = ["install", "-U", *index_args, *deps.deduplicate(packages)]
+        for line in pip.stream(*args):
+            logger.debug(line)  # stream the output instead of buffering it
+        clear_executable_cache(venv_path)  # new executables might be installed
 
-    logger.report("run", f"pip install -U {' '.join(packages)} [{venv_path}]")
+    args_str = " ".join([*index_args, *packages])
+    logger.report("run", f"pip install -U {args_str} [{venv_path}]")
     return struct, opts
 
 
+def populate_wheelhouse(
+    packages: Iterable[str], wheelhouse: PathLike, pretend: bool = False
+):
+    """Download/build wheels for the given packages (and their dependencies) into
+    the ``wheelhouse`` directory, using the ``pip`` available for the running Python.
+
+    This function can be called once before creating several projects with the
+    ``venv_wheelhouse`` option (e.g. in CI workers without network access), when
+    the projects install different packages (otherwise see :obj:`ensure_wheelhouse`).
+    """
+    pip = ShellCommand(sys.executable, shell=False)
+    args = ["-m", "pip", "wheel", "--wheel-dir", str(wheelhouse)]
+    for line in pip.stream(*args, *deps.deduplicate(packages), pretend=pretend):
+        logger.debug(line)
+
+
+_WHEELHOUSE_LOCK = threading.Lock()
+
+
+def ensure_wheelhouse(
+    packages: Iterable[str], wheelhouse: PathLike, pretend: bool = False
+):
+    """Populate the ``wheelhouse`` directory with the given packages
+    (see :obj:`populate_wheelhouse`), unless it already exists.
+
+    This way, when many projects are created with the same ``venv_install`` and
+    ``venv_wheelhouse`` options (e.g. with :obj:`~pyscaffold.api.create_projects`),
+    the wheels are built only once and the other projects wait for them.
+    """
+    wheelhouse = Path(wheelhouse)
+    with _WHEELHOUSE_LOCK:
+        if wheelhouse.is_dir():
+            return
+        if pretend:
+            return populate_wheelhouse(packages, wheelhouse, pretend)
+
+        tmp = wheelhouse.with_name(f"{wheelhouse.name}.{os.getpid()}.tmp")
+        # ^  build in a temporary location, so a failure does not leave a partial
+        #    wheelhouse behind
+        try:
+            populate_wheelhouse(packages, tmp)
+            os.rename(str(tmp), str(wheelhouse))
+        finally:
+            if tmp.exists():
+                rm_rf(tmp)
+    logger.report("wheelhouse", wheelhouse)
+
+
+@declare(reads=["opts/project_path", "opts/venv", "opts/pretend", resource])
 def instruct_user(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
     """Simply display a message reminding the user to activate the venv."""
 
@@ -115,10 +242,9 @@ def instruct_user(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
         return struct, opts
 
     project = Path(opts["project_path"]).resolve()
-    with chdir(project, **opts):
-        venv_path = Path(venv)
-        python_exe = get_executable("python", venv_path, include_path=False)
-        pip_exe = get_executable("pip", venv_path, include_path=False)
+    venv_path = Path(venv)
+    python_exe = get_executable("python", project / venv_path, include_path=False)
+    pip_exe = get_executable("pip", project / venv_path, include_path=False)
 
     if python_exe and pip_exe:
         python = Path(python_exe).relative_to(project)
@@ -135,8 +261,7 @@ def instruct_user(struct: Structure, opts: ScaffoldOpts) -> ActionParams:
 
 def get_path(opts: ScaffoldOpts, default=DEFAULT) -> Path:
     """Get the path to the venv that will be created."""
-    with chdir(opts.get("project_path", "."), **opts):
-        return Path(opts.get("venv", default)).resolve()
+    return Path(opts.get("project_path", "."), opts.get("venv", default)).resolve()
 
 
 def create_with_virtualenv(path: Path, pretend=False):
@@ -163,6 +288,170 @@ def create_with_stdlib(path: Path, pretend=False):
     logger.report("venv", path)
 
 
+# ---- Seed cache ----
+
+
+def create_from_seed(
+    path: Path, creator: Creator = create_with_stdlib, seeds: Optional[Path] = None
+):
+    """Create a virtual environment by cloning a base environment (seed) previously
+    created by ``creator`` and stored in the ``seeds`` directory
+    (:obj:`seed_cache_dir` by default).
+
+    The seed is created in the first time this function is called for the running
+    Python interpreter (see :obj:`seed_fingerprint`) and only the :obj:`MAX_SEEDS`
+    most recently used seeds are kept. See :obj:`clone_venv` for more information.
+    """
+    seeds = seeds or seed_cache_dir()
+    if seeds is None or sys.platform == "win32":
+        # Windows launchers (e.g. ``pip.exe``) embed the path of the interpreter in a
+        # binary format that cannot be safely fixed, so the cache is not used
+        return creator(path, False)
+
+    path = Path(path).resolve()  # the scripts in a venv use absolute paths
+    seed = Path(seeds).resolve() / seed_fingerprint(creator)
+    for _ in range(3):  # the seed might be evicted by another process in the meantime
+        if not (seed / SEED_MARKER).exists():
+            _create_seed(seed, creator)
+        with _lock_seed(seed) as locked:
+            if locked:
+                os.utime(str(seed))  # mark as recently used
+                clone_venv(seed, path)
+                break
+    else:
+        return creator(path, False)
+
+    logger.report("clone", path, context=seed)
+    evict_seeds(seed.parent)
+
+
+def seed_cache_dir() -> Optional[Path]:
+    """Directory where the base environments are stored (might not exist yet)"""
+    cache = info.cache_dir(default=None)
+    return cache / "venv-seeds" if cache else None
+
+
+def seed_fingerprint(creator: Creator = create_with_stdlib) -> str:
+    """Identify a base environment by the Python interpreter and the tool used to
+    create it
+    """
+    parts = [os.path.realpath(sys.executable), sys.version, get_id(creator)]
+    if creator is create_with_virtualenv:
+        import virtualenv  # embedded pip/setuptools wheels depend on the version
+
+        parts.append(getattr(virtualenv, "__version__", ""))
+
+    digest = hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+    return f"py{sys.version_info[0]}{sys.version_info[1]}-{digest}"
+
+
+def clone_venv(seed: Path, target: Path):
+    """Copy the base environment ``seed`` to ``target``.
+
+    Files are hard linked when possible (pip replaces files instead of changing
+    them, so the seed is not affected when the packages are upgraded in the target).
+    The scripts (``bin``/``Scripts`` folders) and ``pyvenv.cfg``, that reference the
+    original location of the environment, are re-written with the new location
+    (``target`` is made absolute, as the location of the interpreter in the scripts).
+    """
+    target = Path(target).resolve()
+    origin = (seed / SEED_MARKER).read_text(encoding="utf-8")
+    ignore = shutil.ignore_patterns(SEED_MARKER)
+    shutil.copytree(str(seed), str(target), True, ignore, _link_or_copy)
+
+    fixups = {
+        os.fsencode(origin): os.fsencode(str(target)),
+        f"({Path(origin).name})".encode(): f"({target.name})".encode(),  # prompts
+    }
+    candidates = [target / "pyvenv.cfg"]
+    for folder in ("bin", "Scripts"):
+        if (target / folder).is_dir():
+            candidates.extend((target / folder).iterdir())
+
+    for file in candidates:
+        if file.is_file() and not file.is_symlink():
+            _replace_in_file(file, fixups)
+
+
+def evict_seeds(seeds: Path, keep: int = MAX_SEEDS):
+    """Remove the least recently used base environments from the cache
+    (seeds being cloned at the moment are skipped)
+    """
+    entries = [p for p in seeds.iterdir() if (p / SEED_MARKER).exists()]
+    entries.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    for seed in entries[keep:]:
+        with _lock_seed(seed, exclusive=True) as locked:
+            if locked:
+                rm_rf(seed)
+
+
+@contextmanager
+def _lock_seed(seed: Path, exclusive: bool = False) -> Iterator[bool]:
+    """Advisory lock on the seed (shared for cloning, exclusive for evicting), also
+    between different processes. Yields ``False`` when the seed does not exist
+    (anymore) or, for an exclusive lock, when the seed is in use.
+    """
+    try:
+        marker = open(seed / SEED_MARKER, "rb")
+    except FileNotFoundError:
+        yield False
+        return
+
+    with marker:
+        if fcntl is None:
+            yield True
+            return
+        flags = fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(marker.fileno(), flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            # the seed might have been evicted while waiting for the lock
+            yield (seed / SEED_MARKER).exists()
+        finally:
+            fcntl.flock(marker.fileno(), fcntl.LOCK_UN)
+
+
+def _create_seed(seed: Path, creator: Creator):
+    seed.parent.mkdir(parents=True, exist_ok=True)
+    tmp = seed.with_name(f"{seed.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    # ^  build in a temporary location, so concurrent processes don't conflict
+    try:
+        creator(tmp, False)
+        (tmp / SEED_MARKER).write_text(str(tmp), encoding="utf-8")
+        os.rename(str(tmp), str(seed))
+    except OSError:
+        if not (seed / SEED_MARKER).exists():
+            raise
+        # another process created the same seed in the meantime
+    finally:
+        if tmp.exists():
+            rm_rf(tmp)
+
+
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _replace_in_file(file: Path, replacements: dict):
+    content = file.read_bytes()
+    if b"\0" in content:
+        return  # skip binary files
+    new_content = content
+    for old, new in replacements.items():
+        new_content = new_content.replace(old, new)
+    if new_content != content:
+        mode = file.stat().st_mode
+        file.unlink()  # break the hard link, so the seed is not affected
+        file.write_bytes(new_content)
+        file.chmod(mode)
+
+
 class NotInstalled(ImportError):
     """Neither virtualenv or venv are installed in the computer. Please check the
     following alternatives:
@@ -16,7 +16,8 @@ from contextlib import contextmanager
 from functools import partial
 from pathlib import Path
 from tempfile import mkstemp
-from typing import Callable, Optional, Union
+from time import sleep
+from typing import Callable, Dict, Iterable, List, Optional, Union
 
 from .log import logger
 
@@ -135,7 +136,7 @@ def create_directory(path: PathLike, update=False, pretend=False) -> Optional[Pa
             pretending, but operation is logged.
     """
     path = Path(path)
-    if path.is_dir() and update:
+    if update and path.is_dir():
         logger.report("skip", path)
         return None
 
@@ -173,6 +174,65 @@ def chmod(path: PathLike, mode: int, pretend=False) -> Path:
     return path
 
 
+class Snapshot:
+    """In-memory view of the existing files and directories, used to answer
+    existence/type questions without one ``stat`` syscall per file.
+
+    Each directory is listed (with :obj:`os.scandir`) only once, the first time a path
+    inside of it is queried, so the number of syscalls is proportional to the number
+    of directories. Changes made in the file system after the listing have to be
+    recorded with :obj:`add` and :obj:`discard`.
+    """
+
+    def __init__(self):
+        self._listings: Dict[str, Optional[Dict[str, bool]]] = {}
+        # ^  directory => {name: is_dir} (or None if the directory does not exist)
+
+    def exists(self, path: PathLike) -> bool:
+        path = Path(os.path.abspath(path))  # e.g. Path('.').name == ''
+        entries = self._entries(path.parent)
+        return entries is not None and path.name in entries
+
+    def is_dir(self, path: PathLike) -> bool:
+        path = Path(os.path.abspath(path))
+        entries = self._entries(path.parent)
+        return bool(entries and entries.get(path.name))
+
+    def add(self, path: PathLike, is_dir=False, empty=False):
+        """Record that a file (or directory) was created.
+        When ``empty`` is ``True``, the (new) directory is known to have no contents,
+        so it does not need to be listed.
+        """
+        path = Path(os.path.abspath(path))
+        parent = str(path.parent)
+        if parent in self._listings:
+            entries = self._listings[parent] or {}
+            self._listings[parent] = {**entries, path.name: is_dir}
+        if is_dir and empty:
+            self._listings[str(path)] = {}
+
+    def discard(self, path: PathLike):
+        """Record that a file (or directory) was removed"""
+        path = Path(os.path.abspath(path))
+        entries = self._listings.get(str(path.parent))
+        if entries:
+            entries.pop(path.name, None)
+        prefix = str(path) + os.sep
+        nested = [k for k in self._listings if k == str(path) or k.startswith(prefix)]
+        for key in nested:
+            del self._listings[key]
+
+    def _entries(self, folder: Path) -> Optional[Dict[str, bool]]:
+        key = str(folder)
+        if key not in self._listings:
+            try:
+                with os.scandir(key) as entries:
+                    self._listings[key] = {e.name: e.is_dir() for e in entries}
+            except OSError:  # e.g. FileNotFoundError, NotADirectoryError
+                self._listings[key] = None
+        return self._listings[key]
+
+
 def localize_path(path_string: str) -> str:
     """Localize path for Windows, Unix, i.e. / or \\
 
@@ -269,6 +329,14 @@ def is_pathname_valid(pathname: str) -> bool:
     # Did we mention this should be shipped with Python already?
 
 
+RETRIES = 5
+"""Maximum number of attempts to remove a path in :obj:`on_ro_error`"""
+
+RETRY_DELAY = 0.01
+"""Initial delay (in seconds) between the attempts in :obj:`on_ro_error`
+(doubled for every new attempt)"""
+
+
 def on_ro_error(func, path, exc_info):
     """Error handler for ``shutil.rmtree``.
 
@@ -279,35 +347,48 @@ def on_ro_error(func, path, exc_info):
 
     Usage : ``shutil.rmtree(path, onerror=onerror)``
 
+    Permission errors are retried with a bounded exponential backoff (see
+    :obj:`RETRIES` and :obj:`RETRY_DELAY`), but only while the path still exists.
+
     Args:
         func (callable): function which raised the exception
         path (str): path passed to `func`
         exc_info (tuple of str): exception info returned by sys.exc_info()
     """
-    import stat
-    from time import sleep
-
-    # Sometimes the SO is just asynchronously (??!) slow, but it does remove the file
-    sleep(0.5)
-
-    if not Path(path).exists():
-        return
+    error = exc_info[1]
+    if not os.path.lexists(path):
+        return  # Sometimes the OS is asynchronously slow, but it does remove the file
 
     if not os.access(path, os.W_OK):
         # Is the error an access error ?
         os.chmod(path, stat.S_IWUSR)
-        return func(path)
+    elif not isinstance(error, PermissionError):
+        raise error
+
+    delay = RETRY_DELAY
+    for attempt in range(RETRIES):
+        if attempt:
+            sleep(delay)
+            delay *= 2
+        try:
+            return func(path)
+        except PermissionError as ex:  # e.g. file still in use (Windows)
+            error = ex
+        if not os.path.lexists(path):
+            return
 
-    raise
+    raise error
 
 
 def rm_rf(path: PathLike, pretend=False):
     """Remove ``path`` by all means like ``rm -rf`` in Linux"""
     target = Path(path)
-    if not target.exists():
-        return None
+    try:
+        is_dir = stat.S_ISDIR(target.stat().st_mode)  # single syscall
+    except OSError:
+        return None  # does not exist
 
-    if target.is_dir():
+    if is_dir:
         remove: Callable = partial(shutil.rmtree, onerror=on_ro_error)
     else:
         remove = Path.unlink
@@ -317,3 +398,22 @@ def rm_rf(path: PathLike, pretend=False):
 
     logger.report("remove", target)
     return path
+
+
+def remove_all(paths: Iterable[PathLike], pretend=False) -> List[PathLike]:
+    """Remove all the given paths in a single pass, like ``rm -rf path1 path2 ...``.
+
+    Paths inside of other given directories are not visited separately (they are
+    removed together with the directory), and paths that do not exist are ignored.
+    Returns the paths that were removed.
+    """
+    targets = {Path(os.path.abspath(p)): p for p in paths}
+    removed: List[PathLike] = []
+    parent: Optional[Path] = None
+    for target in sorted(targets):  # parents come right before their contents
+        if parent and parent in target.parents:
+            continue
+        if rm_rf(targets[target], pretend):
+            removed.append(targets[target])
+            parent = target
+    return removed
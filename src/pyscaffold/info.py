@@ -5,18 +5,20 @@ Provide general information about the system, user and the package itself.
 import copy
 import getpass
 import os
+import re
 import socket
+from contextlib import suppress
 from enum import Enum
 from operator import itemgetter
 from pathlib import Path
-from typing import Optional, cast, overload
+from typing import Iterator, Optional, cast, overload
 
 import appdirs
 from configupdater import ConfigUpdater
 from packaging.version import Version
 
 from . import __name__ as PKG_NAME
-from . import shell, toml
+from . import shell, toml, tracing
 from .exceptions import (
     GitNotConfigured,
     GitNotInstalled,
@@ -24,7 +26,7 @@ from .exceptions import (
     PyScaffoldTooOld,
     ShellCommandException,
 )
-from .file_system import PathLike, chdir
+from .file_system import PathLike
 from .identification import deterministic_sort, levenshtein, underscore
 from .log import logger
 from .templates import ScaffoldOpts, licenses, parse_extensions
@@ -35,6 +37,17 @@ CONFIG_FILE = "default.cfg"
 PYPROJECT_TOML: PathLike = "pyproject.toml"
 SETUP_CFG: PathLike = "setup.cfg"
 
+IGNORED_DIRS = {"node_modules", "__pycache__", "build", "dist", "venv"}
+"""Directories (in addition to the hidden ones) not considered by
+:obj:`find_projects`
+"""
+
+SHARED_OPTS = {"middleware"}
+"""Options holding objects that should be shared (instead of copied) when
+:obj:`project` updates the options with the values of a config file
+(e.g. stateful :obj:`~pyscaffold.actions.Middleware`)
+"""
+
 
 class GitEnv(Enum):
     author_name = "GIT_AUTHOR_NAME"
@@ -139,8 +152,7 @@ def is_git_workspace_clean(path: PathLike) -> bool:
     """
     check_git()
     try:
-        with chdir(path):
-            shell.git("diff-index", "--quiet", "HEAD", "--")
+        shell.git("diff-index", "--quiet", "HEAD", "--", cwd=path)
     except ShellCommandException:
         return False
     return True
@@ -172,8 +184,12 @@ def project(
     # Lazily load the following function to avoid circular dependencies
     from .extensions import list_from_entry_points as list_extensions
 
-    opts = copy.deepcopy({k: v for k, v in opts.items() if not callable(v)})
+    shared = {k: v for k, v in opts.items() if k in SHARED_OPTS}
+    opts = copy.deepcopy(
+        {k: v for k, v in opts.items() if not callable(v) and k not in shared}
+    )
     # ^  functions/lambdas are not deepcopy-able
+    opts.update(shared)
 
     path = config_path or cast(PathLike, opts.get("project_path", "."))
 
@@ -246,20 +262,25 @@ def read_setupcfg(path: PathLike, filename=SETUP_CFG) -> ConfigUpdater:
         path = path / (filename or SETUP_CFG)
 
     updater = ConfigUpdater()
-    updater.read(path, encoding="utf-8")
+    with tracing.span("read_setupcfg", "config", path=path):
+        updater.read(path, encoding="utf-8")
 
     logger.report("read", path)
 
     return updater
 
 
-def read_pyproject(path: PathLike, filename=PYPROJECT_TOML) -> toml.TOMLMapping:
+def read_pyproject(
+    path: PathLike, filename=PYPROJECT_TOML, read_only=False
+) -> toml.TOMLMapping:
     """Reads-in a configuration file that follows a pyproject.toml format.
 
     Args:
         path: path where to find the config file
         filename: if ``path`` is a directory, ``name`` will be considered a file
             relative to ``path`` to read (default: setup.cfg)
+        read_only: the configuration is only inspected, so it can be parsed faster
+            (without preserving the style, see :obj:`pyscaffold.toml.loads`)
 
     Returns:
         Object that can be used to read/edit configuration parameters.
@@ -268,7 +289,7 @@ def read_pyproject(path: PathLike, filename=PYPROJECT_TOML) -> toml.TOMLMapping:
     if file.is_dir():
         file = file / (filename or PYPROJECT_TOML)
 
-    config = toml.loads(file.read_text(encoding="utf-8"))
+    config = toml.loads(file.read_text(encoding="utf-8"), read_only=read_only)
     logger.report("read", file)
     return config
 
@@ -286,6 +307,26 @@ def get_curr_version(project_path: PathLike):
     return Version(setupcfg["pyscaffold"]["version"])
 
 
+def find_projects(root: PathLike) -> Iterator[Path]:
+    """Discover the projects generated with PyScaffold (i.e. with a ``[pyscaffold]``
+    section in ``setup.cfg``) inside the ``root`` directory.
+
+    Projects are not expected to be nested (the sub-directories of a project are not
+    searched), and hidden directories (and :obj:`IGNORED_DIRS`) are skipped.
+    """
+    section = re.compile(r"^\[pyscaffold\]", re.M)
+    for folder, dirs, files in os.walk(root):
+        if SETUP_CFG in files:
+            setupcfg = Path(folder, SETUP_CFG)
+            with suppress(OSError, UnicodeDecodeError):
+                if section.search(setupcfg.read_text(encoding="utf-8")):
+                    yield Path(folder)
+                    dirs.clear()
+                    continue
+        ignored = IGNORED_DIRS.union(d for d in dirs if d.startswith("."))
+        dirs[:] = sorted(d for d in dirs if d not in ignored)
+
+
 (RAISE_EXCEPTION,) = list(Enum("default", "RAISE_EXCEPTION"))  # type: ignore
 """When no default value is passed, an exception should be raised"""
 
@@ -330,6 +371,22 @@ def config_dir(prog=PKG_NAME, org=None, default=RAISE_EXCEPTION):
         raise ImpossibleToFindConfigDir() from ex
 
 
+def cache_dir(
+    prog: str = PKG_NAME, org: Optional[str] = None, default: Optional[Path] = None
+) -> Optional[Path]:
+    """Finds the correct place where to store cached data for the given app
+    (``default`` is returned when it is not possible to find it).
+
+    The arguments have the same meaning as in :obj:`config_dir`.
+    Please notice the directory might not exist.
+    """
+    try:
+        return Path(appdirs.user_cache_dir(prog, org))
+    except Exception as ex:
+        logger.debug("Error when trying to find cache dir %s", ex, exc_info=True)
+        return default
+
+
 @overload
 def config_file(name: str = CONFIG_FILE, prog: str = PKG_NAME, org: str = None) -> Path:
     ...
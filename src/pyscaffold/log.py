@@ -1,13 +1,24 @@
 """
 Custom logging infrastructure to provide execution information for the user.
 """
+import copy
+import json
 import logging
+import os
+import queue
+import uuid
 from collections import defaultdict
 from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import lru_cache
 from logging import INFO, Formatter, LoggerAdapter, StreamHandler, getLogger
-from os.path import realpath, relpath
+from logging.handlers import QueueHandler, QueueListener
+from os.path import isabs, join, realpath, relpath
 from os.path import sep as pathsep
-from typing import DefaultDict, Optional, Sequence
+from types import MappingProxyType
+from typing import IO, Any, DefaultDict, Mapping, Optional, Sequence, Union
+from weakref import WeakKeyDictionary
 
 from . import termui
 
@@ -16,23 +27,70 @@ DEFAULT_LOGGER = __name__
 
 Styles = Sequence[str]
 
+MAX_NAME_LENGTH = 255
+"""Most file systems do not allow path components longer than this (in bytes)"""
 
-def _are_equal_paths(path1, path2):
-    return realpath(str(path1)) == realpath(str(path2))
+# Context-local state of the :class:`ReportLogger` objects (logger => value).
+# The mappings are never changed in place, a new one is set instead, and they don't
+# keep the loggers alive (e.g. the ones created by :obj:`ReportLogger.copy`).
+_NESTING: "ContextVar[WeakKeyDictionary[ReportLogger, int]]" = ContextVar("nesting")
+_ACTION: "ContextVar[WeakKeyDictionary[ReportLogger, Optional[str]]]" = ContextVar(
+    "action"
+)
+_RUN_ID: "ContextVar[WeakKeyDictionary[ReportLogger, Optional[str]]]" = ContextVar(
+    "run_id"
+)
+_MISSING = object()
+_EMPTY: Mapping[Any, Any] = MappingProxyType({})
 
 
-def _is_current_path(path):
-    return _are_equal_paths(path, ".")
+@lru_cache(maxsize=1024)
+def _realpath(path: str, cwd: str) -> str:
+    return realpath(join(cwd, path))
+
+
+def _looks_like_path(text: str) -> bool:
+    """Cheap (pure string) heuristic to determine if a text is a valid path name.
+    Similar to :obj:`pyscaffold.file_system.is_pathname_valid`, but without syscalls.
+    """
+    if not text or "\0" in text or pathsep not in text:
+        return False
+
+    parts = text.split(pathsep)
+    return all(len(p.encode(errors="ignore")) <= MAX_NAME_LENGTH for p in parts)
 
 
 class ReportFormatter(Formatter):
-    """Formatter that understands custom fields in the log record."""
+    """Formatter that understands custom fields in the log record.
+
+    The current working directory is resolved only once (the first time it is needed),
+    and the paths are abbreviated relatively to it with pure string manipulation.
+    Please use :obj:`reset_cwd` if the working directory changes while the formatter is
+    in use.
+    """
 
     ACTIVITY_MAXLEN = 12
     SPACING = "  "
     CONTEXT_PREFIX = "from"
     TARGET_PREFIX = "to"
 
+    _cwd: Optional[str] = None
+
+    @property
+    def cwd(self) -> str:
+        """Working directory used as reference to abbreviate paths"""
+        if self._cwd is None:
+            self._cwd = os.getcwd()
+        return self._cwd
+
+    def reset_cwd(self):
+        """Force the working directory to be resolved again in the next log"""
+        self._cwd = None
+
+    def _is_current_path(self, path) -> bool:
+        cwd = self.cwd
+        return _realpath(str(path), cwd) == _realpath(".", cwd)
+
     def format(self, record):
         """Compose message when a record with report information is given."""
         if hasattr(record, "activity"):
@@ -48,15 +106,22 @@ class ReportFormatter(Formatter):
 
     def format_path(self, path):
         """Simplify paths to avoid wasting space in terminal."""
-        from .file_system import is_pathname_valid  # late import due to cycles
-
         # TODO: Rather handle Path objects instead converting to str
         path = str(path)
 
-        if is_pathname_valid(path) and pathsep in path:
+        if _looks_like_path(path):
             # Heuristic to determine if subject is a file path
             # that needs to be made short
-            abbrev = relpath(path)
+            cwd = self.cwd
+            prefix = cwd.rstrip(pathsep) + pathsep
+            if path.startswith(prefix) and ".." not in path:
+                abbrev = path[len(prefix) :] or "."  # fast path for common case
+            else:
+                try:
+                    abbrev = relpath(path if isabs(path) else join(cwd, path), cwd)
+                    # ^  both absolute => pure string manipulation, no syscalls
+                except ValueError:  # e.g. different drives on Windows
+                    return path
 
             if len(abbrev) < len(path):
                 # Ignore if not shorter
@@ -77,14 +142,14 @@ class ReportFormatter(Formatter):
 
     def format_target(self, target, _activity=None):
         """Format extra information about the activity target."""
-        if target and not _is_current_path(target):
+        if target and not self._is_current_path(target):
             return f"{self.TARGET_PREFIX} '{self.format_path(target)}'"
 
         return ""
 
     def format_context(self, context, _activity=None):
         """Format extra information about the activity context."""
-        if context and not _is_current_path(context):
+        if context and not self._is_current_path(context):
             return f"{self.CONTEXT_PREFIX} '{self.format_path(context)}'"
 
         return ""
@@ -162,6 +227,115 @@ class ColoredReportFormatter(ReportFormatter):
         return super(ColoredReportFormatter, self).format_default(record)
 
 
+class JSONLinesFormatter(Formatter):
+    """Formatter that represents each log record as a JSON object in a single line.
+
+    Records produced by :obj:`ReportLogger.report` have the fields **activity**,
+    **subject**, **context** and **target** (paths are represented as strings).
+    Regular log records have a **message** field instead.
+    All the records also contain **timestamp** (ISO 8601, UTC), **level**,
+    **nesting**, **action** (identifier of the action being executed, if any) and
+    **run_id** (see :obj:`ReportLogger.run`).
+    """
+
+    REPORT_FIELDS = ("activity", "subject", "context", "target")
+
+    def format(self, record):
+        data = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc)
+            .isoformat(timespec="microseconds")
+            .replace("+00:00", "Z"),
+            "level": record.levelname,
+        }
+        if getattr(record, "activity", None):
+            fields = self.REPORT_FIELDS
+            data.update({k: _json_str(getattr(record, k, None)) for k in fields})
+        else:
+            data["message"] = record.getMessage()
+
+        data["nesting"] = getattr(record, "nesting", 0) or 0
+        data["action"] = getattr(record, "action", None)
+        data["run_id"] = getattr(record, "run_id", None)
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _json_str(value) -> Optional[str]:
+    if value is None:
+        return None
+    return os.fspath(value) if isinstance(value, os.PathLike) else str(value)
+
+
+class JSONLinesHandler(QueueHandler):
+    """Non-blocking handler that writes records as JSON lines (see
+    :class:`JSONLinesFormatter`) to a file or text stream.
+
+    The records are put in a queue and formatted/written by a background thread, so
+    the scaffold pipeline does not wait for I/O.
+    Please call :obj:`close` to flush the pending records.
+
+    Example:
+
+        .. code-block:: python
+
+            from pyscaffold.log import JSONLinesHandler, logger
+
+            logger.handler = JSONLinesHandler("pyscaffold.jsonl")
+            ...
+            logger.handler.close()
+
+    Args:
+        file: path or text stream where the records will be written.
+            When a path is given, the file is opened in append mode.
+        formatter: used in the background thread, by default
+            :class:`JSONLinesFormatter`.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, os.PathLike, IO[str]],
+        formatter: Optional[Formatter] = None,
+    ):
+        super().__init__(queue.Queue(-1))
+        if hasattr(file, "write"):
+            self.target: StreamHandler = StreamHandler(file)  # type: ignore
+        else:
+            self.target = logging.FileHandler(file, encoding="utf-8")  # type: ignore
+        self.target.setFormatter(formatter or JSONLinesFormatter())
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        self._listening = True
+
+    def prepare(self, record):
+        """Avoid formatting the record in the thread that emits it.
+        Only the message is merged with its arguments (as in
+        :obj:`QueueHandler.prepare <logging.handlers.QueueHandler.prepare>`), since
+        they might change before the record is written, and the traceback objects are
+        discarded, since they hold references to frames.
+        """
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.target.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        """Wait for the pending records to be written and release the resources"""
+        with self.lock:  # e.g. closed explicitly and by ``logging.shutdown``
+            listening, self._listening = self._listening, False
+        if listening:
+            self.listener.stop()
+        self.target.close()
+        super().close()
+
+
 class ReportLogger(LoggerAdapter):
     """Suitable wrapper for PyScaffold CLI interactive execution reports.
 
@@ -180,6 +354,18 @@ class ReportLogger(LoggerAdapter):
 
     Attributes:
         nesting (int): current nesting level of the report.
+        action (str): identifier of the action being executed (if any),
+            see :obj:`performing`.
+        run_id (str): identifier of the scaffold being executed (if any),
+            see :obj:`run`.
+
+    Note:
+        **nesting**, **action** and **run_id** are stored in (module-level)
+        :mod:`contextvars`, per logger object (weakly referenced, so copies of the
+        logger can be garbage collected), and are local to the current thread
+        (or :mod:`asyncio` task).
+        This way concurrent scaffolds can share the same logger object without
+        interfering in each other's indentation.
     """
 
     def __init__(
@@ -190,7 +376,6 @@ class ReportLogger(LoggerAdapter):
         extra: Optional[dict] = None,
         propagate=False,
     ):
-        self.nesting = 0
         self._wrapped: logging.Logger = logger or getLogger(DEFAULT_LOGGER)
         self.propagate = propagate
         self.extra = extra or {}
@@ -198,6 +383,60 @@ class ReportLogger(LoggerAdapter):
         self.formatter = formatter or ReportFormatter()
         super(ReportLogger, self).__init__(self._wrapped, self.extra)
 
+    @property
+    def nesting(self) -> int:
+        """Current nesting level of the report (local to the current context)"""
+        return self._get(_NESTING, 0)
+
+    @nesting.setter
+    def nesting(self, value: int):
+        self._set(_NESTING, value)
+
+    @property
+    def action(self) -> Optional[str]:
+        """Identifier of the action being executed (local to the current context)"""
+        return self._get(_ACTION)
+
+    @action.setter
+    def action(self, value: Optional[str]):
+        self._set(_ACTION, value)
+
+    @property
+    def run_id(self) -> Optional[str]:
+        """Identifier of the scaffold being executed (local to the current context)"""
+        return self._get(_RUN_ID)
+
+    @run_id.setter
+    def run_id(self, value: Optional[str]):
+        self._set(_RUN_ID, value)
+
+    def _get(
+        self, var: "ContextVar[WeakKeyDictionary[ReportLogger, Any]]", default=None
+    ):
+        return var.get(_EMPTY).get(self, default)
+
+    def _set(self, var: "ContextVar[WeakKeyDictionary[ReportLogger, Any]]", value):
+        state = WeakKeyDictionary(var.get(_EMPTY))
+        state[self] = value
+        var.set(state)
+
+    @contextmanager
+    def _setting(self, var: "ContextVar[WeakKeyDictionary[ReportLogger, Any]]", value):
+        """Temporarily set the value for this logger (other loggers are not affected
+        when the previous value is restored)
+        """
+        previous = self._get(var, _MISSING)
+        self._set(var, value)
+        try:
+            yield
+        finally:
+            state = WeakKeyDictionary(var.get(_EMPTY))
+            if previous is _MISSING:
+                state.pop(self, None)
+            else:
+                state[self] = previous
+            var.set(state)
+
     @property
     def propagate(self) -> bool:
         """Whether or not to propagate messages in the logging hierarchy,
@@ -253,10 +492,14 @@ class ReportLogger(LoggerAdapter):
         self.wrapped.setLevel(value)
 
     def process(self, msg, kwargs):
-        """Method overridden to augment LogRecord with the `nesting` attribute"""
+        """Method overridden to augment LogRecord with the `nesting`, `action` and
+        `run_id` attributes
+        """
         (msg, kwargs) = super(ReportLogger, self).process(msg, kwargs)
         extra = kwargs.get("extra", {})
         extra["nesting"] = self.nesting
+        extra["action"] = self.action
+        extra["run_id"] = self.run_id
         kwargs["extra"] = extra
         return msg, kwargs
 
@@ -279,9 +522,9 @@ class ReportLogger(LoggerAdapter):
 
         Notes:
             This method creates a custom log record, with additional fields:
-            **activity**, **subject**, **context**, **target** and **nesting**,
-            but an empty **msg** field. The :class:`ReportFormatter`
-            creates the log message from the other fields.
+            **activity**, **subject**, **context**, **target**, **nesting**,
+            **action** and **run_id**, but an empty **msg** field.
+            The :class:`ReportFormatter` creates the log message from the other fields.
 
             Often **target** and **context** complement the logs when
             **subject** does not hold all the necessary information. For
@@ -290,6 +533,9 @@ class ReportLogger(LoggerAdapter):
                 logger.report('copy', 'my/file', target='my/awesome/path')
                 logger.report('run', 'command', context='current/working/dir')
         """
+        if not self.wrapped.isEnabledFor(level):
+            return None  # avoid creating the record when it would be discarded anyway
+
         return self.wrapped.log(
             level,
             "",
@@ -299,6 +545,8 @@ class ReportLogger(LoggerAdapter):
                 "context": context,
                 "target": target,
                 "nesting": nesting or self.nesting,
+                "action": self.action,
+                "run_id": self.run_id,
             },
         )
 
@@ -324,15 +572,32 @@ class ReportLogger(LoggerAdapter):
                 # Note how the spacing between activity and subject in the
                 # second entry is greater than the equivalent in the first one.
 
-        Note:
-            This method is not thread-safe and should be used with care.
+        The nesting level is only changed for the current thread (or :mod:`asyncio`
+        task).
         """
-        prev = self.nesting
-        self.nesting += count
-        try:
+        with self._setting(_NESTING, self.nesting + count):
             yield
-        finally:
-            self.nesting = prev
+
+    @contextmanager
+    def performing(self, action_id: str):
+        """Temporarily set the identifier of the action being executed, so it can be
+        added to the log records (see :class:`JSONLinesFormatter`).
+        """
+        with self._setting(_ACTION, action_id):
+            yield
+
+    @contextmanager
+    def run(self, run_id: Optional[str] = None):
+        """Attribute the logs produced while executing a context to a single scaffold.
+
+        A ``run_id`` is randomly generated when not given, and is added to the log
+        records (see :class:`JSONLinesFormatter`). The nesting level starts from zero
+        inside the context, so concurrent scaffolds (in different threads or
+        :mod:`asyncio` tasks) produce independent log streams.
+        """
+        with self._setting(_RUN_ID, run_id or uuid.uuid4().hex[:12]):
+            with self._setting(_NESTING, 0), self._setting(_ACTION, None):
+                yield self.run_id
 
     def copy(self):
         """Produce a copy of the wrapped logger.
@@ -344,6 +609,8 @@ class ReportLogger(LoggerAdapter):
             self.wrapped, self.handler, self.formatter, self.extra, self.propagate
         )
         clone.nesting = self.nesting
+        clone.action = self.action
+        clone.run_id = self.run_id
 
         return clone
 
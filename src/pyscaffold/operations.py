@@ -48,6 +48,8 @@ from pathlib import Path
 from typing import Any, Callable, Dict, Union
 
 from . import file_system as fs
+from .archive import ARCHIVE_OPT
+from .dedup import DEDUP_OPT, unshare
 from .log import logger
 
 # Signatures for the documentation purposes
@@ -90,6 +92,30 @@ Note:
 """
 
 
+SNAPSHOT_OPT = "____snapshot"  # we don't want this to be persisted
+"""Option holding the :obj:`~pyscaffold.file_system.Snapshot` of the target directory
+tree, given by :obj:`~pyscaffold.structure.create_structure` to the file ops.
+File ops should use :obj:`exists` (instead of :obj:`pathlib.Path.exists`).
+"""
+
+REMOVALS_OPT = "____removals"  # we don't want this to be persisted
+"""Option holding the list of paths that :obj:`remove` schedules for removal.
+:obj:`~pyscaffold.structure.create_structure` removes them all at once in the end
+(see :obj:`~pyscaffold.file_system.remove_all`).
+"""
+
+
+def exists(path: Path, opts: ScaffoldOpts) -> bool:
+    """Check if ``path`` exists in the disk (using the snapshot in ``opts`` if any),
+    or in the archive being written (see :mod:`pyscaffold.archive`)
+    """
+    archive = opts.get(ARCHIVE_OPT)
+    if archive:
+        return archive.exists(path)
+    snapshot = opts.get(SNAPSHOT_OPT)
+    return snapshot.exists(path) if snapshot else path.exists()
+
+
 # FileOps and FileOp modifiers (a.k.a. factories/decorators/wrappers)
 
 
@@ -100,15 +126,44 @@ def create(path: Path, contents: FileContents, opts: ScaffoldOpts) -> Union[Path
     if contents is None:
         return None
 
-    return fs.create_file(path, contents, pretend=opts.get("pretend"))
+    archive = opts.get(ARCHIVE_OPT)
+    if archive:
+        return archive.add_file(path, contents)
+
+    pretend = opts.get("pretend")
+    store = opts.get(DEDUP_OPT)
+    if store and not pretend:
+        created = store.create(path, contents)  # see pyscaffold.dedup
+    else:
+        if not pretend and exists(path, opts):
+            unshare(path)  # e.g. update of a project created with ``--dedup hardlink``
+        created = fs.create_file(path, contents, pretend=pretend)
+    snapshot = opts.get(SNAPSHOT_OPT)
+    if snapshot and not pretend:
+        snapshot.add(path)
+    return created
 
 
 def remove(path: Path, _content: FileContents, opts: ScaffoldOpts) -> Union[Path, None]:
-    """Remove the file if it exists in the disk"""
-    if not path.exists():
+    """Remove the file if it exists in the disk (or in the archive being written)"""
+    if not exists(path, opts):
         return None
 
-    return fs.rm_rf(path, pretend=opts.get("pretend"))
+    archive = opts.get(ARCHIVE_OPT)
+    if archive:
+        return archive.remove(path)
+
+    pretend = opts.get("pretend")
+    batch = opts.get(REMOVALS_OPT)
+    if batch is None:
+        removed = fs.rm_rf(path, pretend=pretend)
+    else:
+        batch.append(path)
+        removed = path
+    snapshot = opts.get(SNAPSHOT_OPT)
+    if snapshot and not pretend:
+        snapshot.discard(path)
+    return removed
 
 
 def no_overwrite(file_op: FileOp = create) -> FileOp:
@@ -123,7 +178,7 @@ def no_overwrite(file_op: FileOp = create) -> FileOp:
 
     def _no_overwrite(path: Path, contents: FileContents, opts: ScaffoldOpts):
         """See ``pyscaffold.operations.no_overwrite``"""
-        if opts.get("force") or not path.exists():
+        if opts.get("force") or not exists(path, opts):
             return file_op(path, contents, opts)
 
         logger.report("skip", path)
@@ -186,10 +241,18 @@ def add_permissions(permissions: int, file_op: FileOp = create) -> FileOp:
         """See ``pyscaffold.operations.add_permissions``"""
         return_value = file_op(path, contents, opts)
 
-        if path.exists():
-            mode = path.stat().st_mode | permissions
-            return fs.chmod(path, mode, pretend=opts.get("pretend"))
+        archive = opts.get(ARCHIVE_OPT)
+        if archive:
+            return archive.add_permissions(path, permissions) or return_value
+
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return return_value
 
-        return return_value
+        mode = stat.st_mode | permissions
+        if stat.st_nlink > 1 and mode != stat.st_mode and not opts.get("pretend"):
+            unshare(path)  # don't change the permissions of the other linked files
+        return fs.chmod(path, mode, pretend=opts.get("pretend"))
 
     return _add_permissions
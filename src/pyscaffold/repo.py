@@ -7,7 +7,7 @@ from typing import Optional, TypeVar, Union
 
 from . import shell
 from .exceptions import ShellCommandException
-from .file_system import PathLike, chdir
+from .file_system import PathLike
 
 T = TypeVar("T")
 
@@ -43,11 +43,10 @@ def add_tag(project: PathLike, tag_name: str, message: Optional[str] = None, **k
     Additional keyword arguments are passed to the
     :obj:`git <pyscaffold.shell.ShellCommand>` callable object.
     """
-    with chdir(project):
-        if message is None:
-            shell.git("tag", tag_name, **kwargs)
-        else:
-            shell.git("tag", "-a", tag_name, "-m", message, **kwargs)
+    if message is None:
+        shell.git("tag", tag_name, cwd=project, **kwargs)
+    else:
+        shell.git("tag", "-a", tag_name, "-m", message, cwd=project, **kwargs)
 
 
 def init_commit_repo(project: PathLike, struct: dict, **kwargs):
@@ -60,10 +59,10 @@ def init_commit_repo(project: PathLike, struct: dict, **kwargs):
     Additional keyword arguments are passed to the
     :obj:`git <pyscaffold.shell.ShellCommand>` callable object.
     """
-    with chdir(project, pretend=kwargs.get("pretend")):
-        shell.git("init", **kwargs)
-        git_tree_add(struct, **kwargs)
-        shell.git("commit", "-m", "Initial commit", **kwargs)
+    kwargs = {**kwargs, "cwd": project}
+    shell.git("init", **kwargs)
+    git_tree_add(struct, **kwargs)
+    shell.git("commit", "-m", "Initial commit", **kwargs)
 
 
 def is_git_repo(folder: PathLike):
@@ -72,12 +71,11 @@ def is_git_repo(folder: PathLike):
     if not folder.is_dir():
         return False
 
-    with chdir(folder):
-        try:
-            shell.git("rev-parse", "--git-dir")
-        except ShellCommandException:
-            return False
-        return True
+    try:
+        shell.git("rev-parse", "--git-dir", cwd=folder)
+    except ShellCommandException:
+        return False
+    return True
 
 
 def get_git_root(default: Optional[T] = None) -> Union[None, T, str]:
@@ -2,19 +2,30 @@
 Shell commands like git, django-admin etc.
 """
 
+import asyncio
 import functools
+import locale
 import os
 import shutil
 import subprocess
 import sys
+import threading
+from collections import deque
 from pathlib import Path
-from typing import Callable, Iterator, Optional, Union
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 
+from . import tracing
 from .exceptions import ShellCommandException
 from .log import logger
 
 PathLike = Union[str, os.PathLike]
 
+NOT_FOUND = 127
+"""Exit code used when the executable cannot be found (same as POSIX shells)"""
+
+ERROR_TAIL = 100
+"""Number of lines of the output kept for error messages when streaming"""
+
 EDITORS = ("sensible-editor", "nvim", "vim", "nano", "subl", "code", "notepad", "vi")
 """Programs to be tried (in sequence) when calling :obj:`edit` and :obj:`get_editor` in
 the case the environment variables EDITOR and VISUAL are not set.
@@ -26,7 +37,9 @@ class ShellCommand(object):
 
     Args:
         command: command to handle
-        shell: run the command in the shell
+        shell: run the command in the shell. When ``False``, ``command`` should be a
+            single executable and the arguments are passed directly to it (as argv),
+            avoiding spawning an extra shell process.
         cwd: current working dir to run the command
 
     The produced command can be called with the following keyword arguments:
@@ -34,6 +47,8 @@ class ShellCommand(object):
         - **log** (*bool*): log activity when true. ``False`` by default.
         - **pretend** (*bool*): skip execution (but log) when pretending.
           ``False`` by default.
+        - **cwd** (*os.PathLike*): working dir to run the command, overwriting the
+          one given in the constructor (the process-wide working dir is never changed).
 
     The positional arguments are passed to the underlying shell command.
     """
@@ -43,43 +58,149 @@ class ShellCommand(object):
         self._shell = shell
         self._cwd = cwd
 
-    def run(self, *args, **kwargs) -> subprocess.CompletedProcess:
-        """Execute command with the given arguments via :obj:`subprocess.run`."""
-        params = subprocess.list2cmdline(list(map(str, args)))
+    def _prepare(self, args: tuple, kwargs: dict):
+        """Log/pretend according to ``kwargs`` and return the command to be executed
+        (``None`` when pretending) and the :obj:`subprocess.Popen` options.
+        """
+        argv: List[str] = [self._command, *map(str, args)]
+        params = subprocess.list2cmdline(argv[1:])
         command = f"{self._command} {params}".strip()
 
         should_pretend = kwargs.pop("pretend", False)
         should_log = kwargs.pop("log", should_pretend)
         # ^ When pretending, automatically output logs
         #   (after all, this is the primary purpose of pretending)
+        cwd = kwargs.pop("cwd", self._cwd)
 
         if should_log:
-            logger.report("run", command, context=self._cwd)
-
-        if should_pretend:
-            return subprocess.CompletedProcess(command, 0, None, None)
+            logger.report("run", command, context=cwd)
 
         opts: dict = {
             "shell": self._shell,
-            "cwd": self._cwd,
+            "cwd": cwd,
             "stdout": subprocess.PIPE,
             "stderr": subprocess.STDOUT,
             "universal_newlines": True,
             **kwargs,  # allow overwriting defaults
         }
-        return subprocess.run(command, **opts)
-        # ^ `check_output` does not seem to support terminal editors
+        executable = command if self._shell else argv
+        return (None if should_pretend else executable), command, opts
+
+    def run(self, *args, **kwargs) -> subprocess.CompletedProcess:
+        """Execute command with the given arguments via :obj:`subprocess.run`."""
+        executable, command, opts = self._prepare(args, kwargs)
+        if executable is None:
+            return subprocess.CompletedProcess(command, 0, None, None)
+
+        with tracing.span(self._command, "shell", argv=[self._command, *args]) as span:
+            try:
+                completed = subprocess.run(executable, **opts)
+                # ^ `check_output` does not seem to support terminal editors
+            except FileNotFoundError as ex:
+                # Without a shell, missing executables raise errors instead of
+                # returning an exit code, so we emulate the shell behaviour
+                completed = subprocess.CompletedProcess(command, NOT_FOUND, str(ex))
+            span.set("exit_code", completed.returncode)
+        return completed
+
+    async def run_async(self, *args, **kwargs) -> subprocess.CompletedProcess:
+        """Asynchronous version of :obj:`run`, based on
+        :obj:`asyncio.create_subprocess_exec` (or :obj:`asyncio.create_subprocess_shell`
+        when ``shell=True``).
+
+        The output is captured and decoded as text (``stdout`` and ``stderr`` are
+        combined by default).
+        """
+        executable, command, opts = self._prepare(args, kwargs)
+        if executable is None:
+            return subprocess.CompletedProcess(command, 0, None, None)
+
+        opts.pop("shell")
+        text = opts.pop("universal_newlines", True)
+        with tracing.span(self._command, "shell", argv=[self._command, *args]) as span:
+            try:
+                if self._shell:
+                    process = await asyncio.create_subprocess_shell(command, **opts)
+                else:
+                    process = await asyncio.create_subprocess_exec(*executable, **opts)
+                stdout, stderr = await process.communicate()
+            except FileNotFoundError as ex:
+                completed = subprocess.CompletedProcess(command, NOT_FOUND, str(ex))
+            else:
+                if text:
+                    encoding = locale.getpreferredencoding(False)
+                    stdout = stdout and stdout.decode(encoding).replace("\r\n", "\n")
+                    stderr = stderr and stderr.decode(encoding).replace("\r\n", "\n")
+                completed = subprocess.CompletedProcess(
+                    command, process.returncode, stdout, stderr
+                )
+            span.set("exit_code", completed.returncode)
+        return completed
+
+    def stream(
+        self, *args, callback: Optional[Callable[[str], None]] = None, **kwargs
+    ) -> Iterator[str]:
+        """Execute the command and iterate over the lines of its output as soon as
+        they are produced (instead of buffering the entire output in memory).
+
+        Args:
+            callback: optional function called with each line (e.g. to show progress)
+
+        The same keyword arguments accepted by :obj:`__call__` can be used.
+        The activity is logged immediately, but the command only starts when the
+        returned iterator is consumed.
+        When the command fails, the last :obj:`ERROR_TAIL` lines of the output are
+        used in the message of the raised :obj:`~.ShellCommandException`.
+        """
+        executable, command, opts = self._prepare(args, kwargs)
+        if executable is None:
+            return iter(())
+
+        argv = [self._command, *args]
+        return self._stream(executable, command, opts, argv, callback)
+
+    def _stream(self, executable, command, opts, argv, callback) -> Iterator[str]:
+        tail: deque = deque(maxlen=ERROR_TAIL)
+        with tracing.span(self._command, "shell", argv=argv) as span:
+            try:
+                process = subprocess.Popen(executable, **opts)
+            except FileNotFoundError as ex:
+                span.set("exit_code", NOT_FOUND)
+                error = subprocess.CalledProcessError(NOT_FOUND, command, str(ex))
+                raise ShellCommandException(str(ex)) from error
+
+            with process:  # closes the pipe and waits for the process
+                for line in process.stdout or ():
+                    line = line.rstrip("\r\n")
+                    tail.append(line)
+                    if callback:
+                        callback(line)
+                    yield line
+
+            span.set("exit_code", process.returncode)
+
+        if process.returncode != 0:
+            output = "\n".join(tail)
+            error = subprocess.CalledProcessError(process.returncode, command, output)
+            raise ShellCommandException(output) from error
 
     def __call__(self, *args, **kwargs) -> Iterator[str]:
         """Execute the command, returning an iterator for the resulting text output"""
-        completed = self.run(*args, **kwargs)
-        try:
-            completed.check_returncode()
-        except subprocess.CalledProcessError as ex:
-            msg = "\n".join(e or "" for e in (completed.stdout, completed.stderr))
-            raise ShellCommandException(msg) from ex
+        return _output_lines(self.run(*args, **kwargs))
+
+    async def call_async(self, *args, **kwargs) -> Iterator[str]:
+        """Asynchronous version of :obj:`__call__` (see :obj:`run_async`)"""
+        return _output_lines(await self.run_async(*args, **kwargs))
+
 
-        return (line for line in (completed.stdout or "").splitlines())
+def _output_lines(completed: subprocess.CompletedProcess) -> Iterator[str]:
+    try:
+        completed.check_returncode()
+    except subprocess.CalledProcessError as ex:
+        msg = "\n".join(e or "" for e in (completed.stdout, completed.stderr))
+        raise ShellCommandException(msg) from ex
+
+    return (line for line in (completed.stdout or "").splitlines())
 
 
 def shell_command_error2exit_decorator(func: Callable):
@@ -108,7 +229,7 @@ def get_git_cmd(**args):
     """
     if sys.platform == "win32":
         for cmd in ["git.cmd", "git.exe"]:
-            git = ShellCommand(cmd, **args)
+            git = ShellCommand(cmd, **{"shell": False, **args})
             try:
                 git("--version")
             except ShellCommandException:
@@ -117,7 +238,7 @@ def get_git_cmd(**args):
         else:
             return None
     else:
-        git = ShellCommand("git", **args)
+        git = ShellCommand("git", **{"shell": False, **args})
         try:
             git("--version")
         except ShellCommandException:
@@ -141,6 +262,11 @@ def command_exists(cmd: str) -> bool:
 git = get_git_cmd()
 
 
+_EXECUTABLES: Dict[Tuple[str, str, Optional[str], bool], Optional[str]] = {}
+_PREFIX_INDEX: Dict[str, List[Tuple[str, List[str]]]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
 def get_executable(
     name: str, prefix: PathLike = sys.prefix, include_path=True
 ) -> Optional[str]:
@@ -151,19 +277,40 @@ def get_executable(
         prefix: look on this directory, exclusively or in additon to $PATH
             depending on the value of ``include_path``. Defaults to :obj:`sys.prefix`.
         include_path: when True the functions tries to look in the entire $PATH.
+
+    The results are cached for each ``name``, ``prefix`` and value of ``$PATH``.
+    :obj:`clear_executable_cache` should be called when executables are added to
+    (or removed from) ``prefix``, e.g. after creating a virtual environment.
     """
-    executable = shutil.which(name)
-    if include_path and executable:
-        return executable
+    key = (name, os.path.abspath(prefix), os.environ.get("PATH"), include_path)
+    with _CACHE_LOCK:
+        if key in _EXECUTABLES:
+            return _EXECUTABLES[key]
 
-    candidates = list(Path(prefix).resolve().glob(f"*/{name}*"))
-    # ^  this works in virtual envs and both Windows and POSIX
-    if candidates:
-        path = [str(f.parent) for f in sorted(candidates, key=lambda p: len(str(p)))]
-        return shutil.which(name, path=os.pathsep.join(path))
-        # ^  which will guarantee we find an executable and not only a regular file
+    executable = shutil.which(name) if include_path else None
+    if not executable:
+        executable = _find_in_prefix(name, key[1])
 
-    return None
+    with _CACHE_LOCK:
+        _EXECUTABLES[key] = executable
+    return executable
+
+
+def clear_executable_cache(prefix: Optional[PathLike] = None):
+    """Forget the results of :obj:`get_executable` for the given ``prefix``
+    (or for all the prefixes when ``None``).
+    """
+    with _CACHE_LOCK:
+        if prefix is None:
+            _EXECUTABLES.clear()
+            _PREFIX_INDEX.clear()
+            return
+
+        real = os.path.realpath(prefix)
+        for key in [k for k in _EXECUTABLES if os.path.realpath(k[1]) == real]:
+            del _EXECUTABLES[key]
+        for path in [p for p in _PREFIX_INDEX if os.path.realpath(p) == real]:
+            del _PREFIX_INDEX[path]
 
 
 def get_command(
@@ -171,12 +318,61 @@ def get_command(
 ) -> Optional[ShellCommand]:
     """Similar to :obj:`get_executable` but return an instance of :obj:`ShellCommand`
     if it is there to be found.
-    Additional kwargs will be passed to the :obj:`ShellCommand` constructor.
+    Additional kwargs will be passed to the :obj:`ShellCommand` constructor
+    (by default the command is executed without a shell, i.e. ``shell=False``).
     """
     executable = get_executable(name, prefix, include_path)
+    kwargs = {"shell": False, **kwargs}
     return ShellCommand(executable, **kwargs) if executable else None
 
 
+def _find_in_prefix(name: str, prefix: str) -> Optional[str]:
+    """Look for ``name`` in the direct subdirectories of ``prefix``
+    (this works in virtual envs and both Windows and POSIX)
+    """
+    with _CACHE_LOCK:
+        index = _PREFIX_INDEX.get(prefix)
+    if index is None:
+        index = _scan_prefix(prefix)
+        with _CACHE_LOCK:
+            _PREFIX_INDEX[prefix] = index
+
+    candidates = [
+        os.path.join(folder, entry)
+        for folder, entries in index
+        for entry in entries
+        if entry.startswith(os.path.normcase(name))
+    ]
+    if candidates:
+        path = [os.path.dirname(f) for f in sorted(candidates, key=len)]
+        return shutil.which(name, path=os.pathsep.join(path))
+        # ^  which will guarantee we find an executable and not only a regular file
+
+    return None
+
+
+def _scan_prefix(prefix: str) -> List[Tuple[str, List[str]]]:
+    """List the entries of each direct subdirectory of ``prefix``
+    (a single pass with :obj:`os.scandir`)
+    """
+    root = str(Path(prefix).resolve())
+    index = []
+    try:
+        with os.scandir(root) as folders:
+            for folder in folders:
+                if not folder.is_dir():
+                    continue
+                try:
+                    with os.scandir(folder.path) as entries:
+                        names = [os.path.normcase(e.name) for e in entries]
+                        index.append((folder.path, names))
+                except OSError:
+                    continue  # e.g. permission denied, same as glob
+    except OSError:
+        pass  # non-existing prefix
+    return index
+
+
 def get_editor(**kwargs):
     """Get an available text editor program"""
     others = (get_executable(e) for e in EDITORS)
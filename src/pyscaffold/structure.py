@@ -10,9 +10,13 @@ from pathlib import Path
 from string import Template
 from typing import Callable, Dict, Optional, Tuple, Union, cast
 
-from . import templates
-from .file_system import PathLike, create_directory
+from . import templates, tracing
+from .archive import ARCHIVE_OPT
+from .file_system import PathLike, Snapshot, create_directory, remove_all
+from .log import logger
 from .operations import (
+    REMOVALS_OPT,
+    SNAPSHOT_OPT,
     FileContents,
     FileOp,
     ScaffoldOpts,
@@ -21,6 +25,7 @@ from .operations import (
     skip_on_update,
 )
 from .templates import get_template
+from .templates.compiled import compile_template
 
 NO_OVERWRITE = no_overwrite()
 SKIP_ON_UPDATE = skip_on_update()
@@ -186,12 +191,31 @@ def create_structure(
     .. versionchanged:: 4.0
        Also accepts :obj:`string.Template` and :obj:`callable` objects as file contents.
     """
+    given_opts = opts
     update = opts.get("update") or opts.get("force")
     pretend = opts.get("pretend")
+    archive = opts.get(ARCHIVE_OPT)
+    snapshot = opts.get(SNAPSHOT_OPT)
+    top_level = snapshot is None
+    if top_level:
+        snapshot = Snapshot()  # existence is checked against directory listings
+        opts = {**opts, SNAPSHOT_OPT: snapshot, REMOVALS_OPT: []}
+
+    def mkdir(path: Path):
+        if archive:  # see pyscaffold.archive
+            return archive.add_directory(path)
+        if update and snapshot.is_dir(path):
+            logger.report("skip", path)
+            return None
+        is_new = not snapshot.exists(path)
+        created = create_directory(path, update, pretend)
+        if not pretend:
+            snapshot.add(path, is_dir=True, empty=is_new)
+        return created
 
     if prefix is None:
         prefix = cast(Path, opts.get("project_path", "."))
-        create_directory(prefix, update, pretend)
+        mkdir(prefix)
     prefix = Path(prefix)
 
     changed: Structure = {}
@@ -199,14 +223,19 @@ def create_structure(
     for name, node in struct.items():
         path = prefix / name
         if isinstance(node, dict):
-            create_directory(path, update, pretend)
+            mkdir(path)
             changed[name], _ = create_structure(node, opts, prefix=path)
         else:
             content, file_op = reify_leaf(node, opts)
-            if file_op(path, content, opts):
-                changed[name] = content
+            op_name = getattr(file_op, "__name__", type(file_op).__name__)
+            with tracing.span(op_name, "file_op", path=path):
+                if file_op(path, content, opts):
+                    changed[name] = content
 
-    return changed, opts
+    if top_level:
+        remove_all(opts.get(REMOVALS_OPT, []), pretend)
+
+    return changed, given_opts
 
 
 # -------- Auxiliary Functions --------
@@ -224,7 +253,7 @@ def reify_content(content: AbstractContent, opts: ScaffoldOpts) -> FileContents:
     if callable(content):
         return content(opts)
     if isinstance(content, Template):
-        return content.safe_substitute(opts)
+        return compile_template(content).render(opts)  # same as safe_substitute
     return content
 
 
@@ -2,9 +2,9 @@
 Templates for all files of a project's scaffold
 """
 
-import os
+import re
 import string
-import sys
+from functools import lru_cache
 from types import ModuleType
 from typing import Any, Dict, Set, Union
 
@@ -14,21 +14,14 @@ from .. import __version__ as pyscaffold_version
 from .. import dependencies as deps
 from .. import toml
 
-if sys.version_info[:2] >= (3, 7):
-    # TODO: Import directly (no need for workaround) when `python_requires = >= 3.7`
-    from importlib.resources import read_text  # pragma: no cover
-else:
-    from pkgutil import get_data  # pragma: no cover
-
-    def read_text(package, resource, encoding="utf-8") -> str:  # pragma: no cover
-        data = get_data(package, resource)
-        if data is None:
-            raise FileNotFoundError(f"{resource!r} resource not found in {package!r}")
-        return data.decode(encoding)
+from .compiled import CompiledTemplate, compile_template
+from .packs import active, package_pack
 
 
 ScaffoldOpts = Dict[str, Any]
 
+SECTION_HEADER = re.compile(r"^\[([^\]]+)\]", re.M)
+
 #: All available licences (identifiers based on SPDX ``https://spdx.org/licenses/``)
 licenses = {
     "MIT": "license_mit",
@@ -105,20 +98,26 @@ def get_template(
     or a combination of `from .. import __name__ as parent` and
     `relative_to=parent` to deal with relative imports.
 
+    The templates in the packs activated with :obj:`pyscaffold.templates.packs.using`
+    (e.g. via ``putup --templates PATH``) take precedence, and the templates shipped
+    with PyScaffold are used when ``relative_to`` does not contain the template
+    (see :mod:`pyscaffold.templates.packs`).
+
     Returns:
-        :obj:`string.Template`: template
+        :obj:`string.Template`: template (line endings are always ``\\n``)
 
     .. versionchanged :: 3.3
         New parameter **relative_to**.
     """
-    file_name = f"{name}.template"
     if isinstance(relative_to, ModuleType):
         relative_to = relative_to.__name__
 
-    data = read_text(relative_to, file_name, encoding="utf-8")
-    # we assure that line endings are converted to '\n' for all OS
-    content = data.replace(os.linesep, "\n")
-    return string.Template(content)
+    for pack in (*active(), package_pack(relative_to), package_pack(__name__)):
+        template = pack.get(name)
+        if template is not None:
+            return template
+
+    raise FileNotFoundError(f"{name}.template not found in {relative_to!r}")
 
 
 def setup_cfg(opts: ScaffoldOpts) -> str:
@@ -131,18 +130,68 @@ def setup_cfg(opts: ScaffoldOpts) -> str:
         str: file content as string
     """
     template = get_template("setup_cfg")
-    cfg_str = template.substitute(opts)
+    sections = _sections(template)
+    if not {"options", "pyscaffold"} <= sections.keys():
+        # e.g. custom templates (see pyscaffold.templates.packs), parse everything
+        updater = ConfigUpdater()
+        updater.read_string(template.substitute(opts))
+        return str(_fill_pyscaffold(_fill_requirements(updater, opts), opts))
+
+    # Only the sections that need to be changed are parsed with ConfigUpdater,
+    # the others are simply rendered (the output is the same)
+    return "".join(_render_section(name, tpl, opts) for name, tpl in sections.items())
+
+
+def setup_cfg_section(name: str, opts: ScaffoldOpts) -> str:
+    """Contents of a single section of :obj:`setup_cfg` (including the header), e.g.
+    for migrations that add a missing section to an existing file.
+    Only the given section is rendered.
+    """
+    return _render_section(name, _sections(get_template("setup_cfg"))[name], opts)
+
+
+@lru_cache(maxsize=16)
+def _sections(template: string.Template) -> Dict[str, CompiledTemplate]:
+    """Split a ``setup.cfg``-like template into sections (the text before the first
+    section header corresponds to the ``""`` key)
+    """
+    text = template.template
+    starts = [m.start() for m in SECTION_HEADER.finditer(text)]
+    chunks = [text[i:j] for i, j in zip([0, *starts], [*starts, len(text)]) if i < j]
+    sections = {}
+    for chunk in chunks:
+        match = SECTION_HEADER.match(chunk)
+        name = match.group(1).strip() if match else ""
+        if name in sections:  # unusual file, better to handle it as a single chunk
+            return {"": CompiledTemplate(template)}
+        sections[name] = CompiledTemplate(type(template)(chunk))
+    return sections
+
+
+def _render_section(name: str, template: CompiledTemplate, opts: ScaffoldOpts) -> str:
+    text = template.substitute(opts)
+    if name not in ("options", "pyscaffold"):
+        return text
+
     updater = ConfigUpdater()
-    updater.read_string(cfg_str)
+    updater.read_string(text)
+    if name == "options":
+        return str(_fill_requirements(updater, opts))
+    return str(_fill_pyscaffold(updater, opts))
+
+
+def _fill_requirements(config: ConfigUpdater, opts: ScaffoldOpts) -> ConfigUpdater:
     requirements = deps.add(deps.RUNTIME, opts.get("requirements", []))
-    updater["options"]["install_requires"].set_values(requirements)
+    config["options"]["install_requires"].set_values(requirements)
+    return config
+
 
+def _fill_pyscaffold(config: ConfigUpdater, opts: ScaffoldOpts) -> ConfigUpdater:
     # fill [pyscaffold] section used for later updates
-    add_pyscaffold(updater, opts)
-    pyscaffold = updater["pyscaffold"]
+    add_pyscaffold(config, opts)
+    pyscaffold = config["pyscaffold"]
     pyscaffold["version"].add_after.option("package", opts["package"])
-
-    return str(updater)
+    return config
 
 
 def add_pyscaffold(config: ConfigUpdater, opts: ScaffoldOpts) -> ConfigUpdater:
@@ -179,7 +228,13 @@ def parse_extensions(extensions: str) -> Set[str]:
 
 def pyproject_toml(opts: ScaffoldOpts) -> str:
     template = get_template("pyproject_toml")
-    config = toml.loads(template.safe_substitute(opts))
+    return _fill_pyproject_toml(compile_template(template).render(opts))
+
+
+@lru_cache(maxsize=16)
+def _fill_pyproject_toml(text: str) -> str:
+    # The rendered template usually does not depend on opts: parse/dump it only once
+    config = toml.loads(text)
     config["build-system"]["requires"] = list(deps.ISOLATED)
     return toml.dumps(config)
 
@@ -207,8 +262,8 @@ def init(opts):
         str: file content as string
     """
     if opts["package"] == opts["name"]:
-        opts["distribution"] = "__name__"
+        distribution = "__name__"
     else:
-        opts["distribution"] = '"{}"'.format(opts["name"])
+        distribution = '"{}"'.format(opts["name"])
     template = get_template("__init__")
-    return template.substitute(opts)
+    return template.substitute({**opts, "distribution": distribution})
@@ -0,0 +1,135 @@
+"""
+Pre-compiled representation of :obj:`string.Template` objects, for rendering the same
+template many times (e.g. when creating hundreds of projects).
+
+:obj:`string.Template.safe_substitute` scans the whole template with a regex every
+time it is called. A :obj:`CompiledTemplate` does that only once, splitting the
+template into literal chunks and placeholder slots, so rendering is simply a matter of
+filling the slots and joining the chunks. The output is the same as
+:obj:`~string.Template.safe_substitute`.
+
+:obj:`render_many` renders a template for a list of option dicts in one call (e.g. for
+the templates shared by the projects in :obj:`~pyscaffold.api.create_projects`):
+option dicts with the same values for the placeholders are rendered only once.
+"""
+import string
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Tuple, Type
+
+
+_MISSING = object()
+
+
+class CompiledTemplate:
+    """Template split into literal chunks and placeholder slots (computed once).
+
+    Args:
+        template: template to be compiled (custom ``delimiter``/``idpattern``/
+            ``pattern`` in subclasses of :obj:`string.Template` are respected)
+    """
+
+    def __init__(self, template: string.Template):
+        self.source = text = template.template  # no reference to the template itself
+        chunks: List[str] = []
+        slots: List[Tuple[int, str]] = []  # (index in chunks, placeholder name)
+        self._invalid = False
+        position = 0
+        for match in template.pattern.finditer(text):
+            chunks.append(text[position : match.start()])
+            position = match.end()
+            groups = match.groupdict()
+            name = groups["named"] or groups["braced"]
+            if name is not None:
+                slots.append((len(chunks), name))
+                chunks.append(match.group())  # kept when the name is missing
+            elif groups["escaped"] is not None:
+                chunks.append(template.delimiter)
+            else:  # invalid placeholders are kept as they are
+                self._invalid = True
+                chunks.append(match.group())
+        chunks.append(text[position:])
+        self._chunks = chunks
+        self._slots = slots
+        self._rendered: Dict[Tuple[Any, ...], str] = {}  # results of render_many
+
+    @property
+    def names(self) -> List[str]:
+        """Name of the placeholders in the template (in order of appearance)"""
+        return [name for _, name in self._slots]
+
+    def render(self, mapping: Mapping[str, Any]) -> str:
+        """Equivalent to :obj:`string.Template.safe_substitute`.
+        Results of the last call to :obj:`render_many` are reused.
+        """
+        if self._rendered:
+            rendered = self._rendered.get(self._key(mapping))
+            if rendered is not None:
+                return rendered
+        return self._render(mapping)
+
+    def render_many(self, mappings: Iterable[Mapping[str, Any]]) -> List[str]:
+        """Render the template once for each of the given mappings.
+
+        Mappings with the same values for the placeholders are rendered only once, and
+        the results are kept, so :obj:`render` can reuse them later
+        (until the next call to this method).
+        """
+        rendered: Dict[Tuple[Any, ...], str] = {}
+        results = []
+        for mapping in mappings:
+            key = self._key(mapping)
+            if key not in rendered:
+                rendered[key] = self._render(mapping)
+            results.append(rendered[key])
+        self._rendered = rendered
+        return results
+
+    def _key(self, mapping: Mapping[str, Any]) -> Tuple[Any, ...]:
+        """Values that determine the result of rendering the template"""
+        return tuple(
+            str(mapping[name]) if name in mapping else _MISSING
+            for _, name in self._slots
+        )
+
+    def _render(self, mapping: Mapping[str, Any]) -> str:
+        chunks = self._chunks[:]
+        for index, name in self._slots:
+            try:
+                chunks[index] = str(mapping[name])
+            except KeyError:
+                pass  # the placeholder is kept
+        return "".join(chunks)
+
+    def substitute(self, mapping: Mapping[str, Any]) -> str:
+        """Equivalent to :obj:`string.Template.substitute` (i.e. missing names raise
+        :obj:`KeyError`)
+        """
+        if self._invalid:
+            raise ValueError(f"Invalid placeholder in template: {self.source!r}")
+        chunks = self._chunks[:]
+        for index, name in self._slots:
+            chunks[index] = str(mapping[name])
+        return "".join(chunks)
+
+
+def compile_template(template: string.Template) -> CompiledTemplate:
+    """Compiled version of the given template.
+    The result is cached by template class and text, so copies of the same template
+    (e.g. the ones in the structures deep-copied by
+    :obj:`~pyscaffold.structure.merge`) are compiled only once.
+    """
+    return _compile(type(template), template.template)
+
+
+@lru_cache(maxsize=256)
+def _compile(cls: Type[string.Template], text: str) -> CompiledTemplate:
+    return CompiledTemplate(cls(text))
+
+
+def render_many(
+    template: string.Template, mappings: Iterable[Mapping[str, Any]]
+) -> List[str]:
+    """Render ``template`` for each of the given mappings (e.g. the options of many
+    projects), see :obj:`CompiledTemplate.render_many`
+    """
+    return compile_template(template).render_many(mappings)
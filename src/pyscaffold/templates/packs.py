@@ -0,0 +1,251 @@
+"""
+Template packs: collections of ``.template`` files that can live in a directory, in a
+zip archive (e.g. a wheel) or inside of a Python package.
+
+The templates of a pack are indexed once (when the pack is loaded), and the compiled
+:obj:`string.Template` objects are cached, so looking up a template does not touch the
+file system more than once.
+
+:obj:`~pyscaffold.templates.get_template` uses a layered lookup: the packs activated
+with :obj:`using` (e.g. via ``putup --templates PATH``) are consulted first, then the
+package given as ``relative_to`` (usually an extension) and finally the templates
+shipped with PyScaffold. This way, templates can be overridden without writing an
+extension.
+
+Distributions of PyScaffold (built with ``setup.py``) also include a bundle with all
+the built-in templates in a single module (:obj:`BUNDLE`), so they are loaded with a
+single read. In development installs the individual files are used instead.
+"""
+import importlib
+import os
+import string
+import sys
+import zipfile
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..exceptions import ErrorLoadingTemplates
+from ..identification import is_valid_identifier
+
+if sys.version_info[:2] >= (3, 7):
+    # TODO: Import directly (no need for workaround) when `python_requires = >= 3.7`
+    from importlib.resources import read_text  # pragma: no cover
+else:
+    from pkgutil import get_data  # pragma: no cover
+
+    def read_text(package, resource, encoding="utf-8") -> str:  # pragma: no cover
+        data = get_data(package, resource)
+        if data is None:
+            raise FileNotFoundError(f"{resource!r} resource not found in {package!r}")
+        return data.decode(encoding)
+
+
+PathLike = Union[str, os.PathLike]
+
+SUFFIX = ".template"
+
+BUNDLE = f"{__package__}._bundle"
+"""Module generated when building PyScaffold with the built-in templates"""
+
+
+class TemplatePack:
+    """Base class for a collection of templates, indexed by name (i.e. the file name
+    without the ``.template`` extension).
+
+    Subclasses should set :obj:`index` (name => location inside of the pack) when the
+    pack is created and implement :obj:`read_file`.
+    """
+
+    def __init__(self, location: str, index: Dict[str, str]):
+        self.location = location
+        self.index = index
+        self._compiled: Dict[str, string.Template] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.location!r})"
+
+    def names(self) -> List[str]:
+        """Names of all the templates in the pack (sorted)"""
+        return sorted(self.index)
+
+    def read(self, name: str) -> str:
+        """Contents of the template (with ``\\n`` line endings)"""
+        return self.read_file(self.index[name]).replace(os.linesep, "\n")
+
+    def read_file(self, member: str) -> str:
+        raise NotImplementedError
+
+    def get(self, name: str) -> Optional[string.Template]:
+        """Compiled template (``None`` if the pack does not contain the template)"""
+        template = self._compiled.get(name)
+        if template is None and name in self.index:
+            template = self._compiled.setdefault(name, string.Template(self.read(name)))
+        return template
+
+
+class DirectoryPack(TemplatePack):
+    """Templates stored directly inside of a directory"""
+
+    def __init__(self, path: PathLike):
+        with os.scandir(str(path)) as entries:
+            index = {
+                e.name[: -len(SUFFIX)]: e.path
+                for e in entries
+                if e.name.endswith(SUFFIX) and e.is_file()
+            }
+        super().__init__(str(path), index)
+
+    def read_file(self, member: str) -> str:
+        return Path(member).read_text(encoding="utf-8")
+
+
+class ZipPack(TemplatePack):
+    """Templates stored inside of a zip archive (e.g. a wheel).
+    The templates can be in any folder of the archive (when the same name is used
+    more than once, the template closer to the root wins).
+    """
+
+    def __init__(self, path: PathLike):
+        with zipfile.ZipFile(str(path)) as archive:
+            members = [m for m in archive.namelist() if m.endswith(SUFFIX)]
+        index: Dict[str, str] = {}
+        for member in sorted(members, key=lambda m: (m.count("/"), m)):
+            index.setdefault(member.rsplit("/", 1)[-1][: -len(SUFFIX)], member)
+        super().__init__(str(path), index)
+
+    def read_file(self, member: str) -> str:
+        with zipfile.ZipFile(self.location) as archive:
+            return archive.read(member).decode("utf-8")
+
+
+class PackagePack(TemplatePack):
+    """Templates stored inside of a Python package (as package data).
+
+    Packages installed in the file system are indexed as a directory, otherwise
+    (e.g. zipimport) the templates are read with :mod:`importlib.resources`.
+    """
+
+    def __init__(self, package: str):
+        module = importlib.import_module(package)
+        folders = [p for p in getattr(module, "__path__", []) if os.path.isdir(p)]
+        self._lazy = len(folders) != 1  # e.g. zipped or namespace packages
+        index = {} if self._lazy else DirectoryPack(folders[0]).index
+        super().__init__(package, index)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def names(self) -> List[str]:
+        if self._lazy:  # the templates are only indexed when they are used
+            for resource in _resources(self.location):
+                if resource.endswith(SUFFIX):
+                    self.index.setdefault(resource[: -len(SUFFIX)], resource)
+        return super().names()
+
+    def read_file(self, member: str) -> str:
+        if self._lazy:
+            return read_text(self.location, member, encoding="utf-8")
+        return Path(member).read_text(encoding="utf-8")
+
+    def get(self, name: str) -> Optional[string.Template]:
+        if not self._lazy or name in self._compiled:
+            return super().get(name)
+        try:
+            text = read_text(self.location, name + SUFFIX, encoding="utf-8")
+        except (FileNotFoundError, TypeError):  # TypeError: not a package
+            return None
+        self.index[name] = name + SUFFIX
+        template = string.Template(text.replace(os.linesep, "\n"))
+        return self._compiled.setdefault(name, template)
+
+
+def _resources(package: str) -> List[str]:
+    """Names of the resources inside of the given package (best effort: e.g. empty
+    for Python 3.6)
+    """
+    try:
+        if sys.version_info[:2] >= (3, 9):
+            from importlib.resources import files
+
+            return [resource.name for resource in files(package).iterdir()]
+        from importlib.resources import contents  # pragma: no cover
+
+        return list(contents(package))  # pragma: no cover
+    except (ImportError, TypeError, ValueError, OSError):
+        return []
+
+
+class BundlePack(TemplatePack):
+    """Templates frozen in a single module, as a ``TEMPLATES`` dict
+    (name => contents with ``\\n`` line endings), see :obj:`BUNDLE`
+    """
+
+    def __init__(self, module: ModuleType):
+        self._contents: Dict[str, str] = module.TEMPLATES  # type: ignore
+        super().__init__(module.__name__, {name: name for name in self._contents})
+
+    def read(self, name: str) -> str:
+        return self._contents[name]  # already normalised
+
+
+def load(location: PathLike) -> TemplatePack:
+    """Load the template pack in the given location: a directory, a zip archive
+    (e.g. a wheel) or the name of a Python package.
+    :obj:`~pyscaffold.exceptions.ErrorLoadingTemplates` is raised otherwise.
+    """
+    path = Path(location)
+    if path.is_dir():
+        return DirectoryPack(path)
+    if path.is_file() and zipfile.is_zipfile(str(path)):
+        return ZipPack(path)
+
+    name = str(location)
+    if path.exists() or not all(map(is_valid_identifier, name.split("."))):
+        raise ErrorLoadingTemplates(name)  # e.g. a missing directory
+    try:
+        return package_pack(name)
+    except ImportError as ex:
+        raise ErrorLoadingTemplates(name) from ex
+
+
+@lru_cache(maxsize=None)
+def package_pack(package: str) -> TemplatePack:
+    """Template pack for the given package (loaded only once)"""
+    if package == __package__:
+        try:
+            return BundlePack(importlib.import_module(BUNDLE))
+        except ImportError:
+            pass  # development install => individual files
+
+    return PackagePack(package)
+
+
+_ACTIVE: "ContextVar[Tuple[TemplatePack, ...]]" = ContextVar("packs", default=())
+
+
+def active() -> Tuple[TemplatePack, ...]:
+    """Packs activated with :obj:`using` (in order of precedence)"""
+    return _ACTIVE.get()
+
+
+@contextmanager
+def using(locations: Iterable[Union[PathLike, TemplatePack]]) -> Iterator[None]:
+    """Give precedence to the templates in the given packs (the first ones win)
+    during the execution of the block of code.
+
+    The packs are only visible in the current thread/asyncio task (and the ones that
+    copy its :mod:`contextvars`), so different scaffolds can use different packs.
+    """
+    packs = tuple(p if isinstance(p, TemplatePack) else load(p) for p in locations)
+    token = _ACTIVE.set(packs + _ACTIVE.get())
+    try:
+        yield
+    finally:
+        _ACTIVE.reset(token)
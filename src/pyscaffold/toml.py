@@ -4,15 +4,27 @@ to swap implementations (e.g. replace `tomlkit`_ with `toml`_).
 Despite being used in `pep517`_, `toml`_ offers limited support for comments, so we
 prefer `tomlkit`_.
 
+`tomlkit`_ is much slower than the parsers that do not preserve style, therefore when
+the parsed document is only inspected (never written back), ``loads(text,
+read_only=True)`` uses :mod:`tomllib` (Python 3.11+) or `tomli`_ instead, if available.
 
 .. _tomlkit: https://github.com/sdispater/tomlkit
 .. _toml: https://github.com/uiri/toml
+.. _tomli: https://github.com/hukkin/tomli
 .. _pep517: https://github.com/pypa/pep517
 """
 from typing import Any, List, Mapping, MutableMapping, NewType, Tuple, TypeVar, cast
 
 import tomlkit
 
+try:
+    import tomllib as fast_parser  # type: ignore
+except ImportError:  # pragma: no cover
+    try:
+        import tomli as fast_parser  # type: ignore
+    except ImportError:
+        fast_parser = None  # type: ignore
+
 TOMLMapping = NewType("TOMLMapping", MutableMapping[str, Any])
 """Abstraction on the value returned by :obj:`loads`.
 
@@ -23,10 +35,16 @@ the formatting and comments of the original TOML file.
 T = TypeVar("T")
 
 
-def loads(text: str) -> TOMLMapping:
+def loads(text: str, read_only: bool = False) -> TOMLMapping:
     """Parse a string containing TOML into a dict-like object,
     preserving style somehow.
+
+    When ``read_only`` is ``True``, the style is not preserved (a plain :obj:`dict` is
+    returned), which is much faster. Use it when the object is not going to be given
+    to :obj:`dumps`.
     """
+    if read_only and fast_parser is not None:
+        return TOMLMapping(fast_parser.loads(text))
     return TOMLMapping(tomlkit.loads(text))
 
 
@@ -0,0 +1,253 @@
+"""
+Optional span tracing for diagnosing slow scaffolds.
+
+When a trace is being recorded (see :obj:`record`), PyScaffold emits one span for each
+action invoked in the pipeline, for each file operation executed by
+:obj:`~pyscaffold.structure.create_structure`, for each subprocess run by
+:obj:`~pyscaffold.shell.ShellCommand` and for each configuration file read by
+:obj:`~pyscaffold.info.read_setupcfg`.
+
+The spans can be exported to a local file either in the `Chrome trace event`_ format
+(that can be opened with https://ui.perfetto.dev or ``chrome://tracing``) or in the
+`OTLP JSON`_ format used by OpenTelemetry collectors.
+
+When no trace is being recorded, :obj:`span` returns a shared no-op object, so the
+instrumentation has negligible overhead.
+
+.. _Chrome trace event: https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+.. _OTLP JSON: https://opentelemetry.io/docs/specs/otlp/#json-protobuf-encoding
+"""  # noqa
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Union
+
+from . import __version__ as pyscaffold_version
+
+PathLike = Union[str, os.PathLike]
+
+FORMATS = ("chrome", "otlp")
+"""Formats in which the recorded spans can be exported"""
+
+DEFAULT_FORMAT = FORMATS[0]
+
+
+class Span:
+    """Interval of time in which something happened during the scaffold.
+
+    Spans work as context managers, the time is measured between entering and exiting
+    the ``with`` block. Additional attributes can be added with :obj:`set`.
+    """
+
+    def __init__(self, trace: "Trace", name: str, category: str, args: dict):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.args = args
+        self.id = os.urandom(8).hex()
+        self.parent: Optional[str] = None
+        self.thread = 0
+        self.start = 0.0
+        self.end = 0.0
+        self.error: Optional[str] = None
+        self._token: Any = None
+
+    def set(self, key: str, value: Any):
+        """Add an attribute to the span"""
+        self.args[key] = value
+
+    def __enter__(self):
+        self.parent = _CURRENT_SPAN.get()
+        self._token = _CURRENT_SPAN.set(self.id)
+        self.thread = threading.get_ident()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, _traceback):
+        self.end = time.perf_counter()
+        _CURRENT_SPAN.reset(self._token)
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc_value}"
+        self.trace.spans.append(self)
+        # ^  list.append is atomic, so spans can be finished in different threads
+
+
+class _NullSpan:
+    """Span that does nothing, used when no trace is being recorded"""
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return None
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """Collection of spans recorded during a scaffold"""
+
+    def __init__(self):
+        self.id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.origin = time.perf_counter()
+        self.epoch = time.time()
+
+    def _micros(self, timestamp: float) -> float:
+        return round((timestamp - self.origin) * 1e6, 3)
+
+    def _nanos(self, timestamp: float) -> str:
+        return str(int((self.epoch + timestamp - self.origin) * 1e9))
+
+    def to_chrome(self) -> dict:
+        """Represent the trace as a dict in the Chrome trace event format"""
+        pid = os.getpid()
+        events = [
+            {
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "ts": self._micros(s.start),
+                "dur": self._micros(s.end) - self._micros(s.start),
+                "pid": pid,
+                "tid": s.thread,
+                "args": _serialisable(
+                    {**s.args, **({"error": s.error} if s.error else {})}
+                ),
+            }
+            for s in sorted(self.spans, key=lambda s: s.start)
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def to_otlp(self) -> dict:
+        """Represent the trace as a dict in the OTLP JSON format"""
+        spans = []
+        for s in sorted(self.spans, key=lambda s: s.start):
+            attrs = {"pyscaffold.category": s.category, **s.args}
+            span = {
+                "traceId": self.id,
+                "spanId": s.id,
+                "name": s.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": self._nanos(s.start),
+                "endTimeUnixNano": self._nanos(s.end),
+                "attributes": [_otlp_attribute(k, v) for k, v in attrs.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {},
+            }
+            if s.parent:
+                span["parentSpanId"] = s.parent
+            spans.append(span)
+
+        scope = {"name": __name__, "version": pyscaffold_version}
+        resource = {"attributes": [_otlp_attribute("service.name", "pyscaffold")]}
+        return {
+            "resourceSpans": [
+                {"resource": resource, "scopeSpans": [{"scope": scope, "spans": spans}]}
+            ]
+        }
+
+    def export(self, file: Union[PathLike, IO[str]], format: str = DEFAULT_FORMAT):
+        """Write the trace to ``file`` (path or text stream) in the given format"""
+        if format not in FORMATS:
+            raise ValueError(f"Invalid trace format {format!r}, choose from {FORMATS}")
+
+        data = self.to_chrome() if format == "chrome" else self.to_otlp()
+        if hasattr(file, "write"):
+            json.dump(data, file)  # type: ignore
+        else:
+            Path(file).write_text(json.dumps(data), encoding="utf-8")  # type: ignore
+
+
+_CURRENT_TRACE: "ContextVar[Optional[Trace]]" = ContextVar("trace", default=None)
+_CURRENT_SPAN: "ContextVar[Optional[str]]" = ContextVar("span", default=None)
+
+
+def span(name: str, category: str, **args):
+    """Measure the execution of a block of code as a span in the current trace.
+
+    Example:
+
+        .. code-block:: python
+
+            from pyscaffold import tracing
+
+            with tracing.span("git", "shell", argv=["git", "init"]) as span:
+                ...
+                span.set("exit_code", 0)
+
+    When no trace is being recorded, the span is ignored.
+    """
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        return NULL_SPAN
+
+    return Span(trace, name, category, args)
+
+
+def is_recording() -> bool:
+    """``True`` if a trace is being recorded in the current context"""
+    return _CURRENT_TRACE.get() is not None
+
+
+@contextmanager
+def record(
+    file: Union[None, PathLike, IO[str]] = None, format: str = DEFAULT_FORMAT
+) -> Iterator[Optional[Trace]]:
+    """Record a trace while executing the block of code and export it to ``file``
+    (path or text stream) in the given ``format`` (one of :obj:`FORMATS`).
+
+    When ``file`` is ``None`` nothing is recorded.
+    The trace is only visible in the current thread/asyncio task (and the ones that
+    copy its :mod:`contextvars`), so different scaffolds can be traced independently.
+    """
+    if file is None:
+        yield None
+        return
+
+    if format not in FORMATS:
+        raise ValueError(f"Invalid trace format {format!r}, choose from {FORMATS}")
+
+    trace = Trace()
+    token = _CURRENT_TRACE.set(trace)
+    try:
+        yield trace
+    finally:
+        _CURRENT_TRACE.reset(token)
+        trace.export(file, format)
+
+
+# -------- Auxiliary functions --------
+
+
+def _serialisable(args: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: _json_value(v) for k, v in args.items()}
+
+
+def _json_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_json_value(v) for v in value]
+    return str(value)
+
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    value = _json_value(value)
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    if isinstance(value, list):
+        values = [{"stringValue": str(v)} for v in value]
+        return {"key": key, "value": {"arrayValue": {"values": values}}}
+    return {"key": key, "value": {"stringValue": "" if value is None else value}}
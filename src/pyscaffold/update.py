@@ -90,7 +90,7 @@ def add_entrypoints(setupcfg: ConfigUpdater, opts: ScaffoldOpts):
         return setupcfg, opts
 
     new_section = ConfigUpdater()
-    new_section.read_string(templates.setup_cfg(opts))
+    new_section.read_string(templates.setup_cfg_section(new_section_name, opts))
     new_section = new_section[new_section_name]
 
     add_after_sect = "options.extras_require"
@@ -152,7 +152,8 @@ def handover_setup_requires(setupcfg: ConfigUpdater, opts: ScaffoldOpts):
     options = setupcfg["options"]
     if "setup_requires" in options and opts.get("isolated_build", True):
         setup_requires = options.pop("setup_requires", Object(value=""))
-        opts.setdefault("build_deps", []).extend(deps.split(setup_requires.value))
+        build_deps = deps.split(setup_requires.value)
+        opts["build_deps"] = [*opts.get("build_deps", []), *build_deps]
 
     return setupcfg, opts
 
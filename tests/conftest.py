@@ -249,7 +249,7 @@ def git_mock(monkeypatch, logger):
         cmd = " ".join(["git"] + list(args))
 
         if kwargs.get("log", False):
-            logger.report("run", cmd, context=os.getcwd())
+            logger.report("run", cmd, context=kwargs.get("cwd") or os.getcwd())
 
         def _response():
             yield "git@mock"
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 import logging
+import os
 import sys
 from pathlib import Path
 from unittest.mock import Mock
@@ -77,6 +78,49 @@ def test_install(monkeypatch, caplog):
     assert not exec.called
 
 
+def test_write_hook(tmpfolder, monkeypatch):
+    # When the project is not a git repository
+    opts = {"project_path": Path(str(tmpfolder), "proj")}
+    # then no hook is written
+    assert not pre_commit.write_hook(opts)
+
+    # When the project contains an existing (non pre-commit) hook
+    hooks = Path(str(tmpfolder), "proj/.git/hooks")
+    hooks.mkdir(parents=True)
+    (hooks / "pre-commit").write_text("#!/bin/sh\necho legacy", "utf-8")
+    monkeypatch.setattr(pre_commit, "find_spec", Mock(return_value=None))
+    assert pre_commit.write_hook(opts)
+
+    # then the hook is written in the same format as `pre-commit install`
+    hook = hooks / "pre-commit"
+    text = hook.read_text("utf-8")
+    assert pre_commit.HOOK_MARKER in text
+    assert "INSTALL_PYTHON=''\n" in text
+    args = "hook-impl --config=.pre-commit-config.yaml --hook-type=pre-commit"
+    assert f"ARGS=({args})\n" in text
+    assert os.access(str(hook), os.X_OK)
+    # and the old hook is preserved
+    assert "legacy" in (hooks / "pre-commit.legacy").read_text("utf-8")
+
+    # When the hook is written again, the legacy hook is not overwritten
+    pre_commit.write_hook(opts)
+    assert "legacy" in (hooks / "pre-commit.legacy").read_text("utf-8")
+
+
+def test_install_with_shim(monkeypatch, caplog):
+    caplog.set_level(logging.WARNING)
+    # When the shim option is given
+    exec = Mock()
+    monkeypatch.setattr(shell, "get_command", Mock(return_value=exec))
+    write_hook = Mock(return_value=True)
+    monkeypatch.setattr(pre_commit, "write_hook", write_hook)
+    pre_commit.install({}, {"pre_commit_shim": True})
+    # then `pre-commit install` should not run
+    assert not exec.called
+    assert write_hook.called
+    assert_in_logs(caplog, pre_commit.SUCCESS_MSG)
+
+
 def test_add_instructions():
     old_text = get_template("readme")
     opts = {"title": "proj", "name": "proj", "description": "desc", "version": "99.9"}
@@ -106,6 +150,18 @@ def test_create_project_with_pre_commit(tmpfolder, caplog):
     assert_in_logs(caplog, pre_commit.UPDATE_MSG)
 
 
+def test_cli_with_pre_commit_shim(tmpfolder):
+    # Given the command line with the pre-commit-shim option,
+    # when pyscaffold runs,
+    run(["--pre-commit-shim", "proj"])
+
+    # then pre-commit files should exist
+    assert Path("proj/.pre-commit-config.yaml").exists()
+    # and the hook should be installed
+    hook = Path("proj/.git/hooks/pre-commit")
+    assert pre_commit.HOOK_MARKER in hook.read_text("utf-8")
+
+
 def test_create_project_without_pre_commit(tmpfolder):
     # Given options without the pre-commit extension,
     opts = dict(project_path="proj")
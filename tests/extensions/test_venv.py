@@ -1,3 +1,5 @@
+import os
+import sys
 from argparse import ArgumentError
 from itertools import product
 from pathlib import Path
@@ -39,6 +41,12 @@ def test_cli_opts():
     opts = parse("--venv-install", "appdirs>=1.1,<2", "six")
     assert opts["venv_install"] == ["appdirs>=1.1,<2", "six"]
     assert [e.name for e in opts["extensions"]] == ["venv"]
+    # venv-cache
+    assert parse("--venv-cache")["venv_cache"] is True
+    assert parse("--venv-cache", "/tmp/seeds")["venv_cache"] == "/tmp/seeds"
+    # venv-wheelhouse
+    opts = parse("--venv-wheelhouse", "wheels")
+    assert opts["venv_wheelhouse"] == Path("wheels")
     # venv-install but no value
     with pytest.raises((ArgumentError, TypeError, SystemExit)):
         # ^  TypeError happens because argparse tries to iterate over the --config opts
@@ -89,6 +97,102 @@ def test_already_exists(monkeypatch, tmpfolder):
     venv_mock.assert_not_called()
 
 
+def _fake_creator(path, pretend=False):
+    # Simulate a venv with scripts referencing its own location
+    (path / "bin").mkdir(parents=True)
+    (path / "lib").mkdir()
+    (path / "pyvenv.cfg").write_text(f"home = /usr/bin\ncommand = venv {path}\n")
+    (path / "bin/pip").write_text(f"#!{path}/bin/python\nimport pip\n")
+    (path / "bin/activate").write_text(f"VIRTUAL_ENV={path}\nPS1=({path.name})\n")
+    (path / "bin/python").write_bytes(b"\x7fELF\0" + str(path).encode())
+    (path / "lib/module.py").write_text("x = 1\n")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="seed cache not used on Windows")
+def test_create_from_seed(tmpfolder):
+    seeds = Path(tmpfolder, "seeds")
+    calls = []
+
+    def creator(path, pretend=False):
+        calls.append(path)
+        _fake_creator(path, pretend)
+
+    # When multiple venvs are created from the seed cache,
+    venv.create_from_seed(Path(tmpfolder, "proj1/.venv"), creator, seeds)
+    venv.create_from_seed(Path(tmpfolder, "proj2/.venv"), creator, seeds)
+    # then the creator is called only once,
+    assert len(calls) == 1
+    (seed,) = [p for p in seeds.iterdir()]
+    assert seed.name == venv.seed_fingerprint(creator)
+    # and the paths are fixed in the scripts
+    target = Path(tmpfolder, "proj2/.venv")
+    assert f"#!{target}/bin/python" in (target / "bin/pip").read_text()
+    activate = (target / "bin/activate").read_text()
+    assert f"VIRTUAL_ENV={target}\n" in activate
+    assert "PS1=(.venv)" in activate
+    assert str(target) in (target / "pyvenv.cfg").read_text()
+    assert not (target / venv.SEED_MARKER).exists()
+    # but binaries are not changed
+    assert b"tmp" in (target / "bin/python").read_bytes()
+    # and the seed itself is not affected
+    assert str(target) not in (seed / "bin/pip").read_text()
+    # Other files are hard linked, when possible
+    module = target / "lib/module.py"
+    if module.stat().st_nlink > 1:
+        assert module.samefile(seed / "lib/module.py")
+
+
+def test_evict_seeds(tmpfolder):
+    seeds = Path(tmpfolder, "seeds")
+    for i in range(5):
+        (seeds / f"seed{i}").mkdir(parents=True)
+        (seeds / f"seed{i}" / venv.SEED_MARKER).write_text("origin")
+        os.utime(str(seeds / f"seed{i}"), (i, i))
+    (seeds / "other").mkdir()  # not a seed
+    venv.evict_seeds(seeds, keep=2)
+    assert sorted(p.name for p in seeds.iterdir()) == ["other", "seed3", "seed4"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="seed cache not used on Windows")
+def test_evict_seeds_in_use(tmpfolder):
+    seeds = Path(tmpfolder, "seeds")
+    for i in range(2):
+        (seeds / f"seed{i}").mkdir(parents=True)
+        (seeds / f"seed{i}" / venv.SEED_MARKER).write_text("origin")
+        os.utime(str(seeds / f"seed{i}"), (i, i))
+    # Seeds being cloned are not removed
+    with venv._lock_seed(seeds / "seed0") as locked:
+        assert locked
+        venv.evict_seeds(seeds, keep=1)
+        assert (seeds / "seed0").exists()
+    venv.evict_seeds(seeds, keep=1)
+    assert not (seeds / "seed0").exists()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="seed cache not used on Windows")
+def test_create_from_seed_relative_path(tmpfolder):
+    # When the venv path is relative (e.g. ``project_path="myproj"``),
+    venv.create_from_seed(Path("myproj/.venv"), _fake_creator, Path("seeds"))
+    # then the scripts still reference the absolute location
+    target = Path(tmpfolder, "myproj/.venv").resolve()
+    assert (target / "bin/pip").read_text().startswith(f"#!{target}/bin/python\n")
+    assert f"VIRTUAL_ENV={target}\n" in (target / "bin/activate").read_text()
+
+
+def test_run_with_venv_cache(monkeypatch, tmpfolder):
+    create_mock = Mock()
+    monkeypatch.setattr(venv, "create_from_seed", create_mock)
+    opts = {"project_path": Path(tmpfolder), "venv": ".venv", "venv_cache": True}
+    venv.run({}, opts)
+    create_mock.assert_called_once()
+    assert create_mock.call_args[0][2] is None  # default cache dir
+    # pretend => the cache is not used
+    create_mock.reset_mock()
+    monkeypatch.setattr(venv, "create_with_virtualenv", Mock())
+    venv.run({}, {**opts, "pretend": True})
+    create_mock.assert_not_called()
+
+
 # ---- Integration tests ----
 
 
@@ -155,6 +259,72 @@ def test_install_packages_no_pip(venv_path, tmpfolder, monkeypatch):
     assert "pip cannot be found" in str(ex)
 
 
+def test_install_packages_from_wheelhouse(tmpfolder, monkeypatch):
+    # Given pip is "installed" in the venv
+    pip = Mock()
+    pip.stream.return_value = iter(["Successfully installed six"])
+    monkeypatch.setattr(venv, "get_command", Mock(return_value=pip))
+
+    # when we run install_packages with a wheelhouse
+    opts = {
+        "project_path": Path(str(tmpfolder)),
+        "venv": ".venv",
+        "venv_install": ["six", "six"],
+        "venv_wheelhouse": Path("wheels"),
+    }
+    Path("wheels").mkdir()
+    venv.install_packages({}, opts)
+
+    # then pip should not access the package index
+    pip.stream.assert_called_once_with(
+        "install", "-U", "--no-index", "--find-links", "wheels", "six"
+    )
+
+
+def test_install_packages_populates_wheelhouse(tmpfolder, monkeypatch):
+    pip = Mock()
+    pip.stream.return_value = iter([])
+    monkeypatch.setattr(venv, "get_command", Mock(return_value=pip))
+
+    def _fake_populate(packages, wheelhouse, pretend=False):
+        calls.append(list(packages))
+        Path(wheelhouse).mkdir()
+        (Path(wheelhouse) / "six-1.0-py3-none-any.whl").touch()
+
+    calls = []
+    monkeypatch.setattr(venv, "populate_wheelhouse", _fake_populate)
+
+    # When the wheelhouse does not exist yet,
+    opts = {
+        "project_path": Path(str(tmpfolder)),
+        "venv_install": ["six"],
+        "venv_wheelhouse": Path("wheels"),
+    }
+    for _ in range(2):  # e.g. several projects
+        venv.install_packages({}, opts)
+
+    # then it is populated only once
+    assert calls == [["six"]]
+    assert list(Path("wheels").iterdir()) == [Path("wheels/six-1.0-py3-none-any.whl")]
+    assert not list(Path(".").glob("*.tmp"))
+
+
+def test_populate_wheelhouse(monkeypatch):
+    # Given pip is available for the running Python
+    pip = Mock()
+    pip.stream.return_value = iter([])
+    shell_command = Mock(return_value=pip)
+    monkeypatch.setattr(venv, "ShellCommand", shell_command)
+
+    # when we populate the wheelhouse
+    venv.populate_wheelhouse(["six", "appdirs", "six"], "wheels")
+
+    # then the wheels are built with the current interpreter's pip
+    shell_command.assert_called_once_with(sys.executable, shell=False)
+    args = ("-m", "pip", "wheel", "--wheel-dir", "wheels", "six", "appdirs")
+    pip.stream.assert_called_once_with(*args, pretend=False)
+
+
 @pytest.mark.slow
 def test_api_with_venv(tmpfolder):
     venv_path = Path(tmpfolder) / "proj/.venv"
@@ -198,3 +368,20 @@ def test_cli_with_venv_and_pretend(tmpfolder):
     # then the venv will not be created, or even the project itself
     assert not venv_path.exists()
     assert not proj_path.exists()
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(sys.platform == "win32", reason="seed cache not used on Windows")
+@pytest.mark.parametrize(
+    "creator", [venv.create_with_virtualenv, venv.create_with_stdlib]
+)
+def test_create_from_seed_real_venv(tmpfolder, creator):
+    seeds = Path(tmpfolder, "seeds")
+    for name in ("proj1", "proj2"):
+        venv.create_from_seed(Path(tmpfolder, name, ".venv"), creator, seeds)
+
+    target = Path(tmpfolder, "proj2/.venv").resolve()
+    python = venv.get_command("python", target, include_path=False)
+    assert Path(next(python("-c", "import sys; print(sys.prefix)"))) == target
+    pip = venv.get_command("pip", target, include_path=False)
+    assert str(target) in next(pip("--version"))
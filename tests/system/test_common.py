@@ -46,7 +46,7 @@ def test_putup(cwd, putup):
     with cwd.join("myproj").as_cwd():
         # then the new version of PyScaffold should produce packages with
         # the correct build deps
-        pyproject_toml = read_pyproject(".")
+        pyproject_toml = read_pyproject(".", read_only=True)
         stored_deps = " ".join(pyproject_toml["build-system"]["requires"])
         for dep in BUILD_DEPS:
             assert dep in stored_deps
@@ -1,10 +1,27 @@
+import asyncio
+import threading
 from pathlib import Path
 
 import pytest
 
-from pyscaffold.actions import discover, get_default_options
+from pyscaffold.actions import (
+    MIDDLEWARE,
+    add_middleware,
+    declare,
+    dependency_graph,
+    discover,
+    get_default_options,
+    hooks,
+)
 from pyscaffold.actions import init_git as orig_init_git
-from pyscaffold.actions import register, unregister, verify_project_dir
+from pyscaffold.actions import (
+    invoke,
+    invoke_async,
+    register,
+    run_concurrently,
+    unregister,
+    verify_project_dir,
+)
 from pyscaffold.api import bootstrap_options
 from pyscaffold.exceptions import (
     ActionNotFound,
@@ -153,3 +170,216 @@ def test_unregister_with_undefined_action():
         pipeline = unregister(pipeline, "undefined_action")
     # And the action list should remain the same
     assert pipeline == [orig_init_git]
+
+
+def test_invoke_with_middleware():
+    # Given a chain of middleware,
+    calls = []
+
+    def outer(action_id, proceed, struct, opts):
+        calls.append(("outer", action_id))
+        return proceed(struct, {**opts, "outer": True})
+
+    def inner(action_id, proceed, struct, opts):
+        calls.append(("inner", opts.get("outer")))
+        struct, opts = proceed(struct, opts)
+        return {**struct, "inner": "file"}, opts
+
+    # When an action is invoked,
+    opts = {MIDDLEWARE: [outer, inner]}
+    struct, opts = invoke(({}, opts), custom_action)
+
+    # Then the middleware should wrap the action in the given order
+    assert calls == [("outer", "awesome_module:custom_action"), ("inner", True)]
+    assert struct == {"inner": "file"}
+    assert opts["outer"]
+
+
+def test_invoke_with_memoizing_middleware():
+    # Given a middleware that skips the action
+    def memoize(action_id, proceed, struct, opts):
+        return {"cached": "value"}, opts
+
+    def failing_action(struct, opts):
+        raise AssertionError("should not be called")
+
+    # When the action is invoked, the middleware result should be used
+    struct, _ = invoke(({}, add_middleware({}, memoize)), failing_action)
+    assert struct == {"cached": "value"}
+
+
+def test_hooks():
+    events = []
+
+    def before(action_id, struct, opts):
+        events.append(("before", action_id, struct))
+
+    def after(action_id, struct, opts, result):
+        events.append(("after", action_id, result[0]))
+
+    def error(action_id, struct, opts, ex):
+        events.append(("error", action_id, str(ex)))
+
+    def action(struct, opts):
+        return {"file": "content"}, opts
+
+    def failing_action(struct, opts):
+        raise ValueError("failed")
+
+    opts = add_middleware({}, hooks(before, after, error))
+    invoke(({}, opts), action)
+    with pytest.raises(ValueError):
+        invoke(({}, opts), failing_action)
+
+    action_id = f"{__name__}:action"
+    failing_id = f"{__name__}:failing_action"
+    assert events == [
+        ("before", action_id, {}),
+        ("after", action_id, {"file": "content"}),
+        ("before", failing_id, {}),
+        ("error", failing_id, "failed"),
+    ]
+
+
+def test_add_middleware():
+    def middleware1(*_):
+        ...
+
+    def middleware2(*_):
+        ...
+
+    opts = {"other": 1}
+    new_opts = add_middleware(add_middleware(opts, middleware1), middleware2)
+    assert new_opts[MIDDLEWARE] == [middleware1, middleware2]
+    assert MIDDLEWARE not in opts  # original opts are not modified
+
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_invoke_async():
+    main_thread = threading.get_ident()
+    threads = []
+
+    def sync_action(struct, opts):
+        threads.append(threading.get_ident())
+        return {**struct, "sync": "file"}, opts
+
+    async def async_action(struct, opts):
+        threads.append(threading.get_ident())
+        await asyncio.sleep(0)
+        return {**struct, "async": "file"}, opts
+
+    async def pipeline(opts):
+        params = await invoke_async(({}, opts), sync_action)
+        return await invoke_async(params, async_action)
+
+    # Regular actions run in a thread pool and coroutines in the event loop
+    struct, _ = _run(pipeline({}))
+    assert struct == {"sync": "file", "async": "file"}
+    assert threads[0] != main_thread
+    assert threads[1] == main_thread
+
+    # Middleware also wrap coroutine actions
+    calls = []
+
+    def middleware(action_id, proceed, struct, opts):
+        calls.append(action_id)
+        return proceed(struct, opts)
+
+    struct, _ = _run(pipeline(add_middleware({}, middleware)))
+    assert struct == {"sync": "file", "async": "file"}
+    assert calls == [f"{__name__}:sync_action", f"{__name__}:async_action"]
+    assert threads[3] == main_thread
+
+
+def _action(name, reads=None, writes=None, calls=None):
+    def _impl(struct, opts):
+        if calls is not None:
+            calls.append(name)
+        return struct, {**opts, name: True}
+
+    _impl.__name__ = name
+    return _impl if reads is None else declare(reads, writes or [])(_impl)
+
+
+def test_dependency_graph():
+    pipeline = [
+        _action("first"),  # undeclared actions are barriers
+        _action("git", ["struct"], ["disk/.git"]),
+        _action("venv", ["opts/venv"], ["disk/.venv"]),
+        _action("pip", ["opts/venv"], ["disk/.venv/lib"]),
+        _action("hook", ["disk/.venv"], ["disk/.git/hooks"]),
+        _action("info", ["opts/venv"]),
+        _action("last"),
+    ]
+    assert dependency_graph(pipeline) == [
+        set(),
+        {0},
+        {0},
+        {2},  # .venv/lib is inside of .venv
+        {1, 3},  # (2 is an indirect dependency)
+        {0},  # only reading does not create dependencies
+        {4, 5},
+    ]
+
+
+def test_run_concurrently():
+    # Given independent actions that can only finish if executed concurrently,
+    barrier = threading.Barrier(2, timeout=10)
+
+    @declare(reads=["opts/project_path"], writes=["opts/a", "disk/a"])
+    def action_a(struct, opts):
+        barrier.wait()
+        return struct, {**opts, "a": 1, "ignored": True}
+
+    @declare(reads=["opts/project_path"], writes=["struct", "disk/b"])
+    def action_b(struct, opts):
+        barrier.wait()
+        return {**struct, "b": "file"}, opts
+
+    calls = []
+    pipeline = [
+        _action("first", calls=calls),
+        action_a,
+        action_b,
+        _action("last", calls=calls),
+    ]
+    # when they are executed with run_concurrently
+    struct, opts = run_concurrently(pipeline, ({}, {"project_path": "."}))
+    # then the declared changes are merged
+    assert struct == {"b": "file"}
+    assert opts["a"] == 1
+    assert "ignored" not in opts
+    # and the undeclared actions are executed in order
+    assert calls == ["first", "last"]
+    assert opts["first"] and opts["last"]
+
+
+def test_dependency_graph_with_options():
+    # Given resources computed from the options,
+    venv_dir = declare(writes=[lambda opts: "disk/" + opts.get("venv", ".venv")])
+    pipeline = [
+        venv_dir(_action("venv")),
+        _action("hook", ["disk/.venv"], ["disk/.git/hooks"]),
+    ]
+    # the dependencies depend on the options
+    assert dependency_graph(pipeline) == [set(), {0}]
+    assert dependency_graph(pipeline, {"venv": ".env"}) == [set(), set()]
+
+
+def test_run_concurrently_alone():
+    # When a declared action does not run concurrently with other actions
+    @declare(reads=["opts/project_path"], writes=["disk/a"])
+    def action(struct, opts):
+        return {**struct, "a": "file"}, {**opts, "undeclared": True}
+
+    struct, opts = run_concurrently([_action("first"), action], ({}, {}))
+    # then all of its changes are kept
+    assert struct == {"a": "file"}
+    assert opts["undeclared"]
@@ -1,18 +1,37 @@
+import asyncio
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from copy import copy
+from functools import partial
 from os.path import getmtime
 from pathlib import Path
 from textwrap import dedent
 
 import pytest
 
-from pyscaffold import cli, info, operations, structure, templates
+from pyscaffold import api, cli, info, operations, structure, templates
 from pyscaffold.actions import get_default_options
-from pyscaffold.api import NO_CONFIG, bootstrap_options, create_project
+from pyscaffold.api import (
+    NO_CONFIG,
+    bootstrap_options,
+    create_project,
+    create_project_async,
+    create_projects,
+    update_projects,
+)
 from pyscaffold.exceptions import (
     DirectoryAlreadyExists,
     InvalidIdentifier,
     NoPyScaffoldProject,
 )
 from pyscaffold.extensions import Extension
+from pyscaffold.extensions.cirrus import Cirrus
+from pyscaffold.extensions.namespace import Namespace
+from pyscaffold.extensions.no_skeleton import NoSkeleton
+from pyscaffold.extensions.no_tox import NoTox
+from pyscaffold.extensions.pre_commit import PreCommit
 from pyscaffold.file_system import chdir
 
 
@@ -334,3 +353,240 @@ def test_options_with_existing_proj_config_and_cli(with_existing_proj_config):
     assert opts["url"] == "www.example.com"
     assert opts["license"] == "GPL-3.0-only"
     assert opts["package"] == "super_proj"
+
+
+def test_create_project_with_middleware(tmpfolder, git_mock):
+    # Given a stateful middleware object,
+    class Counter:
+        def __init__(self):
+            self.ids = []
+
+        def __call__(self, action_id, proceed, struct, opts):
+            self.ids.append(action_id)
+            return proceed(struct, opts)
+
+    counter = Counter()
+    # and a config file (config files cause the options to be copied),
+    config = Path("default.cfg")
+    config.write_text("[metadata]\nauthor = John Doe\n[pyscaffold]\n")
+
+    # when the project is created with the middleware
+    create_project(project_path="proj", middleware=[counter], config_files=[config])
+
+    # then all the actions should be wrapped
+    assert "pyscaffold.actions:get_default_options" in counter.ids
+    assert "pyscaffold.structure:create_structure" in counter.ids
+    assert counter.ids[-1] == "pyscaffold.actions:report_done"
+
+
+def test_create_project_concurrently_without_chdir(tmpfolder, monkeypatch):
+    # Given the process-wide working directory cannot be changed,
+    def _forbidden_chdir(path):
+        raise AssertionError(f"os.chdir({path!r}) should not be called")
+
+    # when many projects are created concurrently in threads,
+    def _create(i):
+        opts = dict(
+            project_path=f"proj{i}",
+            namespace=f"ns{i}",
+            extensions=[Namespace("namespace")],
+            config_files=NO_CONFIG,
+        )
+        return create_project(opts)
+
+    with monkeypatch.context() as patch, ThreadPoolExecutor(max_workers=8) as executor:
+        patch.setattr("os.chdir", _forbidden_chdir)
+        results = list(executor.map(_create, range(16)))
+
+    # then each project is created in its own folder
+    assert len(results) == 16
+    for i in range(16):
+        proj = Path(f"proj{i}")
+        assert (proj / f"src/ns{i}/proj{i}/__init__.py").exists()
+        assert not (proj / f"src/proj{i}").exists()
+        assert (proj / ".git").is_dir()
+
+
+def test_create_projects(tmpfolder, git_mock):
+    # When several projects are created in a batch with bounded concurrency
+    opts_list = [
+        dict(project_path=f"proj{i}", config_files=NO_CONFIG) for i in range(6)
+    ]
+    results = create_projects(opts_list, max_workers=2)
+
+    # then the results are given in the same order as the options
+    assert [opts["project_path"] for _, opts in results] == [
+        Path(f"proj{i}") for i in range(6)
+    ]
+    for i in range(6):
+        assert Path(f"proj{i}/src/proj{i}/__init__.py").exists()
+
+    # and errors are propagated
+    with pytest.raises(DirectoryAlreadyExists):
+        create_projects([dict(project_path="proj0", config_files=NO_CONFIG)])
+
+
+@pytest.mark.parametrize("start_method", multiprocessing.get_all_start_methods())
+def test_update_projects(tmpfolder, monkeypatch, start_method):
+    # The workers might not inherit the state of the tests (e.g. ``git_mock``)
+    context = multiprocessing.get_context(start_method)
+    monkeypatch.setattr(
+        api, "ProcessPoolExecutor", partial(ProcessPoolExecutor, mp_context=context)
+    )
+    # Given some existing projects (using the real git, so the workspace is clean)
+    for name in ("old", "current", "broken"):
+        create_project(project_path=name, config_files=NO_CONFIG)
+    # one of them already in the current version of PyScaffold
+    monkeypatch.setattr(api, "VERSION", "9999")
+    setupcfg = Path("current/setup.cfg")
+    setupcfg.write_text(re.sub(r"version = .*", "version = 9999", setupcfg.read_text()))
+    # and another with a broken config
+    Path("broken/setup.cfg").write_text("[pyscaffold]\n")
+
+    # when the projects are updated
+    paths = ["old", "current", "broken"]
+    results = update_projects(paths, workers=2, opts={"config_files": NO_CONFIG})
+
+    # then each project is reported accordingly (in the given order)
+    status = [(str(r.path), r.status) for r in results]
+    assert status == [("old", "updated"), ("current", "skipped"), ("broken", "failed")]
+    old = next(r for r in results if str(r.path) == "old")
+    assert old.changed > 0
+    broken = next(r for r in results if str(r.path) == "broken")
+    assert "KeyError" in broken.error
+
+
+def test_update_project_timeout(tmpfolder, monkeypatch):
+    # The deadline is checked before each action
+    def _slow_bootstrap(opts):
+        time.sleep(0.2)
+        return {**opts, "extensions": []}
+
+    def _action(struct, opts):
+        raise AssertionError("should not be invoked after the deadline")
+
+    monkeypatch.setattr(api, "bootstrap_options", _slow_bootstrap)
+    monkeypatch.setattr(api, "_PIPELINES", {(): [_action]})
+    with pytest.raises(TimeoutError):
+        api._update_project(Path("proj"), {}, timeout=0.1)
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="the worker processes need to inherit the monkeypatched pipeline",
+)
+def test_update_projects_timeout(tmpfolder, monkeypatch):
+    # Given an action that runs past the deadline,
+    def _sleep(struct, opts):
+        time.sleep(30)
+        return struct, opts
+
+    def _bootstrap(opts):
+        return {**opts, "extensions": []}
+
+    monkeypatch.setattr(api, "bootstrap_options", _bootstrap)
+    monkeypatch.setattr(api, "_PIPELINES", {(): [_sleep]})
+    # when the projects are updated with a timeout
+    start = time.monotonic()
+    results = update_projects(["proj"], timeout=0.5, opts={"force": True})
+    # then the worker is terminated and the project is reported as failed
+    assert time.monotonic() - start < 10
+    assert [r.status for r in results] == ["failed"]
+    assert "TimeoutError" in results[0].error
+
+
+def test_create_project_does_not_change_given_opts(tmpfolder, git_mock):
+    opts = dict(
+        project_path="proj",
+        extensions=[Namespace("namespace"), PreCommit("pre_commit")],
+        namespace="ns",
+        requirements=["pkg"],
+        config_files=NO_CONFIG,
+    )
+    frozen = {k: copy(v) for k, v in opts.items()}
+    create_project(opts)
+    assert opts == frozen
+    assert opts["requirements"] == ["pkg"]
+
+
+@pytest.mark.slow
+def test_create_project_in_parallel_threads(tmpfolder, git_mock):
+    # Given a variety of options,
+    variants = [
+        ([], ""),
+        ([Namespace("namespace")], "ns.sub"),
+        ([PreCommit("pre_commit"), Cirrus("cirrus")], ""),
+        ([NoSkeleton("no_skeleton"), NoTox("no_tox")], ""),
+    ]
+
+    def _opts(parent, i):
+        extensions, namespace = variants[i % len(variants)]
+        return dict(
+            project_path=f"{parent}/proj{i}",
+            namespace=namespace,
+            extensions=extensions,
+            requirements=["pkg"],
+            release_date="2020-01-01",
+            config_files=NO_CONFIG,
+        )
+
+    n = 200
+    # when the projects are created serially and concurrently
+    for i in range(n):
+        create_project(_opts("serial", i))
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(lambda i: create_project(_opts("parallel", i)), range(n)))
+
+    # then the outputs should be the same
+    def _files(parent):
+        root = Path(parent)
+        return {
+            str(p.relative_to(root)): p.read_bytes()
+            for p in root.glob("**/*")
+            if p.is_file()
+        }
+
+    serial = _files("serial")
+    assert serial
+    assert serial == _files("parallel")
+
+
+def test_create_project_async(tmpfolder, git_mock):
+    # Given an extension with a coroutine action,
+    async def async_hook(struct, opts):
+        await asyncio.sleep(0)
+        return {**struct, "async.txt": "created"}, opts
+
+    extension = create_extension(async_hook)
+
+    # when many projects are created concurrently in the same event loop
+    async def _main():
+        return await asyncio.gather(
+            *(
+                create_project_async(
+                    project_path=f"proj{i}",
+                    extensions=[extension],
+                    config_files=NO_CONFIG,
+                )
+                for i in range(8)
+            )
+        )
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(_main())
+    finally:
+        loop.close()
+
+    # then all of them should be created
+    assert len(results) == 8
+    for i, (struct, opts) in enumerate(results):
+        assert opts["name"] == f"proj{i}"
+        assert Path(f"proj{i}/async.txt").read_text() == "created"
+        assert Path(f"proj{i}/setup.cfg").exists()
+
+
+def test_create_project_parallel(tmpfolder, git_mock):
+    _, opts = create_project(project_path="proj", parallel=True, config_files=NO_CONFIG)
+    assert opts["parallel"]
+    assert Path("proj/setup.cfg").exists()
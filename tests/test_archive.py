@@ -0,0 +1,122 @@
+import stat
+import tarfile
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from pyscaffold import archive, structure
+from pyscaffold.api import create_project
+from pyscaffold.cli import run
+from pyscaffold.extensions import Extension
+from pyscaffold.operations import add_permissions
+
+
+def test_guess_format():
+    assert archive.guess_format("proj.zip") == "zip"
+    assert archive.guess_format("proj.tar.gz") == "tar.gz"
+    assert archive.guess_format("proj.tar") == "tar"
+    assert archive.guess_format(Path("proj.tar.xz")) == "tar.xz"
+    assert archive.guess_format("-") == archive.DEFAULT_FORMAT
+
+
+def test_invalid_format():
+    with pytest.raises(ValueError):
+        archive.Archive(BytesIO(), "rar")
+
+
+@pytest.mark.parametrize("format", ["tar.gz", "zip"])
+def test_archive(tmpfolder, format):
+    stream = BytesIO()
+    with archive.Archive(stream, format, root="proj") as ar:
+        ar.add_directory("proj")
+        ar.add_directory("proj/bin")
+        ar.add_file("proj/bin/run.sh", "#!/bin/sh\necho hello\n")
+        assert ar.add_permissions("proj/bin/run.sh", stat.S_IXUSR)
+        ar.add_file("proj/README.rst", "Hello")
+        # permissions can only be added to the last file
+        assert ar.add_permissions("proj/bin/run.sh", stat.S_IXGRP) is None
+
+    # Nothing should be written to the disk
+    assert not Path("proj").exists()
+
+    stream.seek(0)
+    if format == "zip":
+        with zipfile.ZipFile(stream) as zf:
+            names = zf.namelist()
+            assert zf.read("proj/README.rst") == b"Hello"
+            modes = {i.filename: i.external_attr >> 16 for i in zf.infolist()}
+        script_mode = modes["proj/bin/run.sh"]
+    else:
+        with tarfile.open(fileobj=stream) as tf:
+            names = [m.name + ("/" if m.isdir() else "") for m in tf.getmembers()]
+            assert tf.extractfile("proj/README.rst").read() == b"Hello"
+            script_mode = tf.getmember("proj/bin/run.sh").mode
+
+    assert names == ["proj/", "proj/bin/", "proj/bin/run.sh", "proj/README.rst"]
+    assert stat.S_IMODE(script_mode) == archive.FILE_MODE | stat.S_IXUSR
+
+
+def test_archive_exists_and_remove(tmpfolder):
+    with archive.Archive(BytesIO(), "tar", root="proj") as ar:
+        ar.add_directory("proj")
+        ar.add_file("proj/a.txt", "a")
+        ar.add_file("proj/b.txt", "b")
+        # The state is given by the archive (not the disk)
+        assert ar.exists("proj") and ar.exists("proj/a.txt")
+        assert not ar.exists("proj/c.txt")
+        # Only the last file can be removed (the others are already written)
+        assert ar.remove("proj/a.txt") is None
+        assert ar.remove("proj/b.txt") == Path("proj/b.txt")
+        assert not ar.exists("proj/b.txt")
+
+
+def test_create_project_with_archive_and_existing_dir(tmpfolder):
+    # Given a directory with the same name exists in the disk
+    Path("proj").mkdir()
+    Path("proj/README.rst").write_text("existing")
+    # when the project is written to an archive
+    create_project(project_path="proj", output_archive="proj.tar")
+    # then the disk is not considered (e.g. for no_overwrite)
+    with tarfile.open("proj.tar") as tf:
+        assert b"existing" not in tf.extractfile("proj/README.rst").read()
+        assert tf.getmember("proj/setup.cfg").isfile()
+    assert Path("proj/README.rst").read_text() == "existing"
+
+
+def test_create_project_with_archive(tmpfolder):
+    # Given an extension that adds an executable file
+    class AddScript(Extension):
+        def activate(self, actions):
+            return self.register(actions, add_script, after="define_structure")
+
+    def add_script(struct, opts):
+        script = ("#!/bin/sh\n", add_permissions(stat.S_IXUSR))
+        return structure.merge(struct, {"run.sh": script}), opts
+
+    # when the project is created with an output archive,
+    opts = dict(
+        project_path="proj", output_archive="proj.tar.gz", extensions=[AddScript()]
+    )
+    create_project(opts)
+
+    # then the project is not written to the disk (and git is not initialised)
+    assert not Path("proj").exists()
+    # but the files are in the archive, with the given permissions
+    with tarfile.open("proj.tar.gz") as tf:
+        assert tf.getmember("proj/setup.cfg").isfile()
+        assert tf.getmember("proj/src/proj/__init__.py").isfile()
+        assert tf.getmember("proj/run.sh").mode & stat.S_IXUSR
+        assert not any(n.startswith("proj/.git/") for n in tf.getnames())
+
+
+def test_cli_with_archive(tmpfolder, capsysbinary):
+    # When the archive is streamed to the standard output
+    run(["proj", "--output-archive", "-", "--output-archive-format", "zip"])
+
+    # then only the archive is written to stdout
+    out, _ = capsysbinary.readouterr()
+    with zipfile.ZipFile(BytesIO(out)) as zf:
+        assert "proj/setup.cfg" in zf.namelist()
+    assert not Path("proj").exists()
@@ -0,0 +1,152 @@
+import os
+import zipfile
+from datetime import date
+from importlib import import_module
+from pathlib import Path
+
+import pytest
+
+from pyscaffold import cache, structure
+from pyscaffold.api import create_project
+from pyscaffold.cli import main
+from pyscaffold.extensions.namespace import Namespace
+from pyscaffold.templates import packs
+
+
+def files_in(folder):
+    return {
+        p.relative_to(folder).as_posix(): (p.read_bytes(), p.stat().st_mode)
+        for p in Path(folder).glob("**/*")
+        if p.is_file() and ".git" not in p.parts
+    }
+
+
+def test_create_project_with_cache(tmpfolder, git_mock, monkeypatch):
+    cache_dir = Path(str(tmpfolder), "cache")
+    opts = dict(scaffold_cache=cache_dir, release_date="2020-01-01", year=2020)
+
+    # When a project is created for the first time, it is stored in the cache
+    create_project(opts, project_path="first/proj")
+    assert cache.stats(cache_dir)["entries"] == 1
+
+    # When another project is created with the same options,
+    # then the templates should not be rendered again
+    def _forbidden(*args):
+        raise AssertionError("reify_leaf should not be called")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(structure, "reify_leaf", _forbidden)
+        struct, _ = create_project(opts, project_path="second/proj")
+
+    # and the same files should be generated
+    assert files_in("first/proj") == files_in("second/proj")
+    assert "__init__.py" in struct["src"]["proj"]
+    assert cache.stats(cache_dir)["entries"] == 1
+
+    # When the options change, a new entry is created
+    extra = dict(extensions=[Namespace()], namespace="ns")
+    create_project(opts, project_path="third/proj", **extra)
+    assert Path("third/proj/src/ns/proj/__init__.py").exists()
+    assert cache.stats(cache_dir)["entries"] == 2
+
+
+def test_key():
+    opts = dict(name="proj", package="proj", year=2020, project_path="a/proj")
+    # The project_path does not influence the generated files
+    assert cache.key(opts) == cache.key({**opts, "project_path": "b/proj"})
+    # but other options (e.g. dates) do
+    assert cache.key(opts) != cache.key({**opts, "year": 2021})
+    assert cache.key(opts) != cache.key({**opts, "extensions": [Namespace()]})
+    # Known types are normalised
+    same = {**opts, "path": Path("a"), "date": date(2020, 1, 1), "func": cache.key}
+    assert cache.key(same) == cache.key({**same, "path": "a"})
+    # and values without a stable representation are refused
+    with pytest.raises(cache.NotCacheable):
+        cache.key({**opts, "func": lambda: None})
+    with pytest.raises(cache.NotCacheable):
+        cache.key({**opts, "obj": object()})
+
+
+def test_templates_hash(tmp_path, monkeypatch):
+    # The templates of the extensions are considered
+    folder = tmp_path / "myext"
+    (folder / "templates").mkdir(parents=True)
+    (folder / "__init__.py").write_text(
+        "from pyscaffold.extensions import Extension\n\n"
+        "class MyExt(Extension):\n    pass\n"
+    )
+    (folder / "templates/readme.template").write_text("v1")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    extension = import_module("myext").MyExt()
+    before = cache.templates_hash([extension])
+    assert before != cache.templates_hash()
+    # and the changes are considered
+    (folder / "templates/readme.template").write_text("v2")
+    assert cache.templates_hash([extension]) != before
+
+
+def test_templates_hash_packs(tmp_path, monkeypatch):
+    # Given an extension installed as a zip archive
+    with zipfile.ZipFile(str(tmp_path / "zipext.zip"), "w") as zf:
+        zf.writestr(
+            "zipext/__init__.py",
+            "from pyscaffold.extensions import Extension\n\n"
+            "class ZipExt(Extension):\n    pass\n",
+        )
+        zf.writestr("zipext/templates/__init__.py", "")
+        zf.writestr("zipext/templates/readme.template", "zipped")
+    monkeypatch.syspath_prepend(str(tmp_path / "zipext.zip"))
+    extension = import_module("zipext").ZipExt()
+    # then its templates are found (without a folder in the file system)
+    assert packs.package_pack("zipext.templates").names() == ["readme"]
+    default = cache.templates_hash()
+    assert cache.templates_hash([extension]) != default
+    # and the activated template packs are also considered
+    folder = tmp_path / "pack"
+    folder.mkdir()
+    (folder / "readme.template").write_text("custom")
+    with packs.using([folder]):
+        assert cache.templates_hash() != default
+    assert cache.templates_hash() == default
+
+
+def test_middleware_not_cacheable(tmpfolder, git_mock):
+    # Options without a stable representation disable the cache
+    cache_dir = Path(str(tmpfolder), "cache")
+    create_project(project_path="proj", scaffold_cache=cache_dir, obj=object())
+    assert Path("proj/setup.cfg").exists()
+    assert cache.stats(cache_dir)["entries"] == 0
+
+
+def test_cacheable():
+    assert cache.cacheable({})
+    assert not cache.cacheable({"update": True})
+    assert not cache.cacheable({"pretend": True})
+    assert not cache.cacheable({"output_archive": "-"})
+
+
+def test_evict(tmpfolder):
+    cache_dir = Path(str(tmpfolder))
+    for i in range(4):
+        entry = cache_dir / f"{i}{cache.SUFFIX}"
+        entry.write_text("x" * 10)
+        os.utime(str(entry), (i, i))
+
+    # When the cache exceeds the max size, the least recently used are removed
+    cache.evict(cache_dir, max_size=25)
+    assert sorted(p.name for p in cache_dir.glob("*.json")) == ["2.json", "3.json"]
+
+
+def test_cli_cache(tmpfolder, capsys):
+    cache_dir = Path(str(tmpfolder))
+    (cache_dir / f"entry{cache.SUFFIX}").write_text("{}")
+
+    main(["cache", "stats", "--dir", str(cache_dir)])
+    out, _ = capsys.readouterr()
+    assert "entries: 1" in out
+    assert "size: 2 bytes" in out
+
+    main(["cache", "clear", "--dir", str(cache_dir)])
+    out, _ = capsys.readouterr()
+    assert "1 entries removed" in out
+    assert cache.stats(cache_dir)["entries"] == 0
@@ -114,6 +114,23 @@ def test_main_when_updating(tmpfolder, capsys, git_mock):
     assert "Update accomplished!" in out
 
 
+def test_main_with_update_all(tmpfolder, capsys, git_mock):
+    # Given projects in the current version and a broken one
+    for name in ("group/proj1", "proj2", "broken"):
+        cli.main([name])
+    tmpfolder.join("broken/setup.cfg").write("[pyscaffold]\n")
+    capsys.readouterr()
+
+    # when putup is called with --update-all
+    with pytest.raises(SystemExit):
+        cli.main(["--update-all", ".", "--workers", "2", "--timeout", "60"])
+
+    # then a summary should be printed
+    out, _ = capsys.readouterr()
+    assert "updated: 0, skipped: 2, failed: 1, files changed: 0" in out
+    assert "broken: KeyError" in out
+
+
 def test_main_with_old_setuptools(tmpfolder, old_setuptools_mock):
     args = ["my-project"]
     with pytest.raises(OldSetuptools):
@@ -136,6 +153,19 @@ def test_main_with_list_actions(tmpfolder, capsys, isolated_logger):
     assert not os.path.exists(args[0])
 
 
+def test_main_with_list_actions_graph(tmpfolder, capsys, isolated_logger):
+    # When putup is called with --list-actions --graph,
+    cli.main(["my-project", "--venv", "--list-actions", "--graph"])
+    # then the dependencies of each action should be printed
+    out, _ = capsys.readouterr()
+    lines = [line.strip() for line in out.splitlines()]
+    venv_run = lines.index("pyscaffold.extensions.venv:run")
+    assert lines[venv_run + 1] == "after pyscaffold.structure:create_structure"
+    assert lines[venv_run + 2] == "pyscaffold.extensions.venv:install_packages"
+    report_done = lines.index("pyscaffold.actions:report_done")
+    assert "after pyscaffold.actions:init_git" in lines[report_done:]
+
+
 def test_wrong_extension(monkeypatch, tmpfolder):
     # Given an entry point with some problems is registered in the pyscaffold.cli group
     # (e.g. failing implementation, wrong dependencies that cause the python file to
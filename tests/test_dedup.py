@@ -0,0 +1,119 @@
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import sleep
+
+import pytest
+
+from pyscaffold import dedup
+from pyscaffold.api import create_projects
+from pyscaffold.operations import add_permissions, create
+from pyscaffold.structure import create_structure
+
+
+def test_store_hardlink(tmp_path):
+    store = dedup.Store(dedup.HARDLINK)
+    opts = {dedup.DEDUP_OPT: store}
+    create(tmp_path / "a", "content", opts)
+    create(tmp_path / "b", "content", opts)
+    create(tmp_path / "c", "other", opts)
+
+    # Identical contents are linked, but the others are written as usual
+    assert os.path.samefile(tmp_path / "a", tmp_path / "b")
+    assert not os.path.samefile(tmp_path / "a", tmp_path / "c")
+    assert (tmp_path / "b").read_text() == "content"
+    assert (tmp_path / "c").read_text() == "other"
+
+
+def test_store_reflink(tmp_path):
+    store = dedup.Store()
+    store.create(tmp_path / "a", "content")
+    store.create(tmp_path / "b", "content")
+    # Reflinks might not be supported by the file system, but the contents are
+    # always correct and the files are independent
+    assert (tmp_path / "b").read_text() == "content"
+    assert not os.path.samefile(tmp_path / "a", tmp_path / "b")
+
+
+def test_store_unsupported(tmp_path, monkeypatch):
+    calls = []
+
+    def _unsupported(source, target):
+        calls.append(target)
+        raise OSError(dedup.errno.EOPNOTSUPP, "not supported")
+
+    monkeypatch.setattr(dedup, "reflink", _unsupported)
+    store = dedup.Store()
+    for name in "abc":
+        store.create(tmp_path / name, "content")
+    # Links are not attempted again after the first failure
+    assert calls == [tmp_path / "b"]
+    assert all((tmp_path / name).read_text() == "content" for name in "abc")
+
+
+def test_enable():
+    assert dedup.DEDUP_OPT not in dedup.enable({})
+    stores = {}
+    opts1 = dedup.enable({"dedup": True}, stores)
+    opts2 = dedup.enable({"dedup": "reflink"}, stores)
+    assert opts1[dedup.DEDUP_OPT] is opts2[dedup.DEDUP_OPT]
+    assert opts1[dedup.DEDUP_OPT].mode == dedup.REFLINK
+    with pytest.raises(ValueError):
+        dedup.enable({"dedup": "symlink"})
+
+
+def test_create_projects_with_dedup(tmpfolder, git_mock):
+    opts = [dict(project_path=f"proj{i}", dedup=dedup.HARDLINK) for i in range(2)]
+    create_projects(opts)
+    # Boilerplate shared by the projects is linked
+    assert os.path.samefile("proj0/docs/Makefile", "proj1/docs/Makefile")
+    # but files with project specific contents are not
+    assert not os.path.samefile("proj0/setup.cfg", "proj1/setup.cfg")
+    assert "proj1" in Path("proj1/setup.cfg").read_text()
+
+
+def test_store_concurrent(tmp_path, monkeypatch):
+    writes = []
+    create_file = dedup.fs.create_file
+
+    def _slow_create_file(path, *args, **kwargs):
+        writes.append(path)
+        sleep(0.05)  # give the other threads time to find the digest reserved
+        return create_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(dedup.fs, "create_file", _slow_create_file)
+    store = dedup.Store(dedup.HARDLINK)
+    paths = [tmp_path / f"file{i}" for i in range(8)]
+    with ThreadPoolExecutor(len(paths)) as executor:
+        list(executor.map(lambda p: store.create(p, "content"), paths))
+    # Only the first file is written, the others wait for it and are linked
+    assert len(writes) == 1
+    assert all(os.path.samefile(writes[0], path) for path in paths)
+
+
+def test_unshare(tmp_path):
+    create(tmp_path / "a", "content", {})
+    os.link(tmp_path / "a", tmp_path / "b")
+    dedup.unshare(tmp_path / "b")
+    assert not os.path.samefile(tmp_path / "a", tmp_path / "b")
+    assert (tmp_path / "b").read_text() == "content"
+    dedup.unshare(tmp_path / "missing")  # nothing happens
+
+
+def test_update_project_with_dedup(tmpfolder, git_mock):
+    opts = [dict(project_path=f"proj{i}", dedup=dedup.HARDLINK) for i in range(2)]
+    create_projects(opts)
+    assert os.path.samefile("proj0/docs/Makefile", "proj1/docs/Makefile")
+    original = Path("proj1/docs/Makefile").read_text()
+    mode = Path("proj1/docs/Makefile").stat().st_mode
+
+    # When one of the projects is changed (e.g. updated with --force),
+    struct = {"docs": {"Makefile": ("changed", add_permissions(stat.S_IXUSR))}}
+    create_structure(struct, dict(project_path=Path("proj0"), update=True, force=True))
+
+    # the other projects are not
+    assert Path("proj0/docs/Makefile").read_text() == "changed"
+    assert Path("proj0/docs/Makefile").stat().st_mode & stat.S_IXUSR
+    assert Path("proj1/docs/Makefile").read_text() == original
+    assert Path("proj1/docs/Makefile").stat().st_mode == mode
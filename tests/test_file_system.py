@@ -3,6 +3,8 @@ import os
 import re
 import stat
 
+import pytest
+
 from pyscaffold import file_system as fs
 
 from .helpers import temp_umask, uniqpath, uniqstr
@@ -228,6 +230,83 @@ def test_rm_rf(tmp_path):
     assert not file.exists()
 
 
+def test_snapshot(tmp_path):
+    # Given a directory tree exists
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir/file").write_text("text")
+    snapshot = fs.Snapshot()
+    # then the snapshot reflects it
+    assert snapshot.is_dir(tmp_path / "dir")
+    assert snapshot.exists(tmp_path / "dir/file")
+    assert not snapshot.is_dir(tmp_path / "dir/file")
+    assert not snapshot.exists(tmp_path / "missing/file")
+    # and changes can be recorded without listing the directories again
+    snapshot.add(tmp_path / "dir/other")
+    snapshot.add(tmp_path / "new", is_dir=True, empty=True)
+    snapshot.discard(tmp_path / "dir/file")
+    assert snapshot.exists(tmp_path / "dir/other")
+    assert snapshot.is_dir(tmp_path / "new")
+    assert not snapshot.exists(tmp_path / "new/file")
+    assert not snapshot.exists(tmp_path / "dir/file")
+    snapshot.discard(tmp_path / "dir")
+    assert not snapshot.exists(tmp_path / "dir")
+
+
+def test_remove_all(tmp_path):
+    root = tmp_path / uniqstr()
+    # Given nested dirs and files exist
+    (root / "dir1/dir2").mkdir(parents=True)
+    (root / "dir1/dir2/file").write_text("text")
+    (root / "file").write_text("text")
+    (root / "kept").write_text("text")
+    paths = ["dir1/dir2/file", "dir1", "file", "missing", "dir1/dir2"]
+    # When they are removed all at once
+    removed = fs.remove_all([root / p for p in paths])
+    # Then nested paths are removed together with their parents
+    assert removed == [root / "dir1", root / "file"]
+    assert [p.name for p in root.iterdir()] == ["kept"]
+
+
+def test_on_ro_error(tmp_path, monkeypatch):
+    delays = []
+    monkeypatch.setattr(fs, "sleep", delays.append)
+    file = tmp_path / "file"
+    file.write_text("text")
+    error = PermissionError("file in use")
+    attempts = []
+
+    def _unlink(path):
+        attempts.append(path)
+        if len(attempts) < 3:
+            raise error
+        os.unlink(path)
+
+    # When the removal fails with a permission error, it is retried with backoff
+    fs.on_ro_error(_unlink, str(file), (type(error), error, None))
+    assert not file.exists()
+    assert len(attempts) == 3
+    assert delays == [fs.RETRY_DELAY, 2 * fs.RETRY_DELAY]
+
+    # but the retries are bounded
+    file.write_text("text")
+    delays.clear()
+    with pytest.raises(PermissionError):
+        fs.on_ro_error(_raise(error), str(file), (type(error), error, None))
+    assert len(delays) == fs.RETRIES - 1
+
+    # and paths that no longer exist are ignored without waiting
+    delays.clear()
+    fs.on_ro_error(_raise(error), str(tmp_path / "missing"), (None, error, None))
+    assert not delays
+
+
+def _raise(error):
+    def _func(_path):
+        raise error
+
+    return _func
+
+
 def test_pretend_rm_rf(tmp_path, caplog):
     # Given nested dirs and files exist
     dname = uniqstr()  # Use a unique name to get easily identifiable logs
@@ -147,6 +147,31 @@ def test_project_old_setupcfg(tmpfolder):
         info.project({}, config_path=demoapp)
 
 
+def test_find_projects(tmpfolder):
+    # Given a tree with projects
+    pyscaffold_cfg = "[metadata]\nname = x\n\n[pyscaffold]\nversion = 4.0\n"
+    tree = {
+        "a": {"setup.cfg": pyscaffold_cfg, "sub": {"setup.cfg": pyscaffold_cfg}},
+        "b": {"setup.cfg": "[metadata]\nname = b\n"},  # not generated by PyScaffold
+        "group": {"c": {"setup.cfg": pyscaffold_cfg}},
+        ".hidden": {"setup.cfg": pyscaffold_cfg},
+        "node_modules": {"d": {"setup.cfg": pyscaffold_cfg}},
+    }
+    structure.create_structure(tree, {})
+
+    # then only the (top-level) projects should be found
+    found = [p.relative_to(tmpfolder).as_posix() for p in info.find_projects(tmpfolder)]
+    assert found == ["a", "group/c"]
+
+
+def test_cache_dir(monkeypatch):
+    assert info.cache_dir().name == "pyscaffold"
+    # When something goes wrong, the default value is returned
+    monkeypatch.setattr(info.appdirs, "user_cache_dir", Mock(side_effect=SystemError))
+    assert info.cache_dir() is None
+    assert info.cache_dir(default=Path("default")) == Path("default")
+
+
 @pytest.mark.no_fake_config_dir
 def test_config_dir_error(monkeypatch):
     # no_fake_config_dir => avoid previous mock of config_dir
@@ -1,7 +1,12 @@
+import json
 import logging
 import re
+import gc
+import threading
+from io import StringIO
 from os import getcwd
 from os.path import abspath
+from weakref import ref
 
 import pytest
 
@@ -9,6 +14,8 @@ from pyscaffold.file_system import localize_path as lp
 from pyscaffold.log import (
     DEFAULT_LOGGER,
     ColoredReportFormatter,
+    JSONLinesFormatter,
+    JSONLinesHandler,
     ReportFormatter,
     ReportLogger,
     logger,
@@ -108,6 +115,142 @@ def test_log_adapter_respects_log_level(caplog):
     logging.getLogger(DEFAULT_LOGGER).setLevel(logging.NOTSET)
 
 
+def test_report_disabled_level(uniq_raw_logger):
+    # Given a logger with the INFO level disabled,
+    new_logger = ReportLogger(uniq_raw_logger)
+    new_logger.level = logging.WARNING
+    records = []
+    new_logger.handler.emit = records.append
+    # when reports are logged with level INFO, no record is produced
+    new_logger.report("make", "some/file")
+    assert not records
+    # but reports with enabled levels are produced
+    new_logger.report("make", "some/file", level=logging.WARNING)
+    assert len(records) == 1
+
+
+def test_json_lines_formatter(uniq_raw_logger, tmpfolder):
+    # Given a logger with a JSON lines formatter
+    stream = StringIO()
+    new_logger = ReportLogger(
+        uniq_raw_logger, logging.StreamHandler(stream), JSONLinesFormatter()
+    )
+    new_logger.level = logging.INFO
+    # when reports and regular messages are logged,
+    with new_logger.performing("pyscaffold.structure:create_structure"):
+        with new_logger.indent():
+            new_logger.report("create", tmpfolder / "file", context=tmpfolder)
+    new_logger.warning("some %s", "message")
+    try:
+        raise ValueError("expected")
+    except ValueError:
+        new_logger.exception("failed")
+    # then each record is represented in a single line
+    report, warning, error = map(json.loads, stream.getvalue().splitlines())
+    assert report["activity"] == "create"
+    assert report["subject"] == str(tmpfolder / "file")
+    assert report["context"] == str(tmpfolder)
+    assert report["target"] is None
+    assert report["nesting"] == 1
+    assert report["action"] == "pyscaffold.structure:create_structure"
+    assert report["timestamp"].endswith("Z")
+    assert warning["message"] == "some message"
+    assert warning["level"] == "WARNING"
+    assert warning["action"] is None
+    assert "ValueError: expected" in error["exception"]
+
+
+def test_json_lines_handler(uniq_raw_logger, tmp_path):
+    # Given a logger with a JSON lines handler
+    file = tmp_path / "log.jsonl"
+    handler = JSONLinesHandler(file)
+    new_logger = ReportLogger(uniq_raw_logger, handler)
+    new_logger.level = logging.INFO
+    # when a lot of records are logged
+    for i in range(1000):
+        new_logger.report("create", f"file{i}")
+    try:
+        raise ValueError("expected")
+    except ValueError:
+        new_logger.exception("failed")
+    # and the arguments of a message change after it is logged
+    files = ["file0"]
+    new_logger.warning("files: %s", files)
+    files.append("file1")
+    # then all of them are written to the file after the handler is closed
+    handler.close()
+    records = [json.loads(line) for line in file.read_text().splitlines()]
+    assert len(records) == 1002
+    assert [r["subject"] for r in records[:3]] == ["file0", "file1", "file2"]
+    assert "ValueError: expected" in records[-2]["exception"]
+    # with the values at the moment they were logged
+    assert records[-1]["message"] == "files: ['file0']"
+    # and closing the handler again is harmless
+    handler.close()
+
+
+def test_indent_is_context_local(uniq_raw_logger):
+    # Given a logger shared between threads
+    stream = StringIO()
+    new_logger = ReportLogger(
+        uniq_raw_logger, logging.StreamHandler(stream), JSONLinesFormatter()
+    )
+    new_logger.level = logging.INFO
+    barrier = threading.Barrier(4)
+
+    def _scaffold(i):
+        with new_logger.run(f"run{i}"):
+            for level in range(3):
+                with new_logger.indent(level):
+                    barrier.wait()  # force interleaving
+                    new_logger.report("create", f"file{level}")
+
+    # when the threads indent the logs concurrently
+    threads = [threading.Thread(target=_scaffold, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # then each run has its own nesting level
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(records) == 12
+    for i in range(4):
+        run = [r for r in records if r["run_id"] == f"run{i}"]
+        assert [(r["subject"], r["nesting"]) for r in run] == [
+            ("file0", 0),
+            ("file1", 1),
+            ("file2", 2),
+        ]
+    # and the main thread is not affected
+    assert new_logger.nesting == 0
+    assert new_logger.run_id is None
+
+
+def test_context_is_per_logger(uniq_raw_logger):
+    # Loggers don't share their nesting/action/run_id
+    logger1, logger2 = ReportLogger(uniq_raw_logger), ReportLogger(uniq_raw_logger)
+    with logger1.run("run1"), logger1.indent(2), logger1.performing("action1"):
+        state = (logger1.nesting, logger1.action, logger1.run_id)
+        assert state == (2, "action1", "run1")
+        assert (logger2.nesting, logger2.action, logger2.run_id) == (0, None, None)
+    assert (logger1.nesting, logger1.action, logger1.run_id) == (0, None, None)
+
+
+def test_run(uniq_raw_logger):
+    new_logger = ReportLogger(uniq_raw_logger)
+    new_logger.nesting = 3
+    with new_logger.run() as run_id:
+        # a random run_id is generated and the nesting starts from zero
+        assert run_id and new_logger.run_id == run_id
+        assert new_logger.nesting == 0
+        with new_logger.run("custom"):
+            assert new_logger.run_id == "custom"
+        assert new_logger.run_id == run_id
+    assert new_logger.run_id is None
+    assert new_logger.nesting == 3
+
+
 def test_report(caplog, tmpfolder):
     # Given the logger level is properly configured
     caplog.set_level(logging.INFO)
@@ -200,6 +343,20 @@ def test_copy(caplog):
     )
 
 
+def test_copies_are_not_kept_alive():
+    # Given a copy of the logger with some context-local state
+    with logger.indent():
+        clone = logger.copy()
+    clone.action = "some_action"
+    assert clone.nesting == logger.nesting + 1
+    # when the copy is no longer used
+    clone_ref = ref(clone)
+    del clone
+    gc.collect()
+    # then it can be garbage collected (its state does not keep it alive)
+    assert clone_ref() is None
+
+
 def test_reconfigure(monkeypatch, caplog, uniq_raw_logger):
     # Given an environment that supports color, and a restrictive logger
     caplog.set_level(logging.NOTSET)
@@ -265,6 +422,32 @@ def test_format_path():
     assert format(lp("/a")) == lp("/a")
 
 
+def test_format_path_without_syscalls(monkeypatch):
+    formatter = ReportFormatter()
+    cwd = formatter.cwd  # resolved once
+
+    def _fail(*_args, **_kwargs):
+        raise AssertionError("no syscalls expected")
+
+    with monkeypatch.context() as patch:
+        patch.setattr("os.getcwd", _fail)
+        patch.setattr("os.lstat", _fail)
+        patch.setattr("os.stat", _fail)
+        assert formatter.format_path(lp(f"{cwd}/a/b")) == lp("a/b")
+        assert formatter.format_path(lp("a/../b/c")) == lp("b/c")
+        assert formatter.format_path("invalid\0/path") == "invalid\0/path"
+        assert formatter.format_path("a" * 300 + lp("/b")) == "a" * 300 + lp("/b")
+
+
+def test_format_path_reset_cwd(tmp_path, monkeypatch):
+    formatter = ReportFormatter()
+    assert formatter.format_path(getcwd()) == "."
+    monkeypatch.chdir(tmp_path)
+    formatter.reset_cwd()
+    assert formatter.cwd == getcwd()
+    assert formatter.format_path(str(tmp_path / "file")) == "file"
+
+
 def test_format_target():
     formatter = ReportFormatter()
     format = formatter.format_target
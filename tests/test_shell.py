@@ -1,8 +1,10 @@
+import asyncio
 import logging
 import re
 import shutil
 import sys
 from pathlib import Path
+from unittest.mock import Mock
 
 import pytest
 
@@ -23,6 +25,73 @@ def test_ShellCommand(tmpfolder):
     assert Path("my-file.txt").exists()
 
 
+def test_ShellCommand_without_shell(tmpfolder):
+    python = shell.ShellCommand(sys.executable, shell=False)
+    output = python("-c", "import sys; print(sys.argv[1:])", "a b", "(c)", "$HOME")
+    assert next(output) == "['a b', '(c)', '$HOME']"
+    # Missing executables behave like in a shell (non-zero exit code)
+    missing = shell.ShellCommand(uniqstr(), shell=False)
+    assert missing.run().returncode == shell.NOT_FOUND
+    with pytest.raises(shell.ShellCommandException):
+        missing("--version")
+
+
+def test_stream(tmpfolder):
+    python = shell.ShellCommand(sys.executable, shell=False)
+    code = "for i in range(3): print(i, flush=True)"
+    lines = []
+    output = python.stream("-c", code, callback=lines.append)
+    assert next(output) == "0"
+    assert lines == ["0"]  # the callback is called as the lines are produced
+    assert list(output) == ["1", "2"]
+    assert lines == ["0", "1", "2"]
+
+
+def test_stream_error(tmpfolder):
+    python = shell.ShellCommand(sys.executable, shell=False)
+    code = "import sys; [print(i) for i in range(500)]; sys.exit(3)"
+    with pytest.raises(shell.ShellCommandException) as exc:
+        list(python.stream("-c", code))
+    # only the last lines are kept for the error message
+    assert str(exc.value).splitlines() == [str(i) for i in range(400, 500)]
+    assert exc.value.__cause__.returncode == 3
+    with pytest.raises(shell.ShellCommandException):
+        list(shell.ShellCommand(uniqstr(), shell=False).stream())
+
+
+def test_stream_pretend(caplog):
+    caplog.set_level(logging.INFO)
+    name = uniqstr()
+    output = shell.ShellCommand("touch").stream(name, pretend=True)
+    assert list(output) == []
+    assert not Path(name).exists()
+    assert re.search(r"run.*touch\s" + name, caplog.text)
+
+
+def test_run_async(tmpfolder):
+    async def _main():
+        python = shell.ShellCommand(sys.executable, shell=False)
+        echo = shell.ShellCommand("echo")
+        return await asyncio.gather(
+            python.call_async("-c", "print('Hello')"),
+            echo.call_async("World"),
+            python.run_async("-c", "import sys; sys.exit(2)"),
+            shell.ShellCommand(uniqstr(), shell=False).run_async(),
+            python.run_async("-c", "print(1)", pretend=True),
+        )
+
+    loop = asyncio.new_event_loop()
+    try:
+        hello, world, failed, missing, pretend = loop.run_until_complete(_main())
+    finally:
+        loop.close()
+    assert list(hello) == ["Hello"]
+    assert next(world).strip('"') == "World"
+    assert failed.returncode == 2
+    assert missing.returncode == shell.NOT_FOUND
+    assert pretend.returncode == 0 and pretend.stdout is None
+
+
 def test_shell_command_error2exit_decorator():
     @shell.shell_command_error2exit_decorator
     def func(_):
@@ -65,6 +134,32 @@ def test_get_executable(tmpfolder):
     assert shell.get_executable(uniqstr()) is None
 
 
+def test_get_executable_cache(tmpfolder, monkeypatch):
+    prefix = Path(str(tmpfolder), "venv")
+    # Given the executable does not exist inside the prefix
+    assert shell.get_executable("fake-exe", prefix, include_path=False) is None
+
+    # when it is created afterwards,
+    exe = prefix / "bin/fake-exe"
+    exe.parent.mkdir(parents=True)
+    exe.write_text("#!/bin/sh\necho hello", "utf-8")
+    exe.chmod(0o755)
+    # then the cached (negative) result is used (without scanning the folder again)
+    with monkeypatch.context() as patch:
+        patch.setattr(shell, "_scan_prefix", Mock(side_effect=AssertionError))
+        assert shell.get_executable("fake-exe", prefix, include_path=False) is None
+
+    # until the cache is cleared for that prefix
+    shell.clear_executable_cache(prefix)
+    found = shell.get_executable("fake-exe", prefix, include_path=False)
+    assert Path(found).resolve() == exe.resolve()
+
+    # Changes in $PATH are also considered
+    assert shell.get_executable("fake-exe", tmpfolder) is None
+    monkeypatch.setenv("PATH", str(exe.parent))
+    assert Path(shell.get_executable("fake-exe", tmpfolder)) == exe
+
+
 def test_get_command():
     python = shell.get_command("python", prefix=sys.prefix, include_path=False)
     assert next(python("--version")).strip().startswith("Python 3")
@@ -1,3 +1,4 @@
+import os
 from os.path import isdir, isfile
 from pathlib import Path
 
@@ -57,6 +58,40 @@ def test_create_structure_when_updating(tmpfolder):
         assert fh.read() == "Changed content"
 
 
+def test_create_structure_lists_each_directory_once(tmpfolder, monkeypatch):
+    struct = {
+        "a": {"file1": "1", "file2": "2", "file3": ("3", NO_OVERWRITE)},
+        "b": {"file1": ("1", SKIP_ON_UPDATE), "c": {"file1": ("1", NO_OVERWRITE)}},
+    }
+    structure.create_structure(struct, {})
+
+    listed = []
+    scandir = os.scandir
+
+    def _scandir(path):
+        listed.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", _scandir)
+    changed, _ = structure.create_structure(struct, dict(update=True))
+    assert len(listed) == len(set(listed))  # no directory is listed twice
+    assert "file3" not in changed["a"]
+    assert "file1" not in changed["b"]
+    assert "file1" not in changed["b"]["c"]
+
+
+def test_create_structure_removes_files_in_the_end(tmpfolder, monkeypatch):
+    structure.create_structure({"a": {"file": "1"}, "b": "2"}, {})
+    calls = []
+    monkeypatch.setattr(structure, "remove_all", lambda *args: calls.append(args))
+    struct = {"a": {"file": ("", operations.remove)}, "b": ("", operations.remove)}
+    changed, opts = structure.create_structure(struct, dict(update=True))
+    # all the removals are done at once
+    assert calls == [([Path("a/file"), Path("b")], None)]
+    assert changed == {"a": {"file": ""}, "b": ""}
+    assert operations.REMOVALS_OPT not in opts
+
+
 def test_create_structure_create_project_folder(tmpfolder):
     struct = {"my_folder": {"my_dir_file": "Some other content"}}
     opts = dict(project_path="my_project", update=False)
@@ -1,11 +1,23 @@
+import re
+import runpy
+import string
 import sys
+import zipfile
 from configparser import ConfigParser
+from pathlib import Path
+from timeit import timeit
+from types import ModuleType
 
 import pytest
 
 from pyscaffold import actions, api
 from pyscaffold import dependencies as deps
 from pyscaffold import templates
+from pyscaffold.exceptions import ErrorLoadingTemplates
+from pyscaffold.extensions.namespace import Namespace
+from pyscaffold.templates import packs
+from pyscaffold.templates import compiled as compiled_templates
+from pyscaffold.templates.compiled import compile_template, render_many
 
 
 def test_get_template():
@@ -54,6 +66,139 @@ def test_get_template_relative_to(tmp_python_path):
     assert content == "Bye bye World!"
 
 
+def test_template_packs(tmp_path):
+    # Given a directory and a zip archive with templates
+    folder = tmp_path / "pack"
+    folder.mkdir()
+    (folder / "readme.template").write_text("Directory ${name}")
+    (folder / "other.txt").write_text("not a template")
+    with zipfile.ZipFile(str(tmp_path / "pack.whl"), "w") as zf:
+        zf.writestr("pkg/templates/readme.template", "Nested ${name}")
+        zf.writestr("templates/readme.template", "Zip ${name}")
+        zf.writestr("templates/authors.template", "Zip authors")
+
+    # when they are loaded, the templates are indexed
+    directory, archive = packs.load(folder), packs.load(tmp_path / "pack.whl")
+    assert set(directory.index) == {"readme"}
+    assert set(archive.index) == {"readme", "authors"}
+    assert archive.read("readme") == "Zip ${name}"  # closer to the root wins
+    assert directory.get("readme") is directory.get("readme")  # compiled once
+    assert directory.get("authors") is None
+
+    # and when they are used, the first ones take precedence over the built-in ones
+    with packs.using([folder, tmp_path / "pack.whl"]):
+        assert templates.get_template("readme").template == "Directory ${name}"
+        assert templates.get_template("authors").template == "Zip authors"
+        assert "Zip" not in templates.get_template("setup_cfg").template
+    assert "Directory" not in templates.get_template("readme").template
+
+    with pytest.raises(FileNotFoundError):
+        templates.get_template("non_existing_template")
+
+
+@pytest.mark.parametrize("location", ["missing/dir", "missing.zip", "missing_pkg"])
+def test_template_packs_not_found(tmp_path, location):
+    # Invalid locations (e.g. missing directories) produce a clear error
+    with pytest.raises(ErrorLoadingTemplates, match=re.escape(location)):
+        packs.load(location)
+    (tmp_path / "file.txt").write_text("not a zip")
+    with pytest.raises(ErrorLoadingTemplates):
+        packs.load(tmp_path / "file.txt")
+
+
+def test_template_bundle(tmp_path, monkeypatch):
+    # Given the bundle is generated as in setup.py
+    setup_py = runpy.run_path(str(Path(__file__).parent.parent / "setup.py"))
+    folder = Path(templates.__file__).parent
+    setup_py["bundle_templates"](folder, tmp_path / "_bundle.py")
+    module = runpy.run_path(str(tmp_path / "_bundle.py"))
+    bundle = ModuleType(packs.BUNDLE)
+    bundle.TEMPLATES = module["TEMPLATES"]
+
+    # when the bundle is available, it is used for the built-in templates
+    monkeypatch.setitem(sys.modules, packs.BUNDLE, bundle)
+    packs.package_pack.cache_clear()
+    try:
+        pack = packs.package_pack(templates.__name__)
+        assert isinstance(pack, packs.BundlePack)
+        # and it should be equivalent to the individual files
+        files = packs.PackagePack(templates.__name__)
+        assert set(pack.index) == set(files.index)
+        for name in files.index:
+            assert pack.read(name) == files.read(name)
+        assert templates.get_template("setup_cfg") is pack.get("setup_cfg")
+    finally:
+        packs.package_pack.cache_clear()
+
+
+def test_create_project_with_templates(tmpfolder, git_mock):
+    Path("pack").mkdir()
+    Path("pack/readme.template").write_text("House style ${name}")
+    api.create_project(project_path="proj", templates=["pack"])
+    assert Path("proj/README.rst").read_text() == "House style proj"
+
+
+class PercentTemplate(string.Template):
+    delimiter = "%"
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        string.Template("$a ${b} $$ $ $c {d} $1 ${e"),
+        PercentTemplate("%a %% %{b} %c"),
+        templates.get_template("setup_cfg"),
+    ],
+)
+def test_compiled_template(template):
+    compiled = compile_template(template)
+    assert compile_template(template) is compiled
+    # rendering should be equivalent to safe_substitute
+    mappings = [{}, {"a": 1, "b": "B"}, {"name": "proj", "package": "proj", "c": None}]
+    expected = [template.safe_substitute(m) for m in mappings]
+    assert [compiled.render(m) for m in mappings] == expected
+    # and so should rendering many mappings in a single call
+    assert compiled.render_many(mappings) == expected
+    assert render_many(template, [*mappings, *mappings]) == expected * 2
+    # the results are reused only for the same values
+    assert compiled.render({"a": 1, "b": "B"}) == expected[1]
+    other = {"a": 2, "b": "B", "name": "other", "package": "other"}
+    assert compiled.render(other) == template.safe_substitute(other)
+
+
+def test_create_projects_renders_shared_templates(tmpfolder, git_mock, monkeypatch):
+    calls = []
+
+    def _render_many(template, mappings):
+        calls.append(len(mappings))
+        return render_many(template, mappings)
+
+    monkeypatch.setattr(api, "render_many", _render_many)
+    # When several projects are created,
+    opts = [dict(project_path=f"proj{i}") for i in range(3)]
+    api.create_projects(opts)
+    # then the templates they share are rendered for the whole list at once
+    assert calls and all(count == 3 for count in calls)
+    # and the projects are generated correctly
+    for i in range(3):
+        assert f"name = proj{i}" in Path(f"proj{i}/setup.cfg").read_text()
+        assert f"proj{i}" in Path(f"proj{i}/README.rst").read_text()
+
+
+@pytest.mark.slow
+def test_compiled_template_throughput(record_property):
+    # Timings are just reported (e.g. ``--junitxml``), they vary too much to be checked
+    template = templates.get_template("setup_cfg")
+    opts = [{"name": f"proj{i}", "package": f"proj{i}", "url": "x"} for i in range(500)]
+    compiled = compile_template(template)
+    baseline = timeit(lambda: [template.safe_substitute(o) for o in opts], number=5)
+    compiled_time = timeit(lambda: [compiled.render(o) for o in opts], number=5)
+    batch = timeit(lambda: compiled_templates.render_many(template, opts), number=5)
+    record_property("string.Template", baseline)
+    record_property("CompiledTemplate", compiled_time)
+    record_property("render_many", batch)
+
+
 def test_all_licenses():
     opts = {
         "email": "test@user",
@@ -80,3 +225,23 @@ def test_setup_cfg():
         assert dep in install_requires
     # Assert PyScaffold section
     assert setup_cfg["pyscaffold"].get("version")
+
+
+def test_setup_cfg_same_as_parsing_whole_file(monkeypatch):
+    reqs = ("mydep1>=789.8.1", "other")
+    extensions = [Namespace()]
+    opts = {"project_path": "myproj", "requirements": reqs, "extensions": extensions}
+    _, opts = actions.get_default_options({}, api.bootstrap_options(opts))
+    # When only a few sections are parsed
+    text = templates.setup_cfg(opts)
+    # then the output is the same as when the whole file is parsed
+    monkeypatch.setattr(templates, "_sections", lambda _: {})
+    assert text == templates.setup_cfg(opts)
+
+
+def test_setup_cfg_section():
+    opts = api.bootstrap_options({"project_path": "myproj", "qual_pkg": "myproj"})
+    text = templates.setup_cfg_section("options.entry_points", opts)
+    assert text.startswith("[options.entry_points]\n")
+    assert "[tool:pytest]" not in text
+    assert "fibonacci = myproj.skeleton:run" in text
@@ -0,0 +1,61 @@
+from textwrap import dedent
+from timeit import timeit
+
+import pytest
+
+from pyscaffold import info, templates, toml
+
+EXAMPLE = dedent(
+    """\
+    [build-system]
+    # AVOID CHANGING REQUIRES: IT WILL BE UPDATED BY PYSCAFFOLD!
+    requires = ["setuptools>=46.1.0", "setuptools_scm[toml]>=5", "wheel"]
+    build-backend = "setuptools.build_meta"
+
+    [tool.setuptools_scm]
+    # See configuration details in https://github.com/pypa/setuptools_scm
+    version_scheme = "no-guess-dev"
+
+    [tool.black]
+    line-length = 88
+    target-version = ["py36", "py37", "py38"]
+    include = '\\.pyi?$'
+
+    [tool.isort]
+    profile = "black"
+    known_first_party = ["myproj"]
+
+    [tool.mypy]
+    ignore_missing_imports = true
+    warn_unused_ignores = true
+    exclude = ["docs/", "build/"]
+    """
+)
+
+
+def test_loads():
+    # When the style should be preserved, comments are kept
+    config = toml.loads(EXAMPLE)
+    assert "# AVOID CHANGING REQUIRES" in toml.dumps(config)
+    # When the document is just inspected, the same values are obtained
+    read_only = toml.loads(EXAMPLE, read_only=True)
+    assert read_only == config
+    assert read_only["tool"]["black"]["include"] == "\\.pyi?$"
+
+
+def test_read_pyproject(tmp_path):
+    (tmp_path / "pyproject.toml").write_text(EXAMPLE)
+    config = info.read_pyproject(tmp_path, read_only=True)
+    assert config["tool"]["isort"]["known_first_party"] == ["myproj"]
+    assert config == info.read_pyproject(tmp_path)
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(toml.fast_parser is None, reason="requires tomllib/tomli")
+def test_loads_throughput(record_property):
+    # Timings are just reported (e.g. ``--junitxml``), they vary too much to be checked
+    documents = [EXAMPLE, templates.pyproject_toml({})]
+    tomlkit = timeit(lambda: [toml.loads(d) for d in documents], number=50)
+    fast = timeit(lambda: [toml.loads(d, read_only=True) for d in documents], number=50)
+    record_property("tomlkit", tomlkit)
+    record_property(toml.fast_parser.__name__, fast)
@@ -0,0 +1,90 @@
+import json
+from io import StringIO
+
+import pytest
+
+from pyscaffold import shell, tracing
+from pyscaffold.api import create_project
+from pyscaffold.cli import run
+
+
+def test_span_without_recording():
+    # When no trace is being recorded, a no-op span is returned
+    assert not tracing.is_recording()
+    with tracing.span("name", "category", arg=1) as span:
+        span.set("other", 2)
+    assert span is tracing.NULL_SPAN
+
+
+def test_record_chrome():
+    stream = StringIO()
+    with tracing.record(stream) as trace:
+        assert tracing.is_recording()
+        with tracing.span("outer", "test", value=1):
+            with tracing.span("inner", "test") as span:
+                span.set("path", tracing)  # non-serialisable => str
+        with pytest.raises(ValueError):
+            with tracing.span("failing", "test"):
+                raise ValueError("expected")
+
+    assert not tracing.is_recording()
+    assert len(trace.spans) == 3
+    events = json.loads(stream.getvalue())["traceEvents"]
+    assert [e["name"] for e in events] == ["outer", "inner", "failing"]
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+    assert events[0]["args"] == {"value": 1}
+    assert "pyscaffold.tracing" in events[1]["args"]["path"]
+    assert "ValueError: expected" in events[2]["args"]["error"]
+
+
+def test_record_otlp(tmp_path):
+    file = tmp_path / "trace.json"
+    with tracing.record(file, "otlp"):
+        with tracing.span("outer", "test"):
+            with tracing.span("inner", "test", argv=["git", "init"]):
+                pass
+
+    data = json.loads(file.read_text())
+    spans = data["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    outer, inner = spans
+    assert "parentSpanId" not in outer
+    assert inner["parentSpanId"] == outer["spanId"]
+    assert inner["traceId"] == outer["traceId"]
+    assert int(inner["startTimeUnixNano"]) <= int(inner["endTimeUnixNano"])
+    attrs = {a["key"]: a["value"] for a in inner["attributes"]}
+    assert attrs["pyscaffold.category"] == {"stringValue": "test"}
+    assert len(attrs["argv"]["arrayValue"]["values"]) == 2
+
+
+def test_record_invalid_format(tmp_path):
+    with pytest.raises(ValueError):
+        with tracing.record(tmp_path / "trace.json", "xml"):
+            pass
+
+
+def test_shell_command_span():
+    stream = StringIO()
+    with tracing.record(stream):
+        list(shell.ShellCommand("python")("--version"))
+
+    (event,) = json.loads(stream.getvalue())["traceEvents"]
+    assert event["cat"] == "shell"
+    assert event["args"]["argv"] == ["python", "--version"]
+    assert event["args"]["exit_code"] == 0
+
+
+def test_create_project_with_trace(tmpfolder, git_mock):
+    create_project(project_path="proj", trace="trace.json")
+    events = json.loads(tmpfolder.join("trace.json").read())["traceEvents"]
+    categories = {e["cat"] for e in events}
+    assert {"action", "file_op"} <= categories
+    names = [e["name"] for e in events if e["cat"] == "action"]
+    assert "pyscaffold.structure:create_structure" in names
+    paths = [e["args"]["path"] for e in events if e["cat"] == "file_op"]
+    assert any(p.endswith("setup.cfg") for p in paths)
+
+
+def test_cli_with_trace(tmpfolder, git_mock):
+    run(["proj", "--trace", "trace.json", "--trace-format", "otlp"])
+    data = json.loads(tmpfolder.join("trace.json").read())
+    assert data["resourceSpans"][0]["scopeSpans"][0]["spans"]